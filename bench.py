@@ -0,0 +1,180 @@
+"""benchmark: time, commands, tips, reagent & gantry travel per stage, against a saved baseline
+
+Each configuration in CONFIGS is a `multi_8sample.py --simulate` run, and so is
+each stage of the default run on its own (`--only <stage>`, "<stage> alone"):
+a stage's numbers then don't move with what the stages before it left behind.
+They run side by side, each with its own event stream & checkpoint file. Every
+stage of a run, and the whole run, is measured from its event stream:
+
+    sec         simulated time from stage start to end
+    commands    hardware commands
+    tips        fresh tips picked up (columns of 8)
+    reagent_ul  drawn from stocks, net of what mixing puts back
+    gantry_mm   xy travel between the wells the pipettes go to (deck.py's model)
+
+bench.json is the baseline: the numbers of every configuration, with a hash of
+the inputs they were measured on (INPUTS: the modules & tables git tracks, as
+they are in the tree, so it matches whatever commit holds the same files and
+not the checkpoint a run leaves behind) and a version that goes up with each
+save.
+`python bench.py` measures the tree as it is and flags every number more than
+THRESHOLD above the baseline (exit status 1 when any is); `--save` makes the
+measurement the new baseline. Run it with the python that has opentrons.
+"""
+import datetime
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import deck
+import stages
+
+CONFIGS = {
+    'default':                          [],
+    'consolidated wash':                ['--consolidated-wash'],
+    '2 columns':                        ['--columns', '2', '--no-multiplex'],
+    '2 columns, consolidated wash':     ['--columns', '2', '--no-multiplex', '--consolidated-wash'],
+}
+METRICS = ('sec', 'commands', 'tips', 'reagent_ul', 'gantry_mm')
+THRESHOLD = 0.02        # 2% over the baseline is a regression
+BASELINE = 'bench.json'
+TOTAL = 'run'
+INPUTS = ('*.py', '*.json')     # what a run depends on, bench.json aside: tracked files at the top of the tree
+RUNTIME = ('checkpoint.json',)  # what a run leaves behind, left out of a tree that isn't a git checkout
+
+
+def configs() -> dict:
+    """CONFIGS, and every stage of the default run on its own"""
+    names = stages.compile_plan(stages.load('stages.json'), True).names()
+    return dict(CONFIGS, **{name + ' alone': ['--only', name] for name in names})
+
+
+def inputs() -> str:
+    """hash of every input file's name & contents"""
+    git = subprocess.run(['git', 'ls-files', '-z', '--'] + [':(glob)' + pattern for pattern in INPUTS], capture_output=True)
+    if git.returncode == 0:
+        paths = git.stdout.decode().split('\0')
+    else:
+        paths = [p for pattern in INPUTS for p in glob.glob(pattern) if p not in RUNTIME]
+    h = hashlib.sha256()
+    for path in sorted(p for p in paths if p and p != BASELINE):
+        with open(path, 'rb') as f:
+            h.update(path.encode() + b'\0' + f.read() + b'\0')
+    return h.hexdigest()[:16]
+
+
+def simulate(configs: dict = CONFIGS) -> dict:
+    """config -> event stream path, the runs side by side"""
+    tmp = tempfile.mkdtemp(prefix='bench')
+    procs = {}
+    for name, args in configs.items():
+        base = os.path.join(tmp, name.replace(' ', '_'))
+        cmd = [sys.executable, 'multi_8sample.py', '--simulate', '--events', base + '.jsonl', '--checkpoint', base + '.ckpt'] + args
+        procs[name] = (subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE), base + '.jsonl')
+    paths = {}
+    for name, (proc, path) in procs.items():
+        _, err = proc.communicate()
+        if proc.returncode != 0:
+            raise Exception("bench " + name + ": the simulated run failed\n" + err.decode()[-2000:])
+        paths[name] = path
+    return paths
+
+
+def measure(path: str, layout: dict) -> dict:
+    """stage -> {metric: value}, TOTAL for the whole run"""
+    by_stage, stocks, channels = {}, set(), {}
+    start = {}
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    for rec in records:
+        if rec['event'] == 'note' and rec['message'] == 'stock':
+            stocks.add(rec['well'])
+            channels[rec['well']] = rec.get('channels', 1)
+    for rec in records:
+        s = by_stage.setdefault(rec['stage'], dict.fromkeys(METRICS, 0))
+        if rec['event'] == 'stage_start':
+            start[rec['stage']] = rec['t']
+        elif rec['event'] == 'stage_end':
+            s['sec'] += rec['t'] - start.pop(rec['stage'])
+        elif rec['event'] == 'command':
+            s['commands'] += 1
+            if rec['name'] == 'pick_up_tip' and 'well' not in rec:
+                s['tips'] += 1
+            if rec.get('well') in stocks and rec['name'] in ('aspirate', 'dispense'):
+                sign = 1 if rec['name'] == 'aspirate' else -1
+                s['reagent_ul'] += sign*rec['volume']*channels[rec['well']]
+    for name, s in by_stage.items():
+        s['gantry_mm'] = deck.travel_mm(layout, deck.transitions(path, layout, stage=name))
+    total = dict.fromkeys(METRICS, 0)
+    for s in by_stage.values():
+        for m in METRICS:
+            total[m] += s[m]
+    total['sec'] = max(rec['t'] for rec in records)
+    by_stage[TOTAL] = total
+    return {name: {m: round(v, 1) for m, v in s.items()} for name, s in by_stage.items()}
+
+
+def compare(now: dict, base: dict) -> list:
+    """[(config, stage, metric, baseline, now)] more than THRESHOLD over the baseline"""
+    worse = []
+    for config, by_stage in now.items():
+        for stage, metrics in by_stage.items():
+            old = base.get(config, {}).get(stage)
+            if old is None:
+                continue
+            for m in METRICS:
+                if metrics[m] > old[m]*(1 + THRESHOLD) and metrics[m] - old[m] > 0.5:
+                    worse.append((config, stage, m, old[m], metrics[m]))
+    return worse
+
+
+def describe(now: dict, base: dict) -> str:
+    lines = []
+    for config, by_stage in now.items():
+        lines.append(config)
+        lines.append("{:<40}".format("stage") + "".join("{:>20}".format(m) for m in METRICS))
+        for stage, metrics in by_stage.items():
+            old = base.get(config, {}).get(stage, {})
+            cells = []
+            for m in METRICS:
+                v = metrics[m]
+                cells.append("{:>20}".format(str(v) + (" ({:+.1%})".format((v - old[m])/old[m]) if old.get(m) else "")))
+            lines.append("{:<40}".format(stage) + "".join(cells))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def load(path: str = BASELINE) -> dict:
+    if not os.path.exists(path):
+        return dict(version=0, configs={})
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(now: dict, base: dict, path: str = BASELINE):
+    out = dict(version=base['version'] + 1, inputs=inputs(), date=datetime.date.today().isoformat(), configs=now)
+    with open(path, 'w') as f:
+        json.dump(out, f, indent='\t')
+        f.write("\n")
+
+
+if __name__ == '__main__':
+    _base = load()
+    _layout = deck.load()
+    _now = {name: measure(path, _layout) for name, path in simulate(configs()).items()}
+    print(describe(_now, _base['configs']))
+    if '--save' in sys.argv:
+        save(_now, _base)
+        print("saved as baseline version " + str(_base['version'] + 1))
+        sys.exit(0)
+    _worse = compare(_now, _base['configs'])
+    for config, stage, m, old, new in _worse:
+        print("REGRESSION " + config + ", " + stage + ": " + m + " " + str(old) + " -> " + str(new))
+    if _base['version']:
+        print(str(len(_worse)) + " regressions against baseline version " + str(_base['version'])
+              + (" (measured on these inputs)" if _base.get('inputs') == inputs() else " (measured on other inputs)"))
+    sys.exit(1 if _worse else 0)
@@ -0,0 +1,162 @@
+"""checkpoints: how far a run got, so a failed run carries on instead of starting over
+
+Each stage is split into steps that leave the plates in a state the next step
+can start from: a stage's pipetting & thermocycling up to its first size
+selection, then each sel_96_ring_mag(). A step starts with pending() and ends
+with save(), which writes everything needed to carry on from there to a JSON
+file:
+    steps done in each stage, and the label of the last one
+    liquid ledger volumes, tip policy contents & parked tips, thermal plan
+        (anything registered with track(): state() & restore(state, wells))
+    plain sets & dicts registered with keep(), e.g. STATE
+    used tip columns in every rack
+    thermocycler lid & block, temperature module and magnet states
+
+The file is replaced in one step, a crash mid-write leaves the previous
+checkpoint. `--resume` reads it back: restore() puts the saved state on the
+freshly set up deck and pending() skips every step already done. The first
+step not done runs again from its start.
+"""
+import datetime
+import json
+import os
+
+CHANNELS = 8        # tips picked up together, one column
+
+
+class Checkpoint:
+    def __init__(self, path: str, resume: bool, labware: list, pipettes: list,
+                 tc=None, temp_mod=None, mag=None, settings: dict = None):
+        """settings: run options a checkpoint only resumes with, e.g. columns"""
+        self.path = path
+        self.labware = list(labware)
+        self.pipettes = list(pipettes)
+        self.tc = tc
+        self.temp_mod = temp_mod
+        self.mag = mag
+        self.settings = settings or {}
+        self.parts = {}         # name -> object with state() & restore(state, wells)
+        self.kept = {}          # name -> set or dict, restored in place
+        self.done = {}          # stage -> steps done
+        self.stage = 'setup'
+        self.step = 0           # steps of the current stage reached so far
+        self.label = None
+        self.saved = None       # checkpoint being resumed
+        if resume:
+            with open(path) as f:
+                self.saved = json.load(f)
+            for k, v in self.settings.items():
+                if self.saved['settings'].get(k) != v:
+                    raise Exception("checkpoint " + path + " was saved with " + k + " " + str(self.saved['settings'].get(k)) + ", not " + str(v))
+            self.done = dict(self.saved['done'])
+
+    def track(self, name: str, part):
+        self.parts[name] = part
+
+    def keep(self, name: str, value):
+        self.kept[name] = value
+
+    ## STEPS ##
+    def fresh(self, stage: str) -> bool:
+        """no step of `stage` done yet, its operator visit & hold fillers are still to come"""
+        return self.done.get(stage, 0) == 0
+
+    def pending(self, label: str) -> bool:
+        """start the next step of the current stage; False if the run being resumed already did it"""
+        self.step += 1
+        if self.step <= self.done.get(self.stage, 0):
+            print("checkpoint: " + self.stage + " step " + str(self.step) + " already done, " + label)
+            return False
+        self.label = label
+        return True
+
+    def save(self):
+        """the current step is done"""
+        self.done[self.stage] = self.step
+        state = dict(
+            saved = datetime.datetime.now().isoformat(),
+            settings = self.settings,
+            done = self.done,
+            last = dict(stage=self.stage, step=self.step, label=self.label),
+            parts = {name: part.state() for name, part in self.parts.items()},
+            kept = {name: _plain(v) for name, v in self.kept.items()},
+            tip_racks = self._racks(),
+            modules = self._modules())
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.path)
+
+    ## RESUME ##
+    def restore(self):
+        """put the run being resumed back on the deck, after labware & liquids are loaded"""
+        if self.saved is None:
+            return
+        self._restore_modules(self.saved['modules'])
+        self._restore_racks(self.saved['tip_racks'])
+        wells = {str(w): w for lw in self.labware + self._tip_racks() for w in lw.wells()}
+        for name, part in self.parts.items():
+            part.restore(self.saved['parts'][name], wells)
+        for name, value in self.kept.items():
+            value.clear()
+            value.update(self.saved['kept'][name])
+
+    def describe(self) -> str:
+        if self.saved is None:
+            return "no checkpoint"
+        last = self.saved['last']
+        lines = ["resuming " + self.path + " from " + self.saved['saved']]
+        lines += ["    done: " + stage + ", " + str(steps) + " step" + ("s" if steps > 1 else "") for stage, steps in self.done.items()]
+        lines.append("    last step done: " + last['stage'] + " step " + str(last['step']) + ", " + str(last['label']))
+        return "\n".join(lines)
+
+    ## BUS LISTENER ##
+    def stage_start(self, name: str):
+        self.stage = name
+        self.step = 0
+
+    ## HARDWARE ##
+    def _tip_racks(self) -> list:
+        return [rack for pip in self.pipettes for rack in pip.tip_racks]
+
+    def _racks(self) -> dict:
+        # multichannel pickups: a column is used or it isn't
+        return {str(rack): [col[0].well_name for col in rack.columns() if not col[0].has_tip] for rack in self._tip_racks()}
+
+    def _restore_racks(self, used: dict):
+        for rack in self._tip_racks():
+            for col in rack.columns():
+                if col[0].well_name in used.get(str(rack), []):
+                    rack.use_tips(col[0], CHANNELS)
+
+    def _modules(self) -> dict:
+        modules = {}
+        if self.tc is not None:
+            modules['tc'] = dict(lid=self.tc.lid_position, block=self.tc.block_target_temperature, lid_temperature=self.tc.lid_target_temperature)
+        if self.temp_mod is not None:
+            modules['temp'] = dict(target=self.temp_mod.target)
+        if self.mag is not None:
+            modules['mag'] = dict(status=self.mag.status)
+        return modules
+
+    def _restore_modules(self, modules: dict):
+        # the lid's temperature is left to the thermal plan, it's restored with it
+        tc = modules.get('tc')
+        if self.tc is not None and tc is not None:
+            if tc['lid'] == 'open':
+                self.tc.open_lid()
+            elif tc['lid'] == 'closed':
+                self.tc.close_lid()
+            if tc['block'] is not None:
+                self.tc.set_block_temperature(tc['block'])
+        temp = modules.get('temp')
+        if self.temp_mod is not None and temp is not None and temp['target'] is not None:
+            self.temp_mod.start_set_temperature(temp['target'])
+        # steps end with the magnet down, engaging it again is left to the protocol & its mag height
+        mag = modules.get('mag')
+        if self.mag is not None and mag is not None and mag['status'] == 'disengaged':
+            self.mag.disengage()
+
+
+def _plain(value):
+    return sorted(value) if isinstance(value, set) else dict(value)
@@ -0,0 +1,34 @@
+"""clocks used to time incubations, mag separations & thermocycler holds
+
+WallClock is used on the robot. VirtualClock is used when simulating: nothing
+actually waits, every hardware command advances it by the time that command
+would take on the robot (see time_model.py).
+"""
+import datetime
+import time
+
+
+class WallClock:
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def advance(self, sec: float):
+        pass    # the hardware already took this long
+
+
+class VirtualClock:
+    def __init__(self, start: datetime.datetime = None):
+        self.t = 0.0
+        self.start = start or datetime.datetime.now()
+
+    def monotonic(self) -> float:
+        return self.t
+
+    def now(self) -> datetime.datetime:
+        return self.start + datetime.timedelta(seconds=self.t)
+
+    def advance(self, sec: float):
+        self.t += max(sec, 0)
@@ -0,0 +1,190 @@
+"""operator control plane: run state & pending operator actions over local HTTP
+
+Every place the protocol waits for the operator (deck visits, tip reloads, the
+index PCR cycle count, the GEM recovery instructions) is an action: a prompt,
+the instructions that go with it, and optionally a check on the value given.
+ControlPlane.ask() posts the action and blocks until it's answered, from the
+terminal as before or over HTTP from anywhere that can reach the port:
+
+    GET  /state                 stage, commands run, last progress message, pending actions
+    GET  /actions               pending actions
+    POST /actions/<id>          answer one, JSON body {"value": "12"} where a value is asked for
+    POST /continue              answer the oldest pending action that needs no value
+
+    curl -s localhost:8042/state
+    curl -s -X POST localhost:8042/continue
+
+With auto_continue set, an action that needs no value continues by itself
+after that many seconds: an unattended deck visit costs that long at most.
+Values are never made up; the cycle count waits for an answer.
+
+Each action records how long the robot waited on it and who answered
+(terminal, http, timeout), noted in the event stream; report() totals the
+operator wait per prompt, the time a faster answer would give back.
+
+The server listens on 127.0.0.1 only: anything further goes through an SSH
+tunnel or a proxy the site already trusts.
+"""
+import http.server
+import itertools
+import json
+import sys
+import threading
+import time
+
+import time_model
+
+
+class Action:
+    def __init__(self, id: int, prompt: str, details: list, check):
+        self.id = id
+        self.prompt = prompt
+        self.details = details
+        self.check = check          # answer -> error message, None when fine
+        self.value = check is not None      # an answer is needed, not just a continue
+        self.asked = time.monotonic()
+        self.answer = None
+        self.by = None
+        self.done = threading.Event()
+
+    def describe(self) -> dict:
+        return dict(id=self.id, prompt=self.prompt, details=self.details, value=self.value,
+                    waiting=round(time.monotonic() - self.asked, 1))
+
+
+class ControlPlane:
+    def __init__(self, port: int = None, auto_continue: float = None, terminal: bool = True, note=None):
+        """port: serve HTTP on it, terminal: also read answers from stdin
+        note(message, **fields) records each answer, e.g. EventLog.note"""
+        self.auto_continue = auto_continue
+        self.note = note
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.pending = []           # Actions not answered yet, oldest first
+        self.waits = {}             # prompt -> [times asked, s waited]
+        self.state = dict(stage='setup', commands=0, message=None)
+        self.server = None
+        if port is not None:
+            self.server = http.server.ThreadingHTTPServer(('127.0.0.1', port), _handler(self))
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if terminal:
+            threading.Thread(target=self._read_terminal, daemon=True).start()
+
+    def ask(self, prompt: str, details: list = None, check=None) -> str:
+        """post an action and block until it's answered; returns the answer, "" for a continue
+        check(answer) -> error message or None: a value is asked for, answers are checked"""
+        action = Action(next(self.ids), prompt, details or [], check)
+        for line in action.details:
+            print(line)
+        print(prompt, flush=True)
+        with self.lock:
+            self.pending.append(action)
+        timeout = None if action.value else self.auto_continue
+        if not action.done.wait(timeout):
+            self.answer(action.id, "", 'timeout')
+        waited = time.monotonic() - action.asked
+        totals = self.waits.setdefault(prompt, [0, 0])
+        totals[0] += 1
+        totals[1] += waited
+        if self.note is not None:
+            self.note('operator', prompt=prompt, by=action.by, answer=action.answer, waited=round(waited, 1))
+        return action.answer
+
+    def answer(self, id: int = None, answer: str = "", by: str = 'http') -> str:
+        """answer action `id` (None: the oldest that needs no value); returns why not, None when answered"""
+        with self.lock:
+            if id is None:
+                open_ = [a for a in self.pending if not a.value] or self.pending[:1]
+            else:
+                open_ = [a for a in self.pending if a.id == id]
+            if not open_:
+                return "no such pending action"
+            action = open_[0]
+            if action.value and not answer:
+                return "a value is needed: " + action.prompt
+            error = action.check(answer) if action.check is not None else None
+            if error is not None:
+                return error
+            self.pending.remove(action)
+        action.answer, action.by = answer, by
+        action.done.set()
+        return None
+
+    def status(self, message: str):
+        """latest progress message, shown in /state"""
+        self.state['message'] = message
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.state, pending=[a.describe() for a in self.pending])
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+    def report(self) -> str:
+        lines = ["{:<60}{:>8}{:>12}".format("operator prompt", "asked", "waited")]
+        for prompt, (n, sec) in self.waits.items():
+            lines.append("{:<60}{:>8}{:>12}".format(prompt[:59], n, time_model.hms(sec)))
+        return "\n".join(lines)
+
+    def _read_terminal(self):
+        for line in sys.stdin:
+            with self.lock:
+                oldest = self.pending[0].id if self.pending else None
+            if oldest is None:
+                continue
+            error = self.answer(oldest, line.strip(), 'terminal')
+            if error is not None:
+                print(error, flush=True)
+
+    ## BUS LISTENER ##
+    def after(self, cmd):
+        self.state['commands'] += 1
+
+    def stage_start(self, name: str):
+        self.state['stage'] = name
+
+    def stage_end(self, name: str):
+        self.state['stage'] = 'between stages'
+
+
+def _handler(plane: ControlPlane):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/state':
+                self._reply(200, plane.snapshot())
+            elif self.path == '/actions':
+                self._reply(200, plane.snapshot()['pending'])
+            else:
+                self._reply(404, dict(error="GET /state or /actions"))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._reply(400, dict(error="body must be JSON"))
+            value = str(body.get('value', ""))
+            if self.path == '/continue':
+                error = plane.answer(None, value)
+            elif self.path.startswith('/actions/') and self.path[len('/actions/'):].isdigit():
+                error = plane.answer(int(self.path[len('/actions/'):]), value)
+            else:
+                return self._reply(404, dict(error="POST /actions/<id> or /continue"))
+            if error is not None:
+                return self._reply(409, dict(error=error))
+            self._reply(200, dict(ok=True))
+
+        def _reply(self, code: int, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass        # requests aren't progress, keep them off the run's output
+
+    return Handler
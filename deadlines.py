@@ -0,0 +1,51 @@
+"""named deadlines: wait for what's left of a window instead of a guessed delay
+
+A step marks when something happened, e.g. start('ethanol removed') right after
+the last ethanol aspirate, and a later step waits out the rest of the window
+from there: wait('ethanol removed', 60) delays 60s minus however long the
+commands in between took. The window stays the same when motion or tip
+handling in between gets faster or slower.
+
+Each wait records how far from the deadline it ended: late when the commands
+in between already ran past it, early or late by whatever the delay itself
+misses by on the robot. They're noted in the event stream, a wait that starts
+past its deadline is a warning there; report() gives the worst per deadline.
+"""
+
+
+class Deadlines:
+    def __init__(self, protocol, clock, note=None, warn=None):
+        """note(message, **fields) records each wait, e.g. EventLog.note; warn(...) each one already late, e.g. EventLog.warn"""
+        self.protocol = protocol
+        self.clock = clock
+        self.note = note
+        self.warn = warn
+        self.started = {}           # name -> monotonic time it was started
+        self.errors = {}            # name -> [s off the deadline, per wait]
+
+    def start(self, name: str):
+        """the window `name` starts now; starting it again moves it"""
+        self.started[name] = self.clock.monotonic()
+
+    def wait(self, name: str, seconds: float) -> float:
+        """until `seconds` after start(name); returns s waited"""
+        if name not in self.started:
+            raise Exception("deadline " + name + " was never started")
+        deadline = self.started[name] + seconds
+        remaining = deadline - self.clock.monotonic()
+        if remaining > 0:
+            self.protocol.delay(seconds=remaining)
+        error = self.clock.monotonic() - deadline
+        self.errors.setdefault(name, []).append(error)
+        if remaining < 0 and self.warn is not None:
+            self.warn('deadline missed', name=name, seconds=seconds, late=round(-remaining, 3))
+        if self.note is not None:
+            self.note('deadline', name=name, seconds=seconds, waited=round(max(remaining, 0), 3), error=round(error, 3))
+        return max(remaining, 0)
+
+    def report(self) -> str:
+        lines = ["{:<40}{:>8}{:>14}{:>14}".format("deadline", "waits", "most late s", "most early s")]
+        for name, errors in self.errors.items():
+            late, early = max(0.0, max(errors)), max(0.0, -min(errors))
+            lines.append("{:<40}{:>8}{:>14.1f}{:>14.1f}".format(name, len(errors), late, early))
+        return "\n".join(lines)
@@ -0,0 +1,316 @@
+"""deck layout: which slot each labware goes in & which reservoir column holds each stock
+
+deck.json is the layout the protocol loads and the README deck table shows:
+
+    slots       labware -> OT-2 slot (thermocycler on 7/10 & trash on 12 are fixed)
+    reservoir   stock -> 12-well reservoir column, eth_stocks in the order they're drawn
+    offsets     labware kind -> slot -> labware position check offset [x, y, z] in mm
+
+Offsets are measured per slot, so they're kept by the slot they were measured
+in: a layout that moves labware to a slot with no offset for it simulates, but
+the protocol won't run it on the robot until labware position check has been
+run there and the offsets added.
+
+`python deck.py events.jsonl` reads the event stream of a run made with the
+layout in deck.json and searches for the layout with the least gantry travel
+over the same commands: labware swapped between the free slots (modules only
+where a module fits) and stocks moved between reservoir columns. It prints the
+travel of both and the deck table; `--write` saves the layout, offsets and all,
+to deck_fast.json (`--write <file>` elsewhere, deck.json rewrites the README
+deck table too). deck_fast.json is the layout found over a simulated run of
+deck.json, run it with `--deck deck_fast.json` once its slots are calibrated.
+
+Travel is modelled as the xy distance between the A-row wells each command
+goes to, at the gantry's default speed; arcs over labware cost the same in any
+layout and are left out. Fresh tips come off a pipette's racks in order,
+column by column, as the tip tracker hands them out.
+"""
+import json
+import math
+import random
+import sys
+
+import time_model
+
+## OT-2 GEOMETRY ##
+# mm, slot front left corners from the ot2_standard deck definition
+SLOT_XY = {
+    1: (0, 0),      2: (132.5, 0),      3: (265, 0),
+    4: (0, 90.5),   5: (132.5, 90.5),   6: (265, 90.5),
+    7: (0, 181),    8: (132.5, 181),    9: (265, 181),
+    10: (0, 271.5), 11: (132.5, 271.5), 12: (265, 271.5),
+}
+FIXED       = dict(tc=7, trash=12)      # semi configured thermocycler sits on 7 & 10, leaves 8 & 11 free
+TC_OFFSET   = (0, 82.56)                # thermocycler plate from the front left of slot 7
+FREE_SLOTS  = (1, 2, 3, 4, 5, 6, 8, 9, 11)
+MODULE_SLOTS = (1, 3, 4, 6, 9)          # left & right columns, 7 & 10 being the thermocycler's
+MODULES     = ('mag', 'temp')
+A1_XY       = (14.38, 74.24)            # A1 of an SBS plate or rack, 9mm column pitch
+RESERVOIR_Y = 42.78                     # 12-well reservoir columns run the length of the plate
+TRASH_XY    = (82.84, 80.0)
+COLUMN_MM   = 9.0
+RESERVOIR_COLS = 12
+MOUNT_X     = dict(p20=-34.0, p300=0.0)     # left mount nozzle from the right's, the gantry carries both
+RACK_COLS   = 12
+RACKS       = dict(p20=['t20_0', 't20_1'], p300=['t300_0', 't300_1', 't300_2', 't300_3'])
+# labware of a kind share an offset in the same slot, e.g. any P300 rack in 5
+KINDS       = dict(t20_0='t20', t20_1='t20', t300_0='t300', t300_1='t300', t300_2='t300', t300_3='t300',
+                   r15='r15', mag='mag', temp='temp')
+
+# README deck table
+NAMES = dict(t20_0='P20 tips', t20_1='P20 tips', t300_0='P300 tips', t300_1='P300 tips', t300_2='P300 tips',
+             t300_3='P300 tips', r15='12-well trough', mag='mag module', temp='temp module')
+STOCK_NAMES = dict(spri_stock='SPRI', eb_stock='EB', elu_sol_1='elution solution', dyn_stock='dynabeads', eth_stocks='ethanol')
+
+
+def load(path: str = 'deck.json') -> dict:
+    with open(path) as f:
+        layout = json.load(f)
+    errors = check(layout)
+    if errors:
+        raise Exception(path + " is not a usable deck layout:\n    " + "\n    ".join(errors))
+    return layout
+
+
+def check(layout: dict) -> list:
+    errors = []
+    slots = layout['slots']
+    for name, slot in slots.items():
+        if slot not in FREE_SLOTS:
+            errors.append(name + ": slot " + str(slot) + " isn't free, use one of " + ", ".join(str(s) for s in FREE_SLOTS))
+        if name in MODULES and slot not in MODULE_SLOTS:
+            errors.append(name + ": a module doesn't fit in slot " + str(slot) + ", use one of " + ", ".join(str(s) for s in MODULE_SLOTS))
+    if len(set(slots.values())) < len(slots):
+        errors.append("two labware in one slot")
+    cols = stock_columns(layout)
+    if any(c < 1 or c > RESERVOIR_COLS for c in cols.values()):
+        errors.append("reservoir columns run from 1 to " + str(RESERVOIR_COLS))
+    if len(set(cols.values())) < len(cols):
+        errors.append("two stocks in one reservoir column")
+    for kind, by_slot in layout.get('offsets', {}).items():
+        if kind not in KINDS.values():
+            errors.append("offsets: no labware kind " + kind + ", use one of " + ", ".join(sorted(set(KINDS.values()))))
+        for slot, at in by_slot.items():
+            if not slot.isdigit() or int(slot) not in FREE_SLOTS:
+                errors.append("offsets: " + kind + " slot " + slot + " isn't free, use one of " + ", ".join(str(s) for s in FREE_SLOTS))
+            if len(at) != 3 or not all(isinstance(mm, (int, float)) for mm in at):
+                errors.append("offsets: " + kind + " in slot " + slot + " needs [x, y, z] in mm")
+    return errors
+
+
+def offset(layout: dict, name: str):
+    """(x, y, z) labware position check offset for `name` in the slot the layout puts it, None if none was measured there"""
+    at = layout.get('offsets', {}).get(KINDS[name], {}).get(str(layout['slots'][name]))
+    return None if at is None else tuple(at)
+
+
+def uncalibrated(layout: dict) -> list:
+    """labware the layout puts in a slot with no offset for it"""
+    return [name + " in slot " + str(slot) for name, slot in layout['slots'].items() if offset(layout, name) is None]
+
+
+def stock_columns(layout: dict) -> dict:
+    """stock -> column, eth_stocks as eth_stocks.0, eth_stocks.1, ..."""
+    cols = {}
+    for stock, col in layout['reservoir'].items():
+        if isinstance(col, list):
+            cols.update({stock + '.' + str(i): c for i, c in enumerate(col)})
+        else:
+            cols[stock] = col
+    return cols
+
+
+def _with_columns(layout: dict, cols: dict) -> dict:
+    reservoir = {}
+    for key, col in sorted(cols.items()):
+        stock, _, i = key.partition('.')
+        if i:
+            reservoir.setdefault(stock, []).append(col)
+        else:
+            reservoir[stock] = col
+    return dict(layout, reservoir={stock: reservoir[stock] for stock in layout['reservoir']})
+
+
+## TRACE ##
+def transitions(path: str, layout: dict, stage: str = None) -> dict:
+    """{((pipette, item, well), (pipette, item, well)): count} between successive moves of a run's event stream
+    stage: only those within it"""
+    items = {slot: item for item, slot in list(layout['slots'].items()) + list(FIXED.items())}
+    columns = {'A' + str(col): stock for stock, col in stock_columns(layout).items()}
+    fresh = dict(p20=0, p300=0)         # tips picked up off the racks so far
+    picked = {}                         # pipette -> where its tip came from
+    counts = {}
+    last = None
+    with open(path) as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec['event'] != 'command' or rec['source'] not in RACKS:
+                continue
+            pip, name = rec['source'], rec['name']
+            if 'well' in rec:
+                well, _, rest = rec['well'].partition(' of ')
+                item = items.get(int(rest.rsplit(' on ', 1)[1]))
+                if item is None:
+                    continue
+                if item == 'r15':
+                    well = columns.get(well, well)
+                at = (pip, item, well)
+            elif name == 'pick_up_tip':
+                racks = RACKS[pip]
+                n = fresh[pip]
+                fresh[pip] += 1
+                at = (pip, racks[min(n//RACK_COLS, len(racks) - 1)], 'A' + str(n % RACK_COLS + 1))
+            elif name == 'return_tip' and pip in picked:
+                at = picked[pip]
+            elif name == 'drop_tip':
+                at = (pip, 'trash', 'A1')
+            else:
+                continue
+            if name == 'pick_up_tip':
+                picked[pip] = at
+            if stage is not None and rec['stage'] != stage:
+                last = None
+                continue
+            if last is not None and last != at:
+                counts[(last, at)] = counts.get((last, at), 0) + 1
+            last = at
+    return counts
+
+
+## TRAVEL ##
+def position(layout: dict, cols: dict, at: tuple) -> tuple:
+    """gantry xy that puts the pipette over the well"""
+    pip, item, well = at
+    if item == 'trash':
+        x, y = SLOT_XY[FIXED['trash']][0] + TRASH_XY[0], SLOT_XY[FIXED['trash']][1] + TRASH_XY[1]
+    elif item == 'tc':
+        x, y = SLOT_XY[FIXED['tc']][0] + TC_OFFSET[0] + A1_XY[0] + COLUMN_MM*(int(well[1:]) - 1), SLOT_XY[FIXED['tc']][1] + TC_OFFSET[1] + A1_XY[1]
+    elif item == 'r15':
+        col = cols[well] if well in cols else int(well[1:])
+        x, y = SLOT_XY[layout['slots']['r15']][0] + A1_XY[0] + COLUMN_MM*(col - 1), SLOT_XY[layout['slots']['r15']][1] + RESERVOIR_Y
+    else:
+        sx, sy = SLOT_XY[layout['slots'][item]]
+        x, y = sx + A1_XY[0] + COLUMN_MM*(int(well[1:]) - 1), sy + A1_XY[1]
+    return x - MOUNT_X[pip], y
+
+
+def travel_mm(layout: dict, counts: dict) -> float:
+    cols = stock_columns(layout)
+    mm = 0
+    for (a, b), n in counts.items():
+        (ax, ay), (bx, by) = position(layout, cols, a), position(layout, cols, b)
+        mm += n*math.hypot(bx - ax, by - ay)
+    return mm
+
+
+def travel_sec(layout: dict, counts: dict) -> float:
+    return travel_mm(layout, counts)/time_model.DEFAULT_SPEED
+
+
+## SEARCH ##
+def neighbours(layout: dict):
+    """every layout one swap away: two labware's slots, or two reservoir columns' contents"""
+    slots = layout['slots']
+    names = list(slots)
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            a, b = names[i], names[j]
+            swapped = dict(slots, **{a: slots[b], b: slots[a]})
+            if all(swapped[m] in MODULE_SLOTS for m in MODULES if m in swapped):
+                yield dict(layout, slots=swapped)
+    cols = stock_columns(layout)
+    by_col = {c: stock for stock, c in cols.items()}
+    for c in range(1, RESERVOIR_COLS + 1):
+        for d in range(c + 1, RESERVOIR_COLS + 1):
+            if c not in by_col and d not in by_col:
+                continue
+            moved = dict(cols)
+            if c in by_col:
+                moved[by_col[c]] = d
+            if d in by_col:
+                moved[by_col[d]] = c
+            yield _with_columns(layout, moved)
+
+
+def optimize(layout: dict, counts: dict, restarts: int = 20, seed: int = 0) -> dict:
+    """steepest descent over single swaps, from the given layout & from shuffled ones"""
+    rng = random.Random(seed)
+    best, best_sec = layout, travel_sec(layout, counts)
+    for r in range(restarts + 1):
+        current = layout if r == 0 else _shuffled(layout, rng)
+        current_sec = travel_sec(current, counts)
+        while True:
+            step, step_sec = None, current_sec
+            for candidate in neighbours(current):
+                sec = travel_sec(candidate, counts)
+                if sec < step_sec - 1e-6:
+                    step, step_sec = candidate, sec
+            if step is None:
+                break
+            current, current_sec = step, step_sec
+        if current_sec < best_sec - 1e-6:
+            best, best_sec = current, current_sec
+    return best
+
+
+def _shuffled(layout: dict, rng: random.Random) -> dict:
+    while True:
+        names = list(layout['slots'])
+        slots = dict(zip(names, rng.sample(FREE_SLOTS, len(names))))
+        if all(slots[m] in MODULE_SLOTS for m in MODULES if m in slots):
+            break
+    cols = stock_columns(layout)
+    cols = dict(zip(cols, rng.sample(range(1, RESERVOIR_COLS + 1), len(cols))))
+    return _with_columns(dict(layout, slots=slots), cols)
+
+
+## README ##
+def table(layout: dict) -> str:
+    """README deck table, back row first"""
+    at = {slot: NAMES[item] for item, slot in layout['slots'].items()}
+    at.update({7: 'thermocycler', 10: 'thermocycler', 12: 'trash'})
+    lines = ["opentrons | deck | setup", "--- | --- | ---"]
+    for row in (10, 7, 4, 1):
+        lines.append(" | ".join((str(s) + ": " if s != 12 else "") + at.get(s, "empty") for s in range(row, row + 3)))
+    cols = stock_columns(layout)
+    lines.append("")
+    lines.append("12-well trough: " + ", ".join("A" + str(c) + " " + _stock_name(stock)
+                                                for stock, c in sorted(cols.items(), key=lambda kv: kv[1])))
+    lines.append("(ethanol is drawn in the order numbered, 3 columns per column of samples; with n columns of samples the last n are spares)")
+    return "\n".join(lines)
+
+
+def _stock_name(key: str) -> str:
+    stock, _, i = key.partition('.')
+    return STOCK_NAMES[stock] + (" " + str(int(i) + 1) if i else "")
+
+
+def write_readme(layout: dict, path: str = 'README.md'):
+    with open(path) as f:
+        readme = f.read()
+    start = readme.index("## Deck Setup\n") + len("## Deck Setup\n")
+    end = readme.index("\n## ", start)
+    with open(path, 'w') as f:
+        f.write(readme[:start] + table(layout) + "\n\n" + readme[end:])
+
+
+if __name__ == '__main__':
+    _events = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'events.jsonl'
+    _layout = load('deck.json')
+    _counts = transitions(_events, _layout)
+    _best = optimize(_layout, _counts)
+    print("gantry travel, deck.json: " + time_model.hms(travel_sec(_layout, _counts)))
+    print("gantry travel, best found: " + time_model.hms(travel_sec(_best, _counts)))
+    print(table(_best))
+    if '--write' in sys.argv:
+        _i = sys.argv.index('--write')
+        _path = sys.argv[_i + 1] if _i + 1 < len(sys.argv) and not sys.argv[_i + 1].startswith('--') else 'deck_fast.json'
+        with open(_path, 'w') as f:
+            json.dump(_best, f, indent='\t')
+            f.write("\n")
+        print("written to " + _path)
+        if _path == 'deck.json':
+            write_readme(_best)
+            print("and to README.md")
+        if uncalibrated(_best):
+            print("no offsets measured for " + ", ".join(uncalibrated(_best)) + ": run labware position check there before a robot run")
@@ -0,0 +1,107 @@
+"""structured event stream: one JSON line per hardware command & stage boundary
+
+EventLog subscribes to hwproxy.BUS and writes a record for every traced
+command, stage start/end, note and warning, to a JSONL file and optionally as
+UDP datagrams to a local port (watch a run live with `nc -ul <port>`).
+Modules report through it, not print(): notes (a mix, a deadline, a hold
+filler) and warnings (a hold overrun, a missed deadline, a stock run dry, a
+tip carried into a stock). The console sink prints every warning and the
+notes sent with echo=True, i.e. the progress messages.
+
+    {"event": "command", "t": 1234.5, "wall": "2023-...", "stage": "ada_lig_cleanup",
+     "source": "p300", "name": "aspirate", "well": "A3 of ...", "volume": 90, "latency": 1.2}
+
+t is the run clock's monotonic time when the record was written, i.e. a
+command's end (virtual when simulating), wall the clock's datetime, latency
+how long the command took on that clock.
+"""
+import json
+import socket
+
+import hwproxy
+from hwproxy import Command
+
+# position of the volume argument for commands that move liquid
+VOLUME_ARG = dict(aspirate=0, dispense=0, air_gap=0, mix=1)
+
+
+class EventLog:
+    def __init__(self, clock, path: str, port: int = None, append: bool = False, console: bool = True):
+        """append: carry on the stream of the run being resumed; console: print echoed notes & warnings"""
+        self.clock = clock
+        self.console = console
+        self.file = open(path, 'a' if append else 'w', buffering=1)     # line buffered, a crash loses at most one record
+        self.sock = None
+        self.port = port
+        if port is not None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stage = 'setup'
+        self.started = []       # monotonic start of each command in flight
+
+    def emit(self, event: str, **fields):
+        record = dict(event=event, t=round(self.clock.monotonic(), 3), wall=self.clock.now().isoformat(), stage=self.stage)
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        self.file.write(line + "\n")
+        if self.sock is not None:
+            try:
+                self.sock.sendto(line.encode(), ('127.0.0.1', self.port))
+            except OSError:
+                pass        # nobody listening is fine, the file has it
+
+    def note(self, message: str, echo: bool = False, **fields):
+        """echo: a progress message, printed on the console too"""
+        self.emit('note', message=message, **fields)
+        if echo:
+            self.print(message, fields)
+
+    def warn(self, message: str, **fields):
+        """something went other than planned, always printed"""
+        self.emit('warn', message=message, **fields)
+        self.print("WARNING " + message, fields)
+
+    def print(self, message: str, fields: dict):
+        if self.console:
+            print(message + ": " + str(self.clock.now()) + "".join(", " + k + " " + str(v) for k, v in fields.items()), flush=True)
+
+    def close(self):
+        self.file.close()
+        if self.sock is not None:
+            self.sock.close()
+
+    ## BUS LISTENER ##
+    def before(self, cmd: Command):
+        self.started.append(self.clock.monotonic())
+
+    def after(self, cmd: Command):
+        start = self.started.pop()
+        if cmd.name == 'setattr':
+            return
+        fields = dict(source=cmd.source, name=cmd.name, latency=round(self.clock.monotonic() - start, 3))
+        well = _well_of(cmd)
+        if well is not None:
+            fields['well'] = str(well)
+        if cmd.name in VOLUME_ARG:
+            fields['volume'] = cmd.arg('volume', VOLUME_ARG[cmd.name])
+        args = [a for a in cmd.args if isinstance(a, (int, float, str, bool))]
+        args += [k + "=" + str(v) for k, v in cmd.kwargs.items() if isinstance(v, (int, float, str, bool))]
+        if args:
+            fields['args'] = args
+        self.emit('command', **fields)
+
+    def stage_start(self, name: str):
+        self.stage = name
+        self.emit('stage_start')
+
+    def stage_end(self, name: str):
+        self.emit('stage_end')
+        self.stage = 'between stages'
+
+
+def _well_of(cmd: Command):
+    """the first well among a command's arguments, if any"""
+    for a in list(cmd.args) + list(cmd.kwargs.values()):
+        well, _ = hwproxy.well_at(a)
+        if well is not None:
+            return well
+    return None
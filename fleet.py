@@ -0,0 +1,247 @@
+"""fleet: runs on several OT-2s, staggered so one operator never has two robots waiting
+
+A run's operator visits come from its event stream (events.jsonl): every
+'operator' note, at the run clock time it was asked, plus unloading the
+product at the end. A visit keeps the operator at that robot for
+VISIT_SEC[prompt] and the robot waits for it, so later visits move back by it.
+
+plan() staggers runs over the robots: each run starts as soon as its robot is
+free (after TURNAROUND_SEC of cleaning & loading) and no visit of it would
+overlap a visit already planned on any robot, pushed back otherwise. That
+gives the runs, and samples, a fleet gets through in a day with one operator.
+
+Fleet dispatches the planned runs and tracks every robot's stage & pending
+prompt; Robot drives one OT-2 through its control plane (control.py), and
+SimRobot stands in for one by replaying a simulated run's event stream, to
+try a fleet without hardware:
+
+    python fleet.py plan events.jsonl --robots 8 [--hours 24]
+    python fleet.py run events.jsonl --robots 3 --sim [--speed 600]
+    python fleet.py run events.jsonl --fleet robots.json
+
+robots.json lists real robots: [{"name": "ot2-1", "url": "http://localhost:8042",
+"start": "ssh root@ot2-1 'cd /data/10x && python multi_8sample.py --control-port 8042'"}];
+the operator answers prompts at each robot (or over its control plane) and the
+fleet shows who's waiting.
+"""
+import json
+import shlex
+import subprocess
+import sys
+import time
+import urllib.request
+
+import time_model
+
+## OPERATOR ##
+# s the operator spends at a robot per visit, by prompt
+VISIT_SEC = {
+    "press enter to proceed to: dyn_cleanup_amplification": 600,            # reagents & deck
+    "press enter to continue...": 1200,                                     # GEM loading, recovery agent off
+    "press enter to proceed to: cDNA_cleanup_pellet_cleanup": 120,
+    "press enter to proceed to: frag_end_repair_a_tailing_size_sel": 900,   # step 3 reagents, ethanol, tips
+}
+DEFAULT_VISIT_SEC = 300     # tip reloads & anything else
+UNLOAD_SEC = 600            # final product off at the end of a run
+TURNAROUND_SEC = 1800       # robot cleaned & loaded for the next run, before its first visit
+SAMPLES_PER_COLUMN = 8
+POLL_SEC = 5
+SIM_POLL_SEC = 10          # run clock s between polls of simulated robots
+
+
+## TIMELINE ##
+def timeline(path: str) -> dict:
+    """a run's shape from its event stream: length, stages & visits, in run clock s excluding operator time"""
+    visits, stages, columns, end = [], [], 1, 0
+    with open(path) as f:
+        for line in f:
+            rec = json.loads(line)
+            end = max(end, rec['t'])
+            if rec['event'] == 'stage_start':
+                stages.append((rec['t'], rec['stage']))
+            elif rec['event'] == 'note' and rec['message'] == 'operator':
+                visits.append((rec['t'], rec['prompt'], VISIT_SEC.get(rec['prompt'], DEFAULT_VISIT_SEC)))
+            elif rec['event'] == 'note' and rec['message'] == 'run started':
+                columns = rec.get('columns', 1)
+    visits.append((end, "unload final product", UNLOAD_SEC))
+    return dict(sec=end, visits=visits, stages=stages, columns=columns)
+
+
+def windows(run: dict, start: float) -> list:
+    """[(from, to)] the operator is at the robot, for a run started at `start`"""
+    out, waited = [], 0
+    for t, _, sec in run['visits']:
+        out.append((start + t + waited, start + t + waited + sec))
+        waited += sec
+    return out
+
+
+def run_sec(run: dict) -> float:
+    """start to unloaded, operator visits included"""
+    return run['sec'] + sum(sec for _, _, sec in run['visits'])
+
+
+## PLAN ##
+def plan(run: dict, robots: int, horizon: float) -> list:
+    """[(robot, start s)] of the runs that start within horizon, earliest first"""
+    busy = []                   # operator windows planned so far
+    free = [0.0]*robots         # when each robot can start its next run
+    runs = []
+    while True:
+        r = min(range(robots), key=lambda i: free[i])
+        start = free[r]
+        while True:
+            shift = _clash(windows(run, start), busy)
+            if not shift:
+                break
+            start += shift
+        if start >= horizon:
+            return runs
+        runs.append((r, start))
+        busy += windows(run, start)
+        free[r] = start + run_sec(run) + TURNAROUND_SEC
+
+
+def _clash(wins: list, busy: list) -> float:
+    """s the first window overlapping a busy one has to move back to follow it, 0 if none do"""
+    for w in wins:
+        for b in busy:
+            if w[0] < b[1] and b[0] < w[1]:
+                return b[1] - w[0]
+    return 0
+
+
+def describe(run: dict, runs: list, robots: int, horizon: float) -> str:
+    lines = ["{:<10}{:>6}{:>12}{:>12}".format("robot", "run", "start", "unloaded")]
+    for i, (r, start) in enumerate(runs):
+        lines.append("{:<10}{:>6}{:>12}{:>12}".format("ot2-" + str(r + 1), i + 1, time_model.hms(start), time_model.hms(start + run_sec(run))))
+    operator = sum(sec for _, _, sec in run['visits'])*len(runs)
+    samples = len(runs)*run['columns']*SAMPLES_PER_COLUMN
+    lines.append("")
+    lines.append("run: " + time_model.hms(run['sec']) + " on the robot, " + str(len(run['visits'])) + " operator visits, "
+                 + time_model.hms(run_sec(run)) + " with them")
+    lines.append(str(robots) + " robots, " + str(len(runs)) + " runs starting in " + time_model.hms(horizon) + ": "
+                 + str(samples) + " samples, " + str(round(samples*86400/horizon, 1)) + " samples/day, operator busy "
+                 + time_model.hms(operator))
+    return "\n".join(lines)
+
+
+## ROBOTS ##
+class SimRobot:
+    """replays a simulated run on a clock running `speed` times faster; holds at each visit until answered"""
+    def __init__(self, name: str, run: dict, speed: float = 1):
+        self.name = name
+        self.run = run
+        self.speed = speed
+        self.t = None               # run clock s, None before start()
+        self.last = None
+        self.visit = 0              # index of the next visit
+        self.pending = None         # prompt waiting for the operator
+
+    def start(self):
+        self.t, self.last, self.visit, self.pending = 0, time.monotonic(), 0, None
+
+    def status(self) -> dict:
+        if self.t is None:
+            return dict(stage='idle', pending=None, done=False)
+        now = time.monotonic()
+        if self.pending is None:
+            self.t += (now - self.last)*self.speed
+        self.last = now
+        visits = self.run['visits']
+        if self.pending is None and self.visit < len(visits) and visits[self.visit][0] <= self.t:
+            self.t = visits[self.visit][0]
+            self.pending = visits[self.visit][1]
+        stage = ([name for t, name in self.run['stages'] if t <= self.t] or ['setup'])[-1]
+        return dict(stage=stage, pending=self.pending, done=self.pending is None and self.visit >= len(visits))
+
+    def answer(self):
+        self.pending = None
+        self.visit += 1
+
+
+class Robot:
+    """an OT-2 running multi_8sample.py with --control-port, started by a shell command"""
+    def __init__(self, name: str, url: str, start: str):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.command = start
+        self.proc = None
+
+    def start(self):
+        self.proc = subprocess.Popen(shlex.split(self.command))
+
+    def status(self) -> dict:
+        if self.proc is None:
+            return dict(stage='idle', pending=None, done=False)
+        try:
+            with urllib.request.urlopen(self.url + '/state', timeout=POLL_SEC) as r:
+                state = json.load(r)
+        except OSError:
+            return dict(stage='starting' if self.proc.poll() is None else 'done', pending=None, done=self.proc.poll() is not None)
+        pending = state['pending'][0]['prompt'] if state['pending'] else None
+        return dict(stage=state['stage'], pending=pending, done=False)
+
+    def answer(self):
+        pass        # the operator answers at the robot or over its control plane
+
+
+## DISPATCH ##
+class Fleet:
+    def __init__(self, robots: list, speed: float = 1, sim: bool = False):
+        self.robots = robots
+        self.speed = speed          # run clock s per wall s
+        self.sim = sim              # operator visits take VISIT_SEC by themselves
+        self.queue = []             # [(robot, start)] not dispatched yet
+
+    def dispatch(self, runs: list):
+        """start each planned run on time, show stages & waiting prompts until all are done"""
+        self.queue = sorted(runs, key=lambda rs: rs[1])
+        t0 = time.monotonic()
+        answer_at = {}              # robot -> fleet s its simulated operator visit ends
+        active = set()
+        shown = None
+        while self.queue or active:
+            now = (time.monotonic() - t0)*self.speed
+            while self.queue and self.queue[0][1] <= now and self.queue[0][0] not in active:
+                r, _ = self.queue.pop(0)
+                self.robots[r].start()
+                active.add(r)
+                print(time_model.hms(now) + " " + self.robots[r].name + ": run started", flush=True)
+            lines = []
+            for r in sorted(active):
+                robot = self.robots[r]
+                state = robot.status()
+                if state['done']:
+                    active.discard(r)
+                    print(time_model.hms(now) + " " + robot.name + ": run done", flush=True)
+                    continue
+                if state['pending'] and self.sim:
+                    end = answer_at.setdefault(r, now + VISIT_SEC.get(state['pending'], DEFAULT_VISIT_SEC))
+                    if now >= end:
+                        robot.answer()
+                        del answer_at[r]
+                lines.append(robot.name + " " + state['stage'] + (" WAITING: " + state['pending'] if state['pending'] else ""))
+            if lines != shown:
+                print(time_model.hms(now) + " | " + " | ".join(lines), flush=True)
+                shown = lines
+            time.sleep(min(POLL_SEC, SIM_POLL_SEC/self.speed) if self.sim else POLL_SEC)
+
+
+if __name__ == '__main__':
+    _mode = sys.argv[1] if len(sys.argv) > 1 else 'plan'
+    _events = sys.argv[2] if len(sys.argv) > 2 and not sys.argv[2].startswith('--') else 'events.jsonl'
+    _run = timeline(_events)
+    if '--fleet' in sys.argv:
+        with open(sys.argv[sys.argv.index('--fleet') + 1]) as f:
+            _robots = [Robot(**r) for r in json.load(f)]
+    else:
+        _speed = float(sys.argv[sys.argv.index('--speed') + 1]) if '--speed' in sys.argv else 600
+        _n = int(sys.argv[sys.argv.index('--robots') + 1]) if '--robots' in sys.argv else 8
+        _robots = [SimRobot("ot2-" + str(i + 1), _run, _speed) for i in range(_n)]
+    _horizon = float(sys.argv[sys.argv.index('--hours') + 1])*3600 if '--hours' in sys.argv else 86400
+    _runs = plan(_run, len(_robots), _horizon)
+    print(describe(_run, _runs, len(_robots), _horizon))
+    if _mode == 'run':
+        _sim = '--fleet' not in sys.argv
+        Fleet(_robots, _robots[0].speed if _sim else 1, _sim).dispatch(_runs)
@@ -0,0 +1,156 @@
+"""liquid heights: mm of liquid in a well for a volume, from the well's geometry
+
+heights.json describes each labware's wells from the bottom up, on top of its
+labware definition (shape, diameter or x/y, depth):
+
+    definition      a custom definition file; standard labware comes from opentrons
+    depth           mm the tip can go below the top, when that isn't the definition's
+    bottom          the tapered part: its height, and its diameter (or x, y) at the
+                    floor; it widens linearly to the definition's size, straight above
+    calibration     [[ul, mm]] measured in the wet, overrides the geometry up to the
+                    largest volume measured; above it, heights go up as the geometry's do
+    note            where the numbers come from
+
+load() integrates every well's cross-section, STEP_MM at a time, once, into a
+Table of volume & height arrays; height() and volume() are a bisect & a linear
+interpolation in them. The liquid ledger (ledger.py) follows the meniscus with
+these, and the protocol's dispense & blow-out heights in the mag plate
+(getMagWellHeight) come from its table.
+
+`python heights.py [heights.json]` checks every entry and prints each table
+next to the definition's straight-walled model.
+"""
+import bisect
+import json
+import math
+import sys
+from array import array
+
+from opentrons_shared_data.labware import load_definition
+
+STEP_MM = 0.05          # integration step, far under the gantry's precision
+
+
+class Table:
+    """a well's volume -> height lookup, both ways"""
+    def __init__(self, name: str, volumes: list, heights: list, depth: float):
+        self.name = name
+        self.volumes = array('d', volumes)      # ul, ascending, from 0
+        self.heights = array('d', heights)      # mm above the bottom
+        self.depth = depth
+
+    def height(self, ul: float) -> float:
+        """mm of liquid above the bottom, the top once it's full"""
+        return _lookup(self.volumes, self.heights, ul)
+
+    def volume(self, mm: float) -> float:
+        """ul up to mm above the bottom"""
+        return _lookup(self.heights, self.volumes, mm)
+
+    def capacity(self) -> float:
+        return self.volumes[-1]
+
+
+def _lookup(xs: array, ys: array, x: float) -> float:
+    if x <= xs[0]:
+        return ys[0]
+    i = bisect.bisect_left(xs, x)
+    if i >= len(xs):
+        return ys[-1]
+    return ys[i - 1] + (ys[i] - ys[i - 1])*(x - xs[i - 1])/(xs[i] - xs[i - 1])
+
+
+def table(name: str, well: dict, geometry: dict) -> Table:
+    """a labware's table from its definition's A1 well & its heights.json entry"""
+    depth = geometry.get('depth', well['depth'])
+    bottom = geometry.get('bottom', {})
+    taper = bottom.get('height', 0)
+    volumes, heights = [0.0], [0.0]
+    for i in range(1, int(math.ceil(depth/STEP_MM - 1e-9)) + 1):
+        step = min(i*STEP_MM, depth) - heights[-1]      # the last one ends at the top
+        z = heights[-1] + step/2
+        f = min(z/taper, 1) if taper else 1         # how far the taper has widened
+        if well['shape'] == 'circular':
+            d = bottom.get('diameter', well['diameter'])
+            area = math.pi*(d + (well['diameter'] - d)*f)**2/4
+        else:
+            x = bottom.get('x', well['xDimension'])
+            y = bottom.get('y', well['yDimension'])
+            area = (x + (well['xDimension'] - x)*f)*(y + (well['yDimension'] - y)*f)
+        volumes.append(volumes[-1] + area*step)
+        heights.append(heights[-1] + step)
+    points = sorted(geometry.get('calibration', []))
+    if points:
+        ul, mm = points[-1]
+        shift = mm - _lookup(array('d', volumes), array('d', heights), ul)
+        above = [(v, h + shift) for v, h in zip(volumes, heights) if v > ul and h + shift < depth]
+        top = depth - shift         # the geometry's height where the calibrated liquid reaches the top
+        if top <= heights[-1]:
+            full = _lookup(array('d', heights), array('d', volumes), top)
+        else:                       # past the geometry's top: its top cross-section on up
+            full = volumes[-1] + (top - heights[-1])*(volumes[-1] - volumes[-2])/(heights[-1] - heights[-2])
+        if full > ul:
+            above.append((full, depth))
+        volumes, heights = [0.0] + [p[0] for p in points] + [v for v, _ in above], [0.0] + [p[1] for p in points] + [h for _, h in above]
+    return Table(name, volumes, heights, depth)
+
+
+def load(path: str = 'heights.json') -> dict:
+    """load name -> Table; raises with every problem found"""
+    with open(path) as f:
+        entries = json.load(f)['labware']
+    errors = []
+    tables = {}
+    for name, geometry in entries.items():
+        well = a1(name, geometry)
+        problems = check(well, geometry)
+        errors += [name + ": " + e for e in problems]
+        if not problems:
+            tables[name] = table(name, well, geometry)
+    if errors:
+        raise Exception(path + ":\n    " + "\n    ".join(errors))
+    return tables
+
+
+def a1(name: str, geometry: dict) -> dict:
+    """the definition's A1 well, every well being alike"""
+    if 'definition' in geometry:
+        with open(geometry['definition']) as f:
+            return json.load(f)['wells']['A1']
+    return load_definition(name, 1)['wells']['A1']
+
+
+def check(well: dict, geometry: dict) -> list:
+    """what's wrong with an entry, [] if nothing"""
+    errors = []
+    def need(ok: bool, message: str):
+        if not ok:
+            errors.append(message)
+    depth = geometry.get('depth', well['depth'])
+    bottom = geometry.get('bottom', {})
+    need(depth > 0, "depth must be over 0mm")
+    need(0 <= bottom.get('height', 0) <= depth, "the bottom's height must be between 0mm and the depth")
+    sizes = ('diameter',) if well['shape'] == 'circular' else ('x', 'y')
+    need(all(k in sizes or k == 'height' for k in bottom), "a " + well['shape'] + " well's bottom has " + " & ".join(sizes))
+    need(all(bottom[k] >= 0 for k in sizes if k in bottom), "bottom sizes can't be negative")
+    points = sorted(geometry.get('calibration', []))
+    need(all(0 < ul and 0 < mm <= depth for ul, mm in points), "calibration points must be [ul, mm] over 0, within the depth")
+    need(all(a[1] < b[1] for a, b in zip(points, points[1:])), "calibration heights must go up with volume")
+    return errors
+
+
+if __name__ == '__main__':
+    _path = sys.argv[1] if len(sys.argv) > 1 else 'heights.json'
+    _tables = load(_path)
+    with open(_path) as f:
+        _entries = json.load(f)['labware']
+    for _name, _t in _tables.items():
+        _well = a1(_name, _entries[_name])
+        print(_name + ": " + str(round(_t.capacity())) + "ul in " + str(_t.depth) + "mm"
+              + (", wet-calibrated" if _entries[_name].get('calibration') else ""))
+        print("{:>10}{:>10}{:>14}".format("ul", "mm", "definition"))
+        for _frac in (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9, 1):
+            _ul = _t.capacity()*_frac
+            _linear = _well['depth']*min(_ul/_well['totalLiquidVolume'], 1)
+            print("{:>10}{:>10}{:>14}".format(round(_ul, 1), round(_t.height(_ul), 2), round(_linear, 2)))
+        print()
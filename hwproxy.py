@@ -0,0 +1,167 @@
+"""thin wrappers around the pipettes, modules & protocol context
+
+Every method call on a Traced object is reported to the listeners on BUS
+before and after it runs. Simulation timing, logging and accounting hook in
+here instead of being sprinkled through the protocol.
+"""
+import functools
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Command:
+    source: str             # p20, p300, mag, tc, protocol
+    name: str               # method called on source, e.g. aspirate
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+    def arg(self, key: str, pos: int, default=None):
+        """fetch an argument whether it was passed by position or keyword"""
+        if key in self.kwargs:
+            return self.kwargs[key]
+        if pos < len(self.args):
+            return self.args[pos]
+        return default
+
+
+class Bus:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def before(self, cmd: Command):
+        for l in self.listeners:
+            if hasattr(l, 'before'):
+                l.before(cmd)
+
+    def after(self, cmd: Command):
+        for l in self.listeners:
+            if hasattr(l, 'after'):
+                l.after(cmd)
+
+    def stage_start(self, name: str):
+        for l in self.listeners:
+            if hasattr(l, 'stage_start'):
+                l.stage_start(name)
+
+    def stage_end(self, name: str):
+        for l in self.listeners:
+            if hasattr(l, 'stage_end'):
+                l.stage_end(name)
+
+
+BUS = Bus()
+WINDOW = None       # peephole.Window every traced command passes through when set, see peephole.py
+
+
+def issue(cmd: Command, thunk):
+    """run a traced command, or hand it to the peephole window to run"""
+    if WINDOW is None:
+        return thunk()
+    return WINDOW.issue(cmd, thunk)
+
+
+def stage(fn):
+    """marks a protocol stage; listeners see its start & end"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        BUS.stage_start(fn.__name__)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            BUS.stage_end(fn.__name__)
+    return wrapper
+
+
+def call(source: str, name: str, fn, *args, **kwargs):
+    """run fn as a traced command, for hardware calls that aren't Traced methods"""
+    cmd = Command(source, name, args, kwargs)
+
+    def run():
+        BUS.before(cmd)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            BUS.after(cmd)
+    return issue(cmd, run)
+
+
+class Traced:
+    def __init__(self, target, name: str, recover=None):
+        """recover(cmd, exc) -> True retries a failed call once, e.g. after the operator reloads tips"""
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_recover', recover)
+
+    def __getattr__(self, attr):
+        val = getattr(self._target, attr)
+        if attr.startswith('_') or not callable(val):
+            return val
+
+        def call(*args, **kwargs):
+            cmd = Command(self._name, attr, args, kwargs)
+
+            def run():
+                BUS.before(cmd)
+                try:
+                    try:
+                        return val(*args, **kwargs)
+                    except Exception as exc:
+                        if self._recover is None or not self._recover(cmd, exc):
+                            raise
+                    return val(*args, **kwargs)
+                finally:
+                    BUS.after(cmd)
+            return issue(cmd, run)
+        return call
+
+    def __setattr__(self, attr, val):
+        # reported too: e.g. default_speed changes how long later moves take
+        cmd = Command(self._name, 'setattr', (attr, val))
+
+        def run():
+            BUS.before(cmd)
+            setattr(self._target, attr, val)
+            BUS.after(cmd)
+        issue(cmd, run)
+
+    def __repr__(self):
+        return repr(self._target)
+
+    def __str__(self):
+        return str(self._target)
+
+
+def well_at(loc):
+    """(well, below its top) for a Well or a Location in one, (None, False) otherwise"""
+    if loc is None:
+        return None, False
+    if hasattr(loc, 'labware'):         # Location
+        lw = loc.labware
+        if not lw.is_well:
+            return None, False
+        well = lw.as_well()
+        return well, loc.point.z < well.top().point.z - 0.5
+    if hasattr(loc, 'well_name'):       # Well: aspirate/dispense default to its bottom
+        return loc, True
+    return None, False
+
+
+class Counter:
+    """counts hardware commands per source/name"""
+    def __init__(self):
+        self.counts = {}
+
+    def before(self, cmd: Command):
+        if cmd.name == 'setattr':
+            return
+        key = cmd.source + '.' + cmd.name
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def total(self) -> int:
+        return sum(self.counts.values())
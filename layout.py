@@ -0,0 +1,35 @@
+"""which plate columns each role uses when running NUM_COLS columns of 8 samples
+
+Every role (a mag well, a tc well, a tubestrip on the temp block, ...) gets
+one column per sample column, or a single column for stocks shared by all of
+them. Roles are packed in order from `first`, stepping by `step` (mag plate
+counts down from A12, tc & temp plates count up), so NUM_COLS = 1 reproduces
+the original single-column positions.
+"""
+
+
+def allocate(
+    plate,
+    plate_name: str,
+    roles: list,
+    first: int,
+    step: int = 1,
+    hint: str = "run fewer columns"
+) -> dict:
+    """roles: [(role, n_cols)] -> {role: [A-row wells]}, raises with `hint` if the plate runs out of columns"""
+    wells = {}
+    col = first
+    for role, n in roles:
+        cols = [col + step*k for k in range(n)]
+        if any(c < 1 or c > 12 for c in cols):
+            need = sum(n for _, n in roles)
+            raise Exception(plate_name + " needs " + str(need) + " columns from A" + str(first)
+                            + ", " + role + " does not fit: " + hint)
+        wells[role] = [plate['A' + str(c)] for c in cols]
+        col += step*n
+    return wells
+
+
+def describe(wells: dict) -> str:
+    """role: A1 A2 ... one role per line, for operator prompts"""
+    return "\n".join("    " + role + ": " + " ".join(w.well_name for w in ws) for role, ws in wells.items())
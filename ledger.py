@@ -0,0 +1,125 @@
+"""liquid ledger: how much is in every well, and where its surface is
+
+LiquidLedger watches every traced aspirate & dispense (it subscribes to
+hwproxy.BUS) into the labware it is given and keeps the volume in each well.
+Plates are pipetted a column at a time, so an A-row well stands for its
+column and holds ul per channel; a reservoir trough is shared by all 8
+channels and holds its total.
+
+height() turns a volume into mm of liquid above the well bottom: from the
+height table given for that labware (heights.py: well geometry & wet
+calibrations), else straight walls from its definition (depth, max volume).
+surface() gives a location just under (or over) the meniscus, so the tip can
+follow the liquid down instead of sitting at a fixed height off the bottom.
+"""
+from opentrons import types
+
+import hwproxy
+from hwproxy import Command
+
+CHANNELS        = 8         # p20 & p300 multi gen2
+SHARED_WIDTH    = 60        # mm; a well wider than the 8 channels span is a trough
+SUBMERGE_MM     = 2         # tip depth below the surface when aspirating
+FLOOR_MM        = 0.5       # never closer to the bottom than this
+
+
+class LiquidLedger:
+    def __init__(self, *labware, note=None, warn=None):
+        """note(message, **fields) records each stock loaded, e.g. EventLog.note; warn(...) each stock run dry, e.g. EventLog.warn"""
+        self.labware = set(labware)
+        self.note = note
+        self.warn = warn
+        self.volumes = {}       # well -> ul (per channel, or total for a trough)
+        self.calibrated = {}    # labware -> fn(ul per channel) -> mm
+        self.bottoms = {}       # labware -> calibrated bottom, mm below the top
+        self.loaded = set()     # wells the operator fills, reported at the end
+        self.stocks = set()     # loaded wells that must not run dry
+        self.low = set()        # stocks already warned about
+
+    def load(self, well, vol: float):
+        """what the operator puts in a well, ul per channel (total for a trough)"""
+        self.volumes[well] = vol
+        self.loaded.add(well)
+
+    def stock(self, well, vol: float):
+        """a reagent shared by several transfers; samples & aliquots are routinely drawn off completely"""
+        self.load(well, vol)
+        self.stocks.add(well)
+        if self.note is not None:
+            self.note('stock', well=str(well), ul=vol, channels=self._channels(well))
+
+    def calibrate(self, labware, height_fn, bottom: float = None):
+        """volume -> height for a labware (e.g. heights.Table.height), overrides its definition
+
+        bottom: mm below the top the tip reaches the bottom, when that isn't the definition's depth
+        """
+        self.calibrated[labware] = height_fn
+        if bottom is not None:
+            self.bottoms[labware] = bottom
+
+    def volume(self, well) -> float:
+        return self.volumes.get(well, 0)
+
+    def height(self, well, extra: float = 0) -> float:
+        """mm of liquid above the bottom once `extra` ul per channel more (negative: less) went in"""
+        vol = max(self.volume(well) + extra*self._channels(well), 0)
+        if well.parent in self.calibrated:
+            return self.calibrated[well.parent](vol)
+        return well.depth*min(vol/well.max_volume, 1)
+
+    def surface(self, well, extra: float = 0, depth: float = SUBMERGE_MM, at=None, floor: float = FLOOR_MM):
+        """`depth` mm under the surface (negative: above it) after `extra` ul, never below `floor`
+
+        at: a location in the well whose x/y offset is kept, e.g. a mag position
+        """
+        z = max(self.height(well, extra) - depth, floor)
+        base = (at or well.bottom()).point
+        return types.Location(types.Point(base.x, base.y, self._bottom_z(well) + z), well)
+
+    def _bottom_z(self, well) -> float:
+        if well.parent in self.bottoms:
+            return well.top().point.z - self.bottoms[well.parent]
+        return well.bottom().point.z
+
+    def _channels(self, well) -> int:
+        return CHANNELS if (well.width or 0) > SHARED_WIDTH else 1
+
+    ## CHECKPOINT ##
+    def state(self) -> dict:
+        return dict(
+            volumes = {str(w): vol for w, vol in self.volumes.items()},
+            loaded = [str(w) for w in self.loaded],
+            stocks = [str(w) for w in self.stocks],
+            low = [str(w) for w in self.low])
+
+    def restore(self, state: dict, wells: dict):
+        """wells: str(well) -> well"""
+        self.volumes = {wells[w]: vol for w, vol in state['volumes'].items()}
+        self.loaded = {wells[w] for w in state['loaded']}
+        self.stocks = {wells[w] for w in state['stocks']}
+        self.low = {wells[w] for w in state['low']}
+
+    ## BUS LISTENER ##
+    def after(self, cmd: Command):
+        if cmd.name not in ('aspirate', 'dispense'):
+            return
+        well, _ = hwproxy.well_at(cmd.arg('location', 1))
+        if well is None or well.parent not in self.labware:
+            return
+        vol = (cmd.arg('volume', 0) or 0)*self._channels(well)
+        if cmd.name == 'aspirate':
+            # 1ul slack: loads are rounded, e.g. 50ul drawn as 3 x 16.67
+            if vol > self.volume(well) + 1 and well in self.stocks and well not in self.low:
+                self.low.add(well)
+                if self.warn is not None:
+                    self.warn('stock ran dry', well=str(well), ul=vol, left=round(self.volume(well), 1))
+            self.volumes[well] = max(self.volume(well) - vol, 0)
+        else:
+            self.volumes[well] = self.volume(well) + vol
+
+    def report(self) -> str:
+        lines = ["{:>10}  {}".format("ul left", "loaded well")]
+        for well, vol in self.volumes.items():
+            if well in self.loaded:
+                lines.append("{:>10}  {}".format(round(vol, 1), well))
+        return "\n".join(lines)
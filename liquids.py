@@ -0,0 +1,87 @@
+"""liquid classes: how each reagent is aspirated, carried & dispensed
+
+liquids.json holds a class per kind of liquid the protocol moves, and the
+transfer helpers take every rate, pause & speed from the class of what they
+move, so a viscous bead suspension is handled slowly and an aqueous buffer at
+the pipette's full speed:
+
+    aspirate_rate       x the pipette's default flow rate
+    dispense_rate
+    aspirate_delay      s the tip stays in the liquid after aspirating, the plunger catching up
+    dispense_delay      s after dispensing (and again before a blow-out), before the tip moves
+    withdraw_speed      mm/s out of the liquid after aspirating, null: the gantry's own
+    rise_speed          mm/s up off a dispense to blow out over it, null: the gantry's own
+    air_gap             ul of air over the liquid, holding it in the tip on the way
+    drip_delay          s the tip is held over the liquid before it moves on or blows out
+    p20, p300           any of the above for that pipette only
+    note                what the liquid is & why its numbers are what they are
+
+Anything left out is the aqueous default: full rates, no pauses, no air gap.
+Mixes are pipetted as a class too (mixing.py): one handled differently from a
+transfer of the same liquid, e.g. settled bead stock mixed hard, has its own.
+
+`python liquids.py [liquids.json]` checks every class and prints it per pipette.
+"""
+import json
+import sys
+from dataclasses import dataclass, fields
+
+PIPETTES = ('p20', 'p300')
+MAX_RATE = 2.0          # x the default flow rate, over it gen2 pipettes stall
+
+
+@dataclass
+class LiquidClass:
+    name: str
+    aspirate_rate: float = 1.0
+    dispense_rate: float = 1.0
+    aspirate_delay: float = 0
+    dispense_delay: float = 0
+    withdraw_speed: float = None
+    rise_speed: float = None
+    air_gap: float = 0
+    drip_delay: float = 0
+    note: str = ''
+
+
+def load(path: str = 'liquids.json') -> dict:
+    """name -> pipette -> LiquidClass; raises with every problem found"""
+    with open(path) as f:
+        table = json.load(f)
+    errors = []
+    classes = {}
+    for name, raw in table['classes'].items():
+        base = {k: v for k, v in raw.items() if k not in PIPETTES}
+        for pip in PIPETTES:
+            try:
+                lc = LiquidClass(name=name, **dict(base, **raw.get(pip, {})))
+            except TypeError as e:
+                errors.append(name + ": " + str(e))
+                break
+            errors += [name + " (" + pip + "): " + e for e in check(lc)]
+            classes.setdefault(name, {})[pip] = lc
+    if errors:
+        raise Exception(path + ":\n    " + "\n    ".join(errors))
+    return classes
+
+
+def check(lc: LiquidClass) -> list:
+    """what's wrong with a class, [] if nothing"""
+    errors = []
+    def need(ok: bool, message: str):
+        if not ok:
+            errors.append(message)
+    need(0 < lc.aspirate_rate <= MAX_RATE and 0 < lc.dispense_rate <= MAX_RATE, "rates must be over 0 and at most " + str(MAX_RATE))
+    need(min(lc.aspirate_delay, lc.dispense_delay, lc.drip_delay) >= 0, "delays can't be negative")
+    need(all(s is None or s > 0 for s in (lc.withdraw_speed, lc.rise_speed)), "speeds must be over 0mm/s")
+    need(lc.air_gap >= 0, "air_gap can't be negative")
+    return errors
+
+
+if __name__ == '__main__':
+    _path = sys.argv[1] if len(sys.argv) > 1 else 'liquids.json'
+    _cols = [f.name for f in fields(LiquidClass) if f.name not in ('name', 'note')]
+    print("{:<20}".format("class") + "".join("{:>16}".format(c) for c in _cols))
+    for _name, _by_pip in load(_path).items():
+        for _pip, _lc in _by_pip.items():
+            print("{:<20}".format(_name + " " + _pip) + "".join("{:>16}".format(str(getattr(_lc, c))) for c in _cols))
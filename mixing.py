@@ -0,0 +1,110 @@
+"""mixing by aspirate/dispense cycles, to a cycle count or a time budget
+
+Mixer.mix() runs `cycles` cycles, or as many whole cycles as fit in `seconds`:
+before each cycle it checks the cycle still ends inside the budget, using the
+latency measured on earlier cycles of the same pipette, volume & liquid class,
+and waits out what's left with a delay. A timed incubation ends on time instead
+of up to a cycle late, and runs the same number of cycles every time. A
+budget shorter than one cycle (or none left at all) still gets one, as the
+while loops it replaces did. The first cycle of a mix carries the move into
+the well, so latency is measured on the cycles after it; until a key has any,
+a mix goes by its own first cycle.
+
+Each mix is pipetted as a liquid class (liquids.py) of the pipette: a cycle is
+an aspirate & a dispense at the class's rates, each followed by its pause, and
+a dispense point above the aspirate is reached at its withdraw speed. A mix
+handled differently from a transfer of the same liquid has a class of its own
+in liquids.json (bead_stock, bead_mix, bead_inc, elution_mix, gentle, ...).
+
+Every mix is noted in the event stream (cycles planned & run, budget & time
+taken, cycle latency); report() totals them per label.
+"""
+import time_model
+
+
+class Mixer:
+    def __init__(self, protocol, clock, classes: dict, note=None):
+        """classes: liquids.load()'s name -> pipette -> LiquidClass
+        note(message, **fields) records each mix, e.g. EventLog.note"""
+        self.protocol = protocol
+        self.clock = clock
+        self.classes = classes
+        self.note = note
+        self.latency = {}           # (pipette, ul, liquid class) -> [s, cycles] measured so far
+        self.totals = {}            # label -> [mixes, cycles, s budgeted, s taken]
+
+    def mix(
+        self,
+        pip,
+        vol: float,
+        loc,
+        cycles: int = None,
+        seconds: float = None,
+        liquid: str = 'aqueous',
+        label: str = 'mix',
+        dispense_at = None
+    ) -> int:
+        """cycles, or seconds to mix for, as liquid class `liquid`; returns cycles run
+        dispense_at: dispense there instead of at loc, e.g. higher up in the well"""
+        if (cycles is None) == (seconds is None):
+            raise Exception("mix " + label + ": give cycles or seconds")
+        liq = self.classes[liquid][pip._name]
+        key = (pip._name, round(vol), liquid)
+        start = self.clock.monotonic()
+        cycle = self.cycle_sec(key)
+        planned = cycles
+        if seconds is not None and cycle is not None:
+            planned = max(int(seconds//cycle), 1)
+        run = 0
+        while True:
+            if cycles is not None and run >= cycles:
+                break
+            if seconds is not None and run > 0 and self.clock.monotonic() + cycle > start + seconds:
+                break
+            t = self.clock.monotonic()
+            pip.aspirate(vol, loc, rate=liq.aspirate_rate)
+            if liq.aspirate_delay:
+                self.protocol.delay(seconds=liq.aspirate_delay)
+            if dispense_at is not None:
+                pip.move_to(dispense_at, speed=liq.withdraw_speed)
+            pip.dispense(vol, loc if dispense_at is None else dispense_at, rate=liq.dispense_rate)
+            if liq.dispense_delay:
+                self.protocol.delay(seconds=liq.dispense_delay)
+            run += 1
+            if run > 1:
+                self._measured(key, self.clock.monotonic() - t)
+            if self.cycle_sec(key) is not None:
+                cycle = self.cycle_sec(key)
+            elif cycle is None:
+                cycle = self.clock.monotonic() - t
+        if seconds is not None and start + seconds > self.clock.monotonic():
+            self.protocol.delay(seconds=start + seconds - self.clock.monotonic())
+        took = self.clock.monotonic() - start
+        totals = self.totals.setdefault(label, [0, 0, 0, 0])
+        totals[0] += 1
+        totals[1] += run
+        totals[2] += seconds or 0
+        totals[3] += took
+        if self.note is not None:
+            self.note('mix', label=label, pipette=pip._name, ul=vol, liquid=liquid, planned=planned, cycles=run,
+                      budget=seconds, took=round(took, 3), cycle_sec=round(cycle or 0, 3))
+        return run
+
+    def cycle_sec(self, key: tuple) -> float:
+        """mean latency of a cycle measured so far, None before the first"""
+        if key not in self.latency:
+            return None
+        sec, n = self.latency[key]
+        return sec/n
+
+    def _measured(self, key: tuple, sec: float):
+        total = self.latency.setdefault(key, [0, 0])
+        total[0] += sec
+        total[1] += 1
+
+    def report(self) -> str:
+        lines = ["{:<40}{:>8}{:>8}{:>12}{:>12}".format("mix", "mixes", "cycles", "budget", "taken")]
+        for label, (n, cycles, budget, took) in self.totals.items():
+            lines.append("{:<40}{:>8}{:>8}{:>12}{:>12}".format(label, n, cycles, time_model.hms(budget) if budget else "-", time_model.hms(took)))
+        return "\n".join(lines)
+
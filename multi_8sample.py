@@ -1,43 +1,226 @@
-import datetime  # for more timing
 import json
-import time  # for countdown timing
+import sys
+from types import SimpleNamespace
 
-import opentrons.execute
-import opentrons.simulate
 from opentrons import types  # for custom pipette positioning
 from opentrons import protocol_api
 
-metadata = {"apiLevel" : "2.12"}
-protocol = opentrons.execute.get_protocol_api('2.12')
+import checkpoint
+import clock        # wall clock on the robot, virtual clock when simulating
+import control
+import deadlines as deadline_service
+import deck
+import events
+import hwproxy
+import layout
+import ledger
+import mixing
+import peephole
+import profiler
+import scheduler
+import heights
+import liquids
+import stages
+import tc_profiles
+import thermal as thermal_planner
+import time_model
+import tips as tip_policy
 
-protocol.home()
+metadata = {"apiLevel" : "2.12"}
 
-## LOADED VOLUMES ##
-STATE = dict(
-    spri_stock_vol  = 4000,  # 3600 required, 5k for safety
-    eb_stock_vol    = 4000,  # 1928 required, 5k for safety
-    elu_stock_vol   = 2000,  # this value does not effect multi setup, lots extra required for multi reservior
-    eth_stock_vol   = 20000, # 24400 required, 27.5k for safety. Value is lower to account for evaporation
-)
+## SETTINGS & RUN SERVICES ##
+# importing this module touches nothing: configure() sets these from the command line,
+# connect() is the only place the robot (or the simulator) is acquired, see main()
+SIMULATE = False
+CLOCK = None
+CHECKPOINT = 'checkpoint.json'
+RESUME = False
+DECK = None
+STAGES = 'stages.json'
+PROFILES = 'tc_profiles.json'
+HEIGHTS = 'heights.json'
+LIQUIDS = 'liquids.json'
+EVENTS = None
+PROFILE = None
+PROFILER = None
+COUNTER = None
+ESTIMATOR = None
+PEEPHOLE = None
+CONTROL = None
+NUM_COLS = 1
+MULTIPLEX = True
+CONSOLIDATED_WASH = False
+ONLY = None
+STATE = None
+
+
+def configure(argv: list = ()):
+    """settings & run services from command line flags, each subscribed to a fresh hwproxy.BUS"""
+    global SIMULATE, CLOCK, CHECKPOINT, RESUME, DECK, STAGES, PROFILES, HEIGHTS, LIQUIDS, EVENTS, PROFILE, PROFILER
+    global COUNTER, ESTIMATOR, PEEPHOLE, CONTROL, NUM_COLS, MULTIPLEX, CONSOLIDATED_WASH, ONLY, STATE
+    argv = list(argv)
+
+    # the bus & peephole window carry only this run's services: configuring again (a sweep worker, a notebook) starts clean
+    hwproxy.BUS = hwproxy.Bus()
+    hwproxy.WINDOW = None
+
+    # `python multi_8sample.py --simulate` dry-runs the whole prep on a virtual clock
+    SIMULATE = '--simulate' in argv
+    CLOCK = clock.VirtualClock() if SIMULATE else clock.WallClock()
+
+    # every finished step is saved to `--checkpoint <file>` (checkpoint.json), `--resume` carries on after the last one
+    CHECKPOINT = argv[argv.index('--checkpoint') + 1] if '--checkpoint' in argv else 'checkpoint.json'
+    RESUME = '--resume' in argv
+
+    # labware slots, reservoir columns & offsets come from `--deck <file>` (deck.json), `python deck.py` searches for a faster one;
+    # offsets are measured per slot, the robot only runs a layout with one for every labware where it puts it
+    _deck = argv[argv.index('--deck') + 1] if '--deck' in argv else 'deck.json'
+    DECK = deck.load(_deck)
+    if not SIMULATE and deck.uncalibrated(DECK):
+        raise Exception(_deck + " puts labware where no offset was measured: " + ", ".join(deck.uncalibrated(DECK))
+                        + "; run labware position check there & add the offsets to " + _deck + ", or simulate with --simulate")
+
+    # stage parameters come from `--stages <file>` (stages.json), `python stages.py` checks one & prints its waits
+    STAGES = argv[argv.index('--stages') + 1] if '--stages' in argv else 'stages.json'
+    # and the thermocycler profiles they name from `--profiles <file>` (tc_profiles.json)
+    PROFILES = argv[argv.index('--profiles') + 1] if '--profiles' in argv else 'tc_profiles.json'
+
+    # liquid heights come from each labware's well geometry & wet calibrations in `--heights <file>` (heights.json)
+    HEIGHTS = argv[argv.index('--heights') + 1] if '--heights' in argv else 'heights.json'
+
+    # rates, pauses & speeds per liquid & pipette come from `--liquids <file>` (liquids.json), `python liquids.py` checks one
+    LIQUIDS = argv[argv.index('--liquids') + 1] if '--liquids' in argv else 'liquids.json'
+
+    # every command & stage goes to `--events <file>` (events.jsonl), `--events-port <port>` also sends it over UDP
+    EVENTS = events.EventLog(
+        CLOCK,
+        argv[argv.index('--events') + 1] if '--events' in argv else 'events.jsonl',
+        int(argv[argv.index('--events-port') + 1]) if '--events-port' in argv else None,
+        append = RESUME)
+    hwproxy.BUS.subscribe(EVENTS)   # ahead of the virtual clock, so it sees each command's start time
+
+    # `--profile <file>` writes time per stage, helper & command type as collapsed stacks (flamegraph.pl, speedscope)
+    PROFILE = argv[argv.index('--profile') + 1] if '--profile' in argv else None
+    PROFILER = profiler.Profiler(CLOCK, __file__) if PROFILE else None
+    if PROFILER is not None:
+        hwproxy.BUS.subscribe(PROFILER)     # ahead of the virtual clock too
+
+    # simulating, `--jitter <sd>` varies each pipette & magnet command's time by that fraction (`--seed <n>` repeats a run)
+    if SIMULATE:
+        hwproxy.BUS.subscribe(time_model.ClockDriver(
+            CLOCK,
+            float(argv[argv.index('--jitter') + 1]) if '--jitter' in argv else 0,
+            int(argv[argv.index('--seed') + 1]) if '--seed' in argv else None))
+    COUNTER = hwproxy.Counter()
+    hwproxy.BUS.subscribe(COUNTER)
+    ESTIMATOR = time_model.Estimator(CLOCK)     # predicted vs. actual time per stage
+    hwproxy.BUS.subscribe(ESTIMATOR)
+
+    # dead & mergeable pipette moves are rewritten before they run, `--no-peephole` runs the stream as written
+    PEEPHOLE = None if '--no-peephole' in argv else peephole.Window()
+    if PEEPHOLE is not None:
+        hwproxy.WINDOW = PEEPHOLE
+        hwproxy.BUS.subscribe(PEEPHOLE)
+
+    # operator prompts are answered at the terminal or over HTTP on `--control-port <port>` (see control.py),
+    # `--auto-continue <s>` continues one that needs no value after s; simulating, they auto-continue unless there's a port
+    CONTROL = None
+    if not SIMULATE or '--control-port' in argv:
+        CONTROL = control.ControlPlane(
+            int(argv[argv.index('--control-port') + 1]) if '--control-port' in argv else None,
+            float(argv[argv.index('--auto-continue') + 1]) if '--auto-continue' in argv else None,
+            note = EVENTS.note)
+        hwproxy.BUS.subscribe(CONTROL)
+
+    # `--columns N` preps N columns of 8 samples in one run
+    NUM_COLS = int(argv[argv.index('--columns') + 1]) if '--columns' in argv else 1
+    # the multiplex (CellPlex) libraries are prepped too unless `--no-multiplex`: their wells only fit with 1 column
+    MULTIPLEX = '--no-multiplex' not in argv
+
+    # `--consolidated-wash`: one tip fills every column with ethanol from the top, a tip per column takes it off after a timed soak
+    CONSOLIDATED_WASH = '--consolidated-wash' in argv
+
+    # `--only <stage>` runs that one stage on a freshly loaded deck, e.g. to time it on its own (bench.py)
+    ONLY = argv[argv.index('--only') + 1] if '--only' in argv else None
+
+    ## LOADED VOLUMES ##
+    # per column of samples; each column draws vol*8 from a stock
+    STATE = dict(
+        spri_stock_vol  = 4000*NUM_COLS,    # 3600 required, 5k for safety
+        eb_stock_vol    = 4000*NUM_COLS,    # 1928 required, 5k for safety
+        elu_stock_vol   = 2000*NUM_COLS,    # this value does not effect multi setup, lots extra required for multi reservior
+        dyn_stock_vol   = 1600*NUM_COLS,
+    )
 
 
-def run(protocol: protocol_api.ProtocolContext):
+def connect() -> protocol_api.ProtocolContext:
+    """the simulator's protocol context when simulating, the robot's (homed) otherwise"""
+    if SIMULATE:
+        import opentrons.simulate
+        return opentrons.simulate.get_protocol_api('2.12')
+    import opentrons.execute        # the robot's, not needed to simulate
+    protocol = opentrons.execute.get_protocol_api('2.12')
+    protocol.home()
+    return protocol
+
+
+ETH_COL_VOL  = 10000    # ul ethanol loaded per reservoir column, 3 per column: 24400 required
+ETH_DEAD_VOL = 1500     # ul a column isn't drawn below, ~3.7mm (heights.json); evaporation comes out of the spare columns
+
+## TIP BUDGET ##
+# fresh tips (columns of 8) step 3 picks up per column of samples, from --simulate;
+# racks are only replaced at the step 3 visit when fewer than this are left
+STEP_3_TIPS = dict(p20 = 21, p300 = 33)
+
+
+def log(message: str, **fields):
+    """progress message, recorded in the event stream & printed with the time"""
+    EVENTS.note(message, echo=True, **fields)
+    if CONTROL is not None:
+        CONTROL.status(message)
+
+
+def operator_input(prompt: str, details: list = None, check=None) -> str:
+    """blocks for the operator (terminal or control plane), auto-continues when simulating
+    details: instructions printed & served with the prompt; check(answer) -> error or None for a value"""
+    if PEEPHOLE is not None:
+        PEEPHOLE.flush()        # nothing left half done while the operator is at the deck
+    if CONTROL is None:
+        for line in details or []:
+            print(line)
+        print(prompt)
+        EVENTS.note('operator', prompt=prompt, by='simulate', answer="", waited=0)
+        return ""
+    return CONTROL.ask(prompt, details, check)
+
+
+def build(protocol: protocol_api.ProtocolContext) -> SimpleNamespace:
+    """labware, pipettes, modules & every helper and stage of the prep, nothing run yet;
+    the namespace holds them all by name, prep() runs the whole thing"""
+    if CLOCK is None:
+        configure()         # loaded by the Opentrons app: the default settings
     
     ## HARDWARE ##
-    t20_0  = protocol.load_labware('opentrons_96_tiprack_20ul', 9)
-    t20_1  = protocol.load_labware('opentrons_96_tiprack_20ul', 6)
-    t300_0 = protocol.load_labware('opentrons_96_tiprack_300ul', 2)
-    t300_1 = protocol.load_labware('opentrons_96_tiprack_300ul', 5)
-    t300_2 = protocol.load_labware('opentrons_96_tiprack_300ul', 8)
-    t300_3 = protocol.load_labware('opentrons_96_tiprack_300ul', 11)
-    r15 = protocol.load_labware('nest_12_reservoir_15ml', 3)
-    mag = protocol.load_module('magnetic module gen2', 4)
+    slots = DECK['slots']
+    t20_0  = protocol.load_labware('opentrons_96_tiprack_20ul', slots['t20_0'])
+    t20_1  = protocol.load_labware('opentrons_96_tiprack_20ul', slots['t20_1'])
+    t300_0 = protocol.load_labware('opentrons_96_tiprack_300ul', slots['t300_0'])
+    t300_1 = protocol.load_labware('opentrons_96_tiprack_300ul', slots['t300_1'])
+    t300_2 = protocol.load_labware('opentrons_96_tiprack_300ul', slots['t300_2'])
+    t300_3 = protocol.load_labware('opentrons_96_tiprack_300ul', slots['t300_3'])
+    r15 = protocol.load_labware('nest_12_reservoir_15ml', slots['r15'])
+    mag = protocol.load_module('magnetic module gen2', slots['mag'])
     with open('custommagplate96s_96_wellplate_100ul.json') as labware_file: # labware def with this title in directory
         labware_def = json.load(labware_file)
         mag_plate = mag.load_labware_from_definition(labware_def)
     tc = protocol.load_module("thermocycler module", configuration='semi')
     tc_plate = tc.load_labware('nest_96_wellplate_100ul_pcr_full_skirt')
-    temp_plate = protocol.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul', 1)
+    temp_mod = protocol.load_module('temperature module gen2', slots['temp'])
+    temp_plate = temp_mod.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul')
+
+    ## LIQUID HEIGHTS ##
+    # volume -> mm tables per labware, precomputed from the well geometry, see heights.py
+    height_tables = heights.load(HEIGHTS)
 
     t20_racks = [t20_0, t20_1]
     t300_racks = [t300_0, t300_1, t300_2, t300_3]
@@ -46,21 +229,69 @@ def run(protocol: protocol_api.ProtocolContext):
     p20  = protocol.load_instrument('p20_multi_gen2', mount = 'left', tip_racks=t20_racks)
     p300 = protocol.load_instrument('p300_multi_gen2', mount = 'right', tip_racks=t300_racks)
 
-    ## SETUP ##
-    p300.starting_tip=t300_0['A1']        # accomodates SPRIselect mixing tip reuse 
-
     ## OFFSETS ##
-    t20_0.set_offset(x=-0.1, y=1.0, z=-7.1)
-    t20_1.set_offset(x=0.2, y=0.8, z=-7.1)
-    t300_0.set_offset(x=0.4, y=0.5, z=-6.8)
-    t300_1.set_offset(x=0.3, y=0.4, z=-6.8)
-    t300_2.set_offset(x=0.3, y=0.5, z=-6.8)
-    t300_3.set_offset(x=0.3, y=0.5, z=-6.8)
+    # by the slot they were measured in, from the deck layout; a simulated layout may put labware where there's none
+    for _name, _labware in dict(t20_0=t20_0, t20_1=t20_1, t300_0=t300_0, t300_1=t300_1, t300_2=t300_2, t300_3=t300_3,
+                                r15=r15, mag=mag_plate, temp=temp_plate).items():
+        _at = deck.offset(DECK, _name)
+        if _at is not None:
+            _labware.set_offset(*_at)
     #tb1_5.set_offset(x=0.6, y=1.3, z=0.9)
-    r15.set_offset(x=0.3, y=0, z=-0.4)
-    tc_plate.set_offset(x=-22.8, y=0.9, z=0.2)
-    temp_plate.set_offset(x=0.4, y=1.1, z=82.2)
-    mag_plate.set_offset(x=-0.1, y=0.7, z=-0.3)
+    tc_plate.set_offset(x=-22.8, y=0.9, z=0.2)      # the thermocycler doesn't move
+
+    ## TIP RELOADS ##
+    # more than one column outruns the racks: a pipette out of tips waits for the operator
+    def reload_tips(cmd, exc):
+        if cmd.name != 'pick_up_tip' or not isinstance(exc, protocol_api.labware.OutOfTipsError):
+            return False
+        racks = t20_racks if cmd.source == 'p20' else t300_racks
+        operator_input("out of " + cmd.source + " tips, replace tips: " + ", ".join(str(r) for r in racks) + " then press enter...")
+        if cmd.source == 'p20':
+            p20.reset_tipracks()
+        else:
+            p300.reset_tipracks()
+        return True
+
+    ## TRACING ##
+    # every call on these is reported to hwproxy.BUS (virtual clock, command count)
+    protocol = hwproxy.Traced(protocol, 'protocol')
+    p20 = hwproxy.Traced(p20, 'p20', recover=reload_tips)
+    p300 = hwproxy.Traced(p300, 'p300', recover=reload_tips)
+    mag = hwproxy.Traced(mag, 'mag')
+    tc = hwproxy.Traced(tc, 'tc')
+    temp_mod = hwproxy.Traced(temp_mod, 'temp')
+
+    ## LIQUID CLASSES ##
+    # how each liquid is aspirated, carried & dispensed, per pipette, see liquids.py
+    liquid_classes = liquids.load(LIQUIDS)
+
+    def lc(name: str, pip) -> liquids.LiquidClass:
+        return liquid_classes[name][pip._name]
+
+    ## MIXING ##
+    # every mix goes through here, to a cycle count or a time budget, as a liquid class, see mixing.py
+    mixer = mixing.Mixer(protocol, CLOCK, liquid_classes, note=EVENTS.note)
+
+    ## DEADLINES ##
+    # windows timed from when something happened, not from a guess at the commands in between, see deadlines.py
+    deadlines = deadline_service.Deadlines(protocol, CLOCK, note=EVENTS.note, warn=EVENTS.warn)
+
+    ## TIP POLICY ##
+    # decides when a tip is kept, parked or dropped, see tips.py
+    tips = tip_policy.TipPolicy(mag_plate, protocol.fixed_trash, warn=EVENTS.warn)
+    tips.watch(p20, p300)
+    hwproxy.BUS.subscribe(tips)
+
+    ## LIQUID LEDGER ##
+    # volume & meniscus height of every well, see ledger.py
+    liquid = ledger.LiquidLedger(r15, mag_plate, tc_plate, temp_plate, note=EVENTS.note, warn=EVENTS.warn)
+    hwproxy.BUS.subscribe(liquid)
+
+    ## THERMOCYCLER HOLDS ##
+    # holds run in the background of queued filler tasks, see scheduler.py
+    sched = scheduler.HoldScheduler(protocol, tc, CLOCK, note=log, warn=EVENTS.warn)
+    spri_fills = {}     # mag well -> filler staging its SPRI
+    spri_staged = set() # mag wells (str) a filler staged SPRI in, not yet size selected
 
     ## MAG WET CALIBRATION ##
     mag_z = 16.0                        # mag pelleting height
@@ -69,22 +300,141 @@ def run(protocol: protocol_api.ProtocolContext):
     well_20_nomag  = (0, 0, -19.8)
     well_20_mag    = (-0.1, 0.5, -16.7)
 
+    clear_mm = 2        # a dispensing tip pulls up this far over the surface, slowly, to blow out
+
     ## SUBMETHODS ##
-    def get_eth_stock():
-        if STATE['eth_stock_vol'] > 20000:
-            return eth_stock
-        elif STATE['eth_stock_vol'] > 10000:
-            return eth2_stock
-        else:
-            return eth3_stock
+    def leave_liquid(pip, well, at, speed: float, upto=None):
+        """slowly up from `at` to just over the liquid left in `well`, no higher than `upto`"""
+        above = liquid.surface(well, depth=-1, at=at)
+        if upto is not None and upto.point.z < above.point.z:
+            above = upto
+        if above.point.z > at.point.z:
+            pip.move_to(above, speed=speed)
+
+    def withdraw(pip, liq: liquids.LiquidClass, well, at, upto=None):
+        """leave_liquid() at the class's withdraw speed, nothing for a liquid that needs none"""
+        if liq.withdraw_speed is not None:
+            leave_liquid(pip, well, at, liq.withdraw_speed, upto)
+
+    def pause(seconds: float):
+        """a liquid class's delay, no command for none"""
+        if seconds:
+            protocol.delay(seconds=seconds)
+
+    def get_eth_stock(vol: float):
+        """ethanol columns are drawn down in deck.json's order, the last NUM_COLS are spares that cover evaporation"""
+        for _eth_stock in eth_stocks:
+            if liquid.volume(_eth_stock) - vol*8 >= ETH_DEAD_VOL:
+                return _eth_stock
+        raise Exception("out of ethanol, " + str(vol) + "ul wash")
 
     def eth_wash_drain(
-        _eth_stock: protocol_api.labware.Well,
-        _well: protocol_api.labware.Well,
-        _w = []
+        _wells: list,
+        _w = [],
+        _wash_sec: float = 20,
+        _sep_sec: float = 10
     ): 
-        """_w is array of wash volumes: [300, 200] for 2-stage wash with 2 dif. volumes"""
+        """_w is array of wash volumes: [300, 200] for 2-stage wash with 2 dif. volumes
+        each wash is mixed for _wash_sec, then separates on the magnet for _sep_sec before it's drained"""
+        if CONSOLIDATED_WASH:
+            eth_wash_consolidated(_wells, _w, _wash_sec + _sep_sec)
+            return
+
+        eth = lc('ethanol', p300)
+        # each wash goes through every column before the next, no pellet sits dry between washes for long
+        for w in _w:
+            for _well in _wells:
+                _eth_stock = get_eth_stock(w)
+                _well_300_mag = _well.top().move(
+                    types.Point(
+                        x=well_300_mag[0],
+                        y=well_300_mag[1],
+                        z=well_300_mag[2]
+                    )
+                )
 
+                _well_300_top = _well.top().move(
+                    types.Point(
+                        x=well_300_mag[0],
+                        y=well_300_mag[1]
+                    )
+                )
+
+                # Below spaghetti code accounts for max tip volume of 250ul, allows for washes @300ul as per protocol
+                if w <= 230:
+                    tips.need(p300, _eth_stock)
+                    p300.aspirate(w, liquid.surface(_eth_stock, -w, floor=2), rate=eth.aspirate_rate)   # Pull from above bottom of eth stock to prevent vacuum
+                    p300.move_to(_eth_stock.top(z=5))           #
+                    p300.air_gap(eth.air_gap)                   #
+                    p300.touch_tip()                            #
+                    pause(eth.drip_delay)                       # allows drips from low-viscosity liquid
+                    p300.move_to(_well.top())
+                    p300.dispense(w, _well_300_mag, rate=eth.dispense_rate)
+                    p300.move_to(_well.top())
+                    p300.blow_out()
+                if w > 230:
+                    for i in range(2):
+                        tips.need(p300, _eth_stock)       # first half goes in from the top, the tip stays clean
+                        p300.aspirate(w/2, liquid.surface(_eth_stock, -w/2, floor=2), rate=eth.aspirate_rate)
+                        p300.move_to(_eth_stock.top(z=5))           
+                        p300.air_gap(eth.air_gap)
+                        p300.touch_tip()                            
+                        pause(eth.drip_delay)
+                        p300.move_to(_well.top())
+                        p300.dispense(w/2, _well_300_mag if i == 1 else _well_300_top, rate=eth.dispense_rate)
+                        p300.move_to(_well.top())
+                        p300.blow_out()
+                _awash: float
+                if w < 230:
+                    _awash = w - 20
+                else:
+                    _awash = 230
+            
+                log("eth wash starting", well=str(_well), ul=w)
+                # eth_wash_sec & eth_sep_sec from the stage table: 20 sec wash time, 10 sec mag sep time (perhaps excessive?)
+                mixer.mix(p300, _awash, _well_300_mag, seconds=_wash_sec, liquid='gentle', label='eth wash')
+                log("eth wash finished")
+                protocol.delay(seconds=_sep_sec)
+                eth_drain(_well, w)
+        log("pellet air dry has started")
+
+    def eth_wash_consolidated(
+        _wells: list,
+        _w: list,
+        eth_soak: float = 30                # the wash & mag sep of eth_wash_drain, without mixing
+    ):
+        """CONSOLIDATED_WASH: per wash, one tip fills every column from the top, then a tip per column
+        takes the ethanol off once that column has soaked for eth_soak seconds"""
+        eth = lc('ethanol', p300)
+        for w in _w:
+            filled = []                     # when each column's ethanol went in
+            parts = 1 if w <= 230 else 2
+            for _well in _wells:
+                _eth_stock = get_eth_stock(w)
+                _well_300_top = _well.top().move(types.Point(x=well_300_mag[0], y=well_300_mag[1]))
+                for i in range(parts):
+                    tips.need(p300, _eth_stock)     # never below a well top: one tip serves every column & wash
+                    p300.aspirate(w/parts, liquid.surface(_eth_stock, -w/parts, floor=2), rate=eth.aspirate_rate)
+                    p300.move_to(_eth_stock.top(z=5))
+                    p300.air_gap(eth.air_gap)
+                    p300.touch_tip()
+                    pause(eth.drip_delay)           # allows drips from low-viscosity liquid
+                    p300.dispense(w/parts, _well_300_top, rate=eth.dispense_rate)
+                    p300.blow_out()
+                filled.append(CLOCK.monotonic())
+                log("eth wash starting", well=str(_well), ul=w)
+            for _well, t in zip(_wells, filled):
+                tips.need(p300, _well, waste=True)
+                protocol.delay(seconds=max(t + eth_soak - CLOCK.monotonic(), 0))
+                log("eth wash finished", well=str(_well))
+                eth_drain(_well, w)
+        log("pellet air dry has started")
+
+    def eth_drain(
+        _well: protocol_api.labware.Well,
+        w: float
+    ):
+        """ethanol off the pellet, to the trash with the tip"""
         _well_300_mag = _well.top().move(
             types.Point(
                 x=well_300_mag[0],
@@ -92,321 +442,254 @@ def run(protocol: protocol_api.ProtocolContext):
                 z=well_300_mag[2]
             )
         )
-
-        for w in _w:
-            p300.pick_up_tip()
-            # Below spaghetti code accounts for max tip volume of 250ul, allows for washes @300ul as per protocol
-            if w <= 230:
-                p300.aspirate(w, _eth_stock.bottom(z=2))    # Pull from above bottom of eth stock to prevent vacuum
-                p300.move_to(_eth_stock.top(z=5))           #
-                p300.air_gap(20)                            #
-                p300.touch_tip()                            #
-                protocol.delay(seconds=3)                   # allows drips from low-viscosity liquid
-                p300.move_to(_well.top())
-                p300.dispense(w, _well_300_mag, rate=0.2) 
-                p300.move_to(_well.top())
-                p300.blow_out()
-            if w > 230:
-                for i in range(2):
-                    p300.aspirate(w/2, _eth_stock.bottom(z=2)) 
-                    p300.move_to(_eth_stock.top(z=5))           
-                    p300.air_gap(20)                            
-                    p300.touch_tip()                            
-                    protocol.delay(seconds=3)
-                    p300.move_to(_well.top())
-                    p300.dispense(w/2, _well_300_mag, rate=0.2)
-                    p300.move_to(_well.top())
-                    p300.blow_out()
-                    if i == 0:
-                        p300.drop_tip()
-                        p300.pick_up_tip()
-            _awash: float
-            if w < 230:
-                _awash = w - 20
-            else:
-                _awash = 230
-
-            print("current eth_stock: " + str(STATE['eth_stock_vol']))
-            STATE['eth_stock_vol'] -= (w*8)
-            print("subtracted eth_stock: " + str(STATE['eth_stock_vol']))
-            
-            print("eth wash starting:")
-            print(datetime.datetime.now())
-            wash_time = 20                      # 20 sec wash time, 10 sec mag sep time (perhaps excessive?)
-            wash_start = time.monotonic()
-            while time.monotonic() < wash_start + wash_time:
-                p300.aspirate(_awash, _well_300_mag, rate=0.2)
-                p300.dispense(_awash, _well_300_mag, rate=0.2)
-            print(datetime.datetime.now())
-            protocol.delay(seconds=10)
-            if w < 230:
-                p300.aspirate(w + 10, _well_300_mag, rate=0.2)       
-                protocol.delay(seconds=1)
-                p300.move_to(_well.bottom(z=2), speed = 1)
-                p300.drop_tip()
-            if w >=230:
-                for i in range(2): 
-                    p300.aspirate(w/2 + 10, _well_300_mag, rate=0.2)
-                    protocol.delay(seconds=1)
-                    p300.move_to(_well.bottom(z=2), speed = 1)
-                    p300.dispense(w/2 + 10, protocol.fixed_trash['A1'])
-                p300.drop_tip()
-        print("pellet air dry has started: " + str(datetime.datetime.now()))
+        sup = lc('supernatant', p300)
+        if w < 230:
+            p300.aspirate(w + 10, _well_300_mag, rate=sup.aspirate_rate)
+            deadlines.start('ethanol removed')      # the pellet starts drying, the last column's start counts
+            pause(sup.aspirate_delay)
+            withdraw(p300, sup, _well, _well_300_mag, upto=_well.bottom(z=2))
+            tips.discard(p300)              # wash tips never go back into ethanol
+        if w >=230:
+            for i in range(2): 
+                p300.aspirate(w/2 + 10, _well_300_mag, rate=sup.aspirate_rate)
+                deadlines.start('ethanol removed')
+                pause(sup.aspirate_delay)
+                withdraw(p300, sup, _well, _well_300_mag, upto=_well.bottom(z=2))
+                p300.dispense(w/2 + 10, protocol.fixed_trash['A1'], rate=sup.dispense_rate)
+            tips.discard(p300)
 
     def vacuum_aspirate_transfer(
         _asp_pos: types.Point,
-        _asp_spd: float,
+        _liquid: str,
         _vol: float,
         _dest: types.Point,
         _blow_pos: types.Point,
         _reps: int
     ):
+        """_liquid is the liquid class of what's moved, see liquids.json"""
+        liq = lc(_liquid, p20)
+        tips.need(p20, _asp_pos.labware.as_well())
         for _ in range(_reps):
-            p20.aspirate(_vol, _asp_pos, rate=_asp_spd)
-            protocol.delay(seconds=0.5)
-            p20.default_speed=1
-            p20.move_to(_asp_pos.move(types.Point(z=3)))
-            p20.default_speed=400
-            p20.dispense(_vol, _dest)
-            protocol.delay(seconds=0.5)
+            p20.aspirate(_vol, _asp_pos, rate=liq.aspirate_rate)
+            pause(liq.aspirate_delay)
+            withdraw(p20, liq, _asp_pos.labware.as_well(), _asp_pos, upto=_asp_pos.move(types.Point(z=3)))
+            p20.dispense(_vol, _dest, rate=liq.dispense_rate)
+            pause(liq.dispense_delay)
             p20.blow_out(_blow_pos)
             p20.touch_tip()
 
-    # use p20 with pre-loaded tip before calling (reduce tip waste)
-    # resolves with fresh p20 loaded in every condition
+    # EB goes into each column & is mixed in turn, then the columns take turns mixing through the incubation
     def resusp_pel_mix_inc_mag(
-        _mag_well: protocol_api.labware.Well,
+        _mag_wells: list,
+        _eb_vol: float,
         _mix_vol: float,
         _tot_vol: float,
         _inc_sec: int,
         _mag_sec: int):
 
-        _well_300_nomag = _mag_well.top().move(types.Point(
-            x=well_300_nomag[0],
-            y=well_300_nomag[1],
-            z=well_300_nomag[2]))
+        def _well_300_nomag(_well):
+            return _well.top().move(types.Point(
+                x=well_300_nomag[0],
+                y=well_300_nomag[1],
+                z=well_300_nomag[2]))
 
-        for _ in range(30):
-            p300.aspirate(_mix_vol, _well_300_nomag)
-            p300.dispense(_mix_vol, _well_300_nomag)
-        protocol.delay(seconds=1)
-        p300.move_to(_well_300_nomag.move(types.Point(z=getMagWellHeight(_tot_vol + 80))), speed=2)
-        protocol.delay(seconds=1)
-        p300.blow_out()
+        susp = lc('bead_suspension', p300)
+        _over = getMagWellHeight(_tot_vol) + clear_mm
+        for c, _mag_well in enumerate(_mag_wells):
+            eb_stock_transfer(
+                vol = _eb_vol,
+                dest = _mag_well,
+                dest_vol = 0)
 
-        print("incubation starting: " + str(_inc_sec))
-        inc_start = time.monotonic()
-        while time.monotonic() < inc_start + _inc_sec:
-            p300.aspirate(_mix_vol - 20, _well_300_nomag, rate=0.2)
-            p300.dispense(_mix_vol - 20, _well_300_nomag, rate=0.2)
-        print(datetime.datetime.now())
-        print("incubation finished")
+            tips.need(p300, _mag_well)
+            mixer.mix(p300, _mix_vol, _well_300_nomag(_mag_well), cycles=30, label='EB resuspension')
+            pause(susp.dispense_delay)
+            p300.move_to(_well_300_nomag(_mag_well).move(types.Point(z=_over)), speed=susp.rise_speed)
+            pause(susp.dispense_delay)
+            p300.blow_out()
 
-        p300.move_to(_well_300_nomag.move(types.Point(z=getMagWellHeight(_tot_vol + 80))), speed=2)
-        protocol.delay(seconds=1)
-        p300.blow_out()
+        # columns take turns mixing for an equal share of the incubation, timed from the last column's resuspension
+        log("incubation starting", seconds=_inc_sec)
+        inc_start = CLOCK.monotonic()
+        for c, _mag_well in enumerate(_mag_wells):
+            tips.need(p300, _mag_well)
+            mixer.mix(p300, _mix_vol - 20, _well_300_nomag(_mag_well), seconds=inc_start + _inc_sec*(c + 1)/len(_mag_wells) - CLOCK.monotonic(),
+                      liquid='gentle', label='EB incubation')
+            p300.move_to(_well_300_nomag(_mag_well).move(types.Point(z=_over)), speed=susp.rise_speed)
+            pause(susp.dispense_delay)
+            p300.blow_out()
+        log("incubation finished")
 
-        print("magnet engaged")
+        log("magnet engaged")
         mag.engage(height=mag_z)
-        p300.drop_tip()
-        protocol.delay(seconds=_mag_sec)
+        deadlines.start('magnet engaged')
+        tips.discard(p300)
+        deadlines.wait('magnet engaged', _mag_sec)
 
     # position is adjustment from bottom of well
     def getMagWellHeight(vol: float):
-        if vol <= 100:
-            return vol*0.08
-        else:
-            return 0.08*100 + (vol-100)*0.045
+        return height_tables[mag_plate.load_name].height(vol)
     
-    def getEppendorf_1_5Height(vol: float):
-        #TODO: add volume-dependent vertical correction factor when aspirating, but without crushing tip when vol is close to 0
-        #0.031327068 mm/ul up to and including 500ul
-        #0.019030677 mm/ul after
-        #if vol <= 500:
-        #    return vol*0.031
-        #else:
-        #    return 500*0.031 + (vol-500)*0.019
-
-        #multi setup does not use eppendorf_1_5s, disabling for now
-        return 0
-
+    # resuspends SPRI stock, the mixing tip is parked for the next mix
     def spri_stock_mix():
-        if STATE['spri_stock_vol'] < 2000:
-            for _ in range(20):
-                p300.aspirate(STATE['spri_stock_vol']/8 - 10, spri_stock.bottom(z=1), rate = 2.0)
-                p300.dispense(STATE['spri_stock_vol']/8 - 10, spri_stock.bottom(z=1), rate = 2.0)
+        tips.need(p300, spri_stock)
+        if liquid.volume(spri_stock) < 2000:
+            _mix_vol = liquid.volume(spri_stock)/8 - 10
+            mixer.mix(p300, _mix_vol, spri_stock.bottom(z=1), cycles=20, liquid='bead_stock', label='SPRI stock')
             p300.move_to(spri_stock.top())
-            protocol.delay(seconds=1)
+            pause(lc('bead_stock', p300).drip_delay)
             p300.touch_tip()
             p300.blow_out()
         else:
-            for _ in range(20):
-                p300.aspirate(240, spri_stock.bottom(z=1), rate = 2.0)
-                p300.dispense(240, spri_stock.bottom(z=1), rate = 2.0)
-            for _ in range(10):
-                p300.aspirate(240, spri_stock.bottom(z=1), rate = 2.0)
-                p300.dispense(240, spri_stock.bottom(z=1), rate = 2.0)
+            mixer.mix(p300, 240, spri_stock.bottom(z=1), cycles=30, liquid='bead_stock', label='SPRI stock')
             p300.move_to(spri_stock.top())
-            protocol.delay(seconds=1)
+            pause(lc('bead_stock', p300).drip_delay)
             p300.touch_tip()
             p300.blow_out()
         p300.touch_tip()
-        p300.return_tip()
-        p300.pick_up_tip()
+        tips.park(p300)
             
     def spri_stock_mix_transfer(
         vol: float,
-        dest: protocol_api.labware.Well,
+        dests: list,
         dest_vol: float
     ):
-        # position adjustments have local scope so specific `dest` well can be referenced
-        _well_300 = dest.top().move(
-            types.Point(
-                x=well_300_nomag[0],
-                y=well_300_nomag[1],
-                z=well_300_nomag[2]
-                )
-            )
-        _well_20  = dest.top().move(
-            types.Point(
-                x=well_20_nomag[0],
-                y=well_20_nomag[1],
-                z=well_20_nomag[2]
-            )
-        )
-
         if vol > 250 or vol < 0:
             raise Exception ("SPRI transfer volume must be between 0 and 250ul")
 
-        if vol <= 40:
-            # mix:
-            spri_stock_mix()
-            # pre-wet
-            for _ in range(1):
-                p20.aspirate(20, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'])))
-                p20.dispense(20, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'])))
-            if vol <= 20:
-                p20.aspirate(vol, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'] - vol)), rate=0.25)
-                protocol.delay(seconds=1)
-                p20.move_to(spri_stock.top(), speed=10)
-                p20.dispense(vol, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=1.0)
-                protocol.delay(seconds=1)
-                p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol + 80))), speed = 4.4)
-                p20.blow_out()
-                p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), speed = 4.4)
-                p20.move_to(dest.top())
-            else:
-                for i in range(2):
-                    p20.aspirate(vol/2, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'] - i*(vol/2))), rate=0.25)
-                    protocol.delay(seconds=1)
-                    p20.move_to(spri_stock.top(), speed=10)
-                    p20.dispense(vol/2, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)))), rate=1.0)
-                    protocol.delay(seconds=1)
-                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2) + 80))), speed = 4.4)   #slowly +Z pipette, pulling droplet out of tip
-                    protocol.delay(seconds=1)
-                    p20.blow_out()                                                                  #blows bubble out tip
-                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i)*(vol/2)))), speed = 4.4)          #merges bubble with liquid surface
-                    p20.move_to(dest.top())
-                    p20.drop_tip()
-                    p20.pick_up_tip()
-        else:
-            # mix:
-            spri_stock_mix()
-            for _ in range(1):
-                p300.aspirate(vol, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'])))
-                p300.dispense(vol, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'])))
-            p300.aspirate(vol, spri_stock.bottom(z=getEppendorf_1_5Height(STATE['spri_stock_vol'] - vol)), rate = 0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(spri_stock.top(), speed=10)
-            p300.dispense(vol, _well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(_well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol + 80))), speed = 4.4)
-            protocol.delay(seconds=1)
-            p300.blow_out()
-            p300.move_to(dest.top())
-            p300.drop_tip()
-            p300.pick_up_tip()
+        # mix once for every column:
+        spri_stock_mix()
+
+        for c, dest in enumerate(dests):
+            # position adjustments have local scope so specific `dest` well can be referenced
+            _well_300 = dest.top().move(
+                types.Point(
+                    x=well_300_nomag[0],
+                    y=well_300_nomag[1],
+                    z=well_300_nomag[2]
+                    )
+                )
+            _well_20  = dest.top().move(
+                types.Point(
+                    x=well_20_nomag[0],
+                    y=well_20_nomag[1],
+                    z=well_20_nomag[2]
+                )
+            )
 
-        print("current spri_stock: " + str(STATE['spri_stock_vol']))
-        STATE['spri_stock_vol'] -= vol*8
-        print("subtracted spri_stock: " + str(STATE['spri_stock_vol']))
+            if vol <= 40:
+                tips.need(p20, spri_stock)
+                # pre-wet
+                _prewet = liquid.surface(spri_stock, -20)
+                mixer.mix(p20, 20, _prewet, cycles=1, label='pre-wet')
+                spri = lc('spri', p20)
+                if vol <= 20:
+                    p20.aspirate(vol, liquid.surface(spri_stock, -vol), rate=spri.aspirate_rate)
+                    pause(spri.aspirate_delay)
+                    p20.move_to(spri_stock.top(), speed=spri.withdraw_speed)
+                    p20.dispense(vol, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=spri.dispense_rate)
+                    pause(spri.dispense_delay)
+                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol) + clear_mm)), speed=spri.rise_speed)
+                    p20.blow_out()
+                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), speed=spri.rise_speed)
+                    p20.move_to(dest.top())
+                else:
+                    for i in range(2):
+                        tips.need(p20, spri_stock)
+                        p20.aspirate(vol/2, liquid.surface(spri_stock, -vol/2), rate=spri.aspirate_rate)
+                        pause(spri.aspirate_delay)
+                        p20.move_to(spri_stock.top(), speed=spri.withdraw_speed)
+                        p20.dispense(vol/2, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)))), rate=spri.dispense_rate)
+                        pause(spri.dispense_delay)
+                        p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)) + clear_mm)), speed=spri.rise_speed)   #slowly +Z pipette, pulling droplet out of tip
+                        pause(spri.dispense_delay)
+                        p20.blow_out()                                                                  #blows bubble out tip
+                        p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i)*(vol/2)))), speed=spri.rise_speed)          #merges bubble with liquid surface
+                        p20.move_to(dest.top())
+            else:
+                spri = lc('spri', p300)
+                tips.need(p300, spri_stock)
+                _prewet = liquid.surface(spri_stock, -vol)
+                mixer.mix(p300, vol, _prewet, cycles=1, label='pre-wet')
+                p300.aspirate(vol, liquid.surface(spri_stock, -vol), rate=spri.aspirate_rate)
+                pause(spri.aspirate_delay)
+                p300.move_to(spri_stock.top(), speed=spri.withdraw_speed)
+                p300.dispense(vol, _well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=spri.dispense_rate)
+                pause(spri.dispense_delay)
+                p300.move_to(_well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol) + clear_mm)), speed=spri.rise_speed)
+                pause(spri.dispense_delay)
+                p300.blow_out()
+                p300.move_to(dest.top())
 
     
     def cDNA_transfer(
-        source: protocol_api.labware.Well,
+        sources: list,
         vol: float,
-        dest: protocol_api.labware.Well,
+        dests: list,
         dest_vol: float
-        #source: 8-tube strip on temp block
-        #dest: disengaged mag well
+        #sources: 8-tube strips on temp block
+        #dests: disengaged mag wells
     ):
-        # TODO: track height changes from liquid in tubestrips on temp plate
-
-        # position adjustments have local scope so specific `dest` well can be referenced
-        _well_300 = dest.top().move(types.Point(
-            x=well_300_nomag[0],
-            y=well_300_nomag[1],
-            z=well_300_nomag[2]))
-        _well_20  = dest.top().move(types.Point(
-            x=well_20_nomag[0],
-            y=well_20_nomag[1],
-            z=well_20_nomag[2]))
-
         if vol > 250 or vol < 0:
             raise Exception ("cDNA transfer volume must be between 0 and 250ul")
-        
-        if vol <= 40:
-            # transfer, pull up, blow out, touch liquid line
-            if vol <= 20:
-                for _ in range(1):
-                    p20.aspirate(vol, source.bottom(z=0.5))
-                    p20.dispense(vol, source.bottom(z=0.5))
-                p20.aspirate(vol, source.bottom(), rate=0.25)
-                protocol.delay(seconds=1)
-                p20.move_to(source.bottom(z=5), speed=1)
-                p20.move_to(source.top(), speed=4.4)
-                p20.touch_tip()
-                p20.dispense(vol, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=0.25)
-                protocol.delay(seconds=0.5)
-                p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol + 80))), speed = 4.4)
-                protocol.delay(seconds=0.5)
-                p20.blow_out()
-                p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))))
-                p20.move_to(dest.top())
-            else:
-                for _ in range(1):
-                    p20.aspirate(20, source.bottom(z=0.5))
-                    p20.dispense(20, source.bottom(z=0.5))
-                for i in range(2):
-                    p20.aspirate(vol/2, source.bottom(z=0.5), rate=0.25)
-                    protocol.delay(seconds=1)
-                    p20.move_to(source.bottom(z=2), speed=1)
-                    p20.move_to(source.top(), speed=4.4)
-                    p20.dispense(vol/2, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)))), rate=0.25)
-                    protocol.delay(seconds=0.5)
-                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2) + 80))), speed = 4.4) # slowly +Z pipette, pulling droplet out of tip
-                    protocol.delay(seconds=0.5)
-                    p20.blow_out()                                                                              # blows bubble out tip
-                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i)*(vol/2)))))       # merges bubble with liquid surface
+
+        for c, (source, dest) in enumerate(zip(sources, dests)):
+            # position adjustments have local scope so specific `dest` well can be referenced
+            _well_300 = dest.top().move(types.Point(
+                x=well_300_nomag[0],
+                y=well_300_nomag[1],
+                z=well_300_nomag[2]))
+            _well_20  = dest.top().move(types.Point(
+                x=well_20_nomag[0],
+                y=well_20_nomag[1],
+                z=well_20_nomag[2]))
+
+            if vol <= 40:
+                tips.need(p20, source)
+                # transfer, pull up, blow out, touch liquid line
+                aq = lc('aqueous', p20)
+                if vol <= 20:
+                    mixer.mix(p20, vol, source.bottom(z=0.5), cycles=1, label='pre-wet')
+                    p20.aspirate(vol, source.bottom(), rate=aq.aspirate_rate)
+                    pause(aq.aspirate_delay)
+                    withdraw(p20, aq, source, source.bottom())
+                    p20.move_to(source.top())
+                    p20.touch_tip()
+                    p20.dispense(vol, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=aq.dispense_rate)
+                    pause(aq.dispense_delay)
+                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol) + clear_mm)), speed=aq.rise_speed)
+                    pause(aq.dispense_delay)
+                    p20.blow_out()
+                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))))
                     p20.move_to(dest.top())
-            p20.drop_tip()
-            p20.pick_up_tip()
-        else:
-            for _ in range(1):
-                p300.aspirate(vol, source.bottom(z=0.5))
-                p300.dispense(vol, source.bottom(z=0.5))
-            p300.aspirate(vol, source.bottom(z=0.5), rate = 0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(source.bottom(z=2), speed=1)
-            p300.move_to(source.top(), speed=4.4)
-            p300.dispense(vol, _well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(_well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol + 80))), speed = 4.4)
-            protocol.delay(seconds=1)
-            p300.blow_out()
-            p300.move_to(dest.top())
-            p300.drop_tip()
-            #p300.pick_up_tip() # removed so SPRIselect tip may occasionally be used
+                else:
+                    mixer.mix(p20, 20, source.bottom(z=0.5), cycles=1, label='pre-wet')
+                    for i in range(2):
+                        p20.aspirate(vol/2, source.bottom(z=0.5), rate=aq.aspirate_rate)
+                        pause(aq.aspirate_delay)
+                        withdraw(p20, aq, source, source.bottom(z=0.5))
+                        p20.move_to(source.top())
+                        p20.dispense(vol/2, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)))), rate=aq.dispense_rate)
+                        pause(aq.dispense_delay)
+                        p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)) + clear_mm)), speed=aq.rise_speed) # slowly +Z pipette, pulling droplet out of tip
+                        pause(aq.dispense_delay)
+                        p20.blow_out()                                                                              # blows bubble out tip
+                        p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i)*(vol/2)))))       # merges bubble with liquid surface
+                        p20.move_to(dest.top())
+            else:
+                aq = lc('aqueous', p300)
+                tips.need(p300, source)
+                mixer.mix(p300, vol, source.bottom(z=0.5), cycles=1, label='pre-wet')
+                p300.aspirate(vol, source.bottom(z=0.5), rate=aq.aspirate_rate)
+                pause(aq.aspirate_delay)
+                withdraw(p300, aq, source, source.bottom(z=0.5))
+                p300.move_to(source.top())
+                p300.dispense(vol, _well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=aq.dispense_rate)
+                pause(aq.dispense_delay)
+                p300.move_to(_well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol) + clear_mm)), speed=aq.rise_speed)
+                pause(aq.dispense_delay)
+                p300.blow_out()
+                p300.move_to(dest.top())
 
     def eb_stock_transfer(
         vol: float,
@@ -427,979 +710,996 @@ def run(protocol: protocol_api.ProtocolContext):
             raise Exception ("EB transfer volume must be between 0 and 250ul")
 
         if vol <= 40:
+            tips.need(p20, eb_stock)
             # pre-wet
-            for _ in range(1):
-                p20.aspirate(20, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'])))
-                p20.dispense(20, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'])))
+            _prewet = liquid.surface(eb_stock, -20)
+            mixer.mix(p20, 20, _prewet, cycles=1, label='pre-wet')
+            eb = lc('eb', p20)
             if vol <= 20:
-                p20.aspirate(vol, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'] - vol)), rate=0.25)
-                protocol.delay(seconds=1)
-                p20.move_to(eb_stock.top(), speed=10)
-                p20.dispense(vol, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=1.0)
-                protocol.delay(seconds=0.5)
-                p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol + 80))), speed = 4.4)
-                protocol.delay(seconds=0.5)
+                p20.aspirate(vol, liquid.surface(eb_stock, -vol), rate=eb.aspirate_rate)
+                pause(eb.aspirate_delay)
+                p20.move_to(eb_stock.top(), speed=eb.withdraw_speed)
+                p20.dispense(vol, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=eb.dispense_rate)
+                pause(eb.dispense_delay)
+                p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol) + clear_mm)), speed=eb.rise_speed)
+                pause(eb.dispense_delay)
                 p20.blow_out()
                 p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + vol))))
                 p20.move_to(dest.top())
-                p20.drop_tip()
-                p300.pick_up_tip()
             else:
                 for i in range(2):
-                    if i == 1:
-                        p20.pick_up_tip()
-                    p20.aspirate(vol/2, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'] - i*(vol/2))), rate=0.25)
-                    protocol.delay(seconds=1)
-                    p20.move_to(eb_stock.top(), speed=10)
-                    p20.dispense(vol/2, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)))), rate=1.0)
-                    protocol.delay(seconds=0.5)
-                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2) + 80))), speed = 4.4)   # slowly +Z pipette, pulling droplet out of tip
-                    protocol.delay(seconds=0.5)
+                    tips.need(p20, eb_stock)
+                    p20.aspirate(vol/2, liquid.surface(eb_stock, -vol/2), rate=eb.aspirate_rate)
+                    pause(eb.aspirate_delay)
+                    p20.move_to(eb_stock.top(), speed=eb.withdraw_speed)
+                    p20.dispense(vol/2, _well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)))), rate=eb.dispense_rate)
+                    pause(eb.dispense_delay)
+                    p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i+1)*(vol/2)) + clear_mm)), speed=eb.rise_speed)   # slowly +Z pipette, pulling droplet out of tip
+                    pause(eb.dispense_delay)
                     p20.blow_out()                                                                  # blows bubble out tip
                     p20.move_to(_well_20.move(types.Point(z=getMagWellHeight(dest_vol + (i)*(vol/2)))))          # merges bubble with liquid surface
                     p20.move_to(dest.top())
-                    p20.drop_tip()
-            p20.pick_up_tip()
-            p300.pick_up_tip()
         else:
-            p300.pick_up_tip()
-            for _ in range(1):
-                p300.aspirate(vol, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'])))
-                p300.dispense(vol, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'])))
-            p300.aspirate(vol, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'] - vol)), rate = 0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(eb_stock.top(), speed=10)
-            p300.dispense(vol, _well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(_well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol + 80))), speed = 4.4)
-            protocol.delay(seconds=1)
+            eb = lc('eb', p300)
+            tips.need(p300, eb_stock)
+            _prewet = liquid.surface(eb_stock, -vol)
+            mixer.mix(p300, vol, _prewet, cycles=1, label='pre-wet')
+            p300.aspirate(vol, liquid.surface(eb_stock, -vol), rate=eb.aspirate_rate)
+            pause(eb.aspirate_delay)
+            p300.move_to(eb_stock.top(), speed=eb.withdraw_speed)
+            p300.dispense(vol, _well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol))), rate=eb.dispense_rate)
+            pause(eb.dispense_delay)
+            p300.move_to(_well_300.move(types.Point(z=getMagWellHeight(dest_vol + vol) + clear_mm)), speed=eb.rise_speed)
+            pause(eb.dispense_delay)
             p300.blow_out()
             p300.move_to(dest.top())
-            
-        print("current eb_stock: " + str(STATE['eb_stock_vol']))
-        STATE['eb_stock_vol'] -= vol*8
-        print("subtracted eb_stock: " + str(STATE['eb_stock_vol']))
-
-    def sel_96_ring_mag(
-        well: protocol_api.labware.Well,
-        cDNA: protocol_api.labware.Well,
-        spri_vol: float,
-        cDNA_vol: float,
-        mix_vol: float,
-        mix_rep: int,
-        inc_sec: int,
-        mag_sec: int,
-        pel: bool,
-        dry_sec: int,
-        eb_vol: float,
-        inc_sec_2: int,
-        mag_sec_2: int,
-        dest: protocol_api.labware.Well,
-        dest_vol: float,
-        dest_rep: int,
-        _w = [], 
-        multiplex = bool,
-        mag_source = bool,
-        to_mag = bool
-    ):
-        """size selection protocol for 96 ring magnet & biorad hard-shell plate"""
 
-        # position adjustments have local scope so specific `dest` well is referenced
-        _well_300_nomag = well.top().move(types.Point(
-            x=well_300_nomag[0],
-            y=well_300_nomag[1],
-            z=well_300_nomag[2]))
-        _well_300_mag = well.top().move(types.Point(
-            x=well_300_mag[0],
-            y=well_300_mag[1],
-            z=well_300_mag[2]))
-
-        # only use if dispensing to mag plate & immedietly call sel_96_ring_mag() on other part of size selection
-        _dest_well_300_mag = dest.top().move(types.Point(
-            x=well_300_mag[0],
-            y=well_300_mag[1],
-            z=well_300_mag[2]
-        ))
+    def sel_96_ring_mag(sel: stages.SizeSelection):
+        """size selection protocol for 96 ring magnet & biorad hard-shell plate, one mag well per column"""
+
+        wells, cDNAs, dests = roles[sel.wells], roles[sel.cDNAs], roles[sel.dests]
+        if not ckpt.pending("size selection in " + " ".join(w.well_name for w in wells)):
+            return
+
+        # SPRI is already in `wells` if its hold filler got to run, otherwise it never will
+        spri_fill = spri_fills.pop(wells[0], None)
+        if spri_fill is not None:
+            sched.cancel(spri_fill)
+        staged = str(wells[0]) in spri_staged
+        spri_staged.discard(str(wells[0]))
 
         mag.disengage()
         
-        p20.pick_up_tip()
         # allows cDNA already placed on mag when mag_source is true
-        if not mag_source:
-            p300.pick_up_tip()
+        if not sel.mag_source:
             cDNA_transfer(
-                source = cDNA,
-                vol = cDNA_vol,
-                dest = well,
-                dest_vol = 0)
+                sources = cDNAs,
+                vol = sel.cDNA_vol,
+                dests = wells,
+                dest_vol = sel.spri_vol if staged else 0)
+
+        if not staged:
+            spri_stock_mix_transfer(
+                vol = sel.spri_vol,
+                dests = wells,
+                dest_vol = sel.cDNA_vol)
+
+        # position adjustments take the well, so each column's own is referenced
+        def _well_300_nomag(_well):
+            return _well.top().move(types.Point(
+                x=well_300_nomag[0],
+                y=well_300_nomag[1],
+                z=well_300_nomag[2]))
 
-        p300.pick_up_tip(spri_tip)
-        spri_stock_mix_transfer(
-            vol = spri_vol,
-            dest = well,
-            dest_vol = cDNA_vol)
-
-        for _ in range(mix_rep):
-            p300.aspirate(mix_vol, _well_300_nomag.move(types.Point(z=0.5)))
-            protocol.delay(seconds=0.5)
-            p300.dispense(mix_vol, _well_300_nomag.move(types.Point(z=0.5)), rate=2)
-            protocol.delay(seconds=0.5)
-        p300.move_to(well.top())
-
-        print("incubation starting: " + str(inc_sec))
-        inc_start = time.monotonic()
-        while time.monotonic() < inc_start + inc_sec:
-            p300.aspirate(mix_vol - 20, _well_300_nomag, rate=0.1)
-            p300.dispense(mix_vol - 20, _well_300_nomag, rate=0.1)
-        print("incubation finished")
-
-        p300.move_to(_well_300_nomag.move(types.Point(z=getMagWellHeight(spri_vol + cDNA_vol + 80))), speed=4.4)
-        protocol.delay(seconds=1)
-        p300.blow_out()
-        p300.move_to(_well_300_nomag.move(types.Point(z=getMagWellHeight(spri_vol + cDNA_vol))))
-        p300.move_to(well.top())
+        for c, well in enumerate(wells):
+            tips.need(p300, well)
+            mixer.mix(p300, sel.mix_vol, _well_300_nomag(well).move(types.Point(z=0.5)), cycles=sel.mix_rep, liquid='bead_mix', label='SPRI & sample')
+            p300.move_to(well.top())
+
+        # columns take turns mixing for an equal share of the incubation, timed from the last column's mix
+        log("incubation starting", seconds=sel.inc_sec)
+        inc_start = CLOCK.monotonic()
+        spri = lc('spri', p300)
+        _surface = getMagWellHeight(sel.spri_vol + sel.cDNA_vol)
+        for c, well in enumerate(wells):
+            tips.need(p300, well)
+            mixer.mix(p300, sel.mix_vol - 20, _well_300_nomag(well), seconds=inc_start + sel.inc_sec*(c + 1)/len(wells) - CLOCK.monotonic(),
+                      liquid='bead_inc', label='SPRI incubation')
+            p300.move_to(_well_300_nomag(well).move(types.Point(z=_surface + clear_mm)), speed=spri.rise_speed)
+            pause(spri.dispense_delay)
+            p300.blow_out()
+            p300.move_to(_well_300_nomag(well).move(types.Point(z=_surface)))
+            p300.move_to(well.top())
+        log("incubation finished")
         
-        print("magnet engaged")
+        log("magnet engaged")
         mag.engage(height=mag_z)
-        p300.drop_tip()
-        protocol.delay(seconds=mag_sec)
+        deadlines.start('magnet engaged')
+        deadlines.wait('magnet engaged', sel.mag_sec)
 
         # Post Mag Sep
-        if pel:     # trash supernatent, wash pellet, resuspend pellet, incubate 2, then magnet 2
-            p300.pick_up_tip()
-            if multiplex:
-                p300.aspirate(75, _well_300_mag, rate=0.2)
-                protocol.delay(seconds=1)
-                p300.move_to(_well_300_mag.move(types.Point(z=10)), speed = 2.5)
+        if sel.pel:     # trash supernatent, wash pellet, resuspend pellet, incubate 2, then magnet 2
+            sup = lc('supernatant', p300)
+            for c, well in enumerate(wells):
+                _well_300_mag = well.top().move(types.Point(
+                    x=well_300_mag[0],
+                    y=well_300_mag[1],
+                    z=well_300_mag[2]))
+
+                tips.need(p300, well, waste=not sel.share)   # the multiplex share is product, not waste
+                if sel.share:
+                    p300.aspirate(sel.share['vol'], _well_300_mag, rate=sup.aspirate_rate)
+                    pause(sup.aspirate_delay)
+                    withdraw(p300, sup, well, _well_300_mag)
+                    p300.move_to(well.top())
+                    p300.dispense(sel.share['vol'], roles[sel.share['dests']][c].bottom(z=1), rate=sup.dispense_rate)
+                p300.aspirate(sel.spri_vol + sel.cDNA_vol + 10, _well_300_mag, rate=sup.aspirate_rate)
+                pause(sup.aspirate_delay)
+                withdraw(p300, sup, well, _well_300_mag)
                 p300.move_to(well.top())
-                p300.dispense(75, mult_cleanup.bottom(z=1), rate=0.2)
-            p300.aspirate(spri_vol + cDNA_vol + 10, _well_300_mag, rate=0.2)
-            protocol.delay(seconds=1)
-            p300.move_to(_well_300_mag.move(types.Point(z=10)), speed = 2.5)
-            p300.move_to(well.top())
-            p300.drop_tip()
+                tips.discard(p300)              # supernatant goes to the trash with the tip
 
             eth_wash_drain(
-                _eth_stock = getEthStock(),
-                _well = well,
-                _w = _w
+                _wells = wells,
+                _w = sel.ethanol,
+                _wash_sec = sel.eth_wash_sec,
+                _sep_sec = sel.eth_sep_sec
             )
 
-            print("dry_sec in 96s protocol has elapsed" + str(datetime.datetime.now()))
-            protocol.delay(seconds=dry_sec-39)  # it takes 39 seconds to reach this point after ethanol is removed from pellet
+            deadlines.wait('ethanol removed', sel.dry_sec)
+            log("dry_sec in 96s protocol has elapsed")
             mag.disengage()
-            eb_stock_transfer(
-                vol = eb_vol,
-                dest = well,
-                dest_vol = 0)
             resusp_pel_mix_inc_mag(
-                _mag_well = well,
-                _mix_vol = eb_vol - 10,
-                _tot_vol = eb_vol,
-                _inc_sec = inc_sec_2,
-                _mag_sec = mag_sec_2)
+                _mag_wells = wells,
+                _eb_vol = sel.eb_vol,
+                _mix_vol = sel.eb_vol - 10,
+                _tot_vol = sel.eb_vol,
+                _inc_sec = sel.inc_sec_2,
+                _mag_sec = sel.mag_sec_2)
         
         # required regardless of pellet resuspension or not: transfers supernatent to specified location (likely temp block)
-        #TODO: dispense at liquid level on temp block tubestrip
-
-        if to_mag:
-            if dest_rep == 8:
-                p300.pick_up_tip()
-                p300.aspirate(dest_rep*dest_vol, _well_300_mag, rate=0.2)
-                protocol.delay(seconds=1)
-                p300.move_to(_well_300_mag.move(types.Point(z=10)), speed = 1)
-                p300.dispense(dest_rep*dest_vol, _dest_well_300_mag)
-                protocol.delay(seconds=1)
-                p300.move_to(dest.top(), speed = 1)
-                p300.drop_tip()
-                dest_rep = 1
-            for i in range(dest_rep):
-                vacuum_aspirate_transfer(
-                    _asp_pos = _well_300_mag,
-                    _asp_spd = 0.2,
-                    _vol = dest_vol,
-                    _dest = _dest_well_300_mag,
-                    _blow_pos = dest.top(),
-                    _reps = 1)
-        else:
-            if dest_rep == 8:
-                p300.pick_up_tip()
-                p300.aspirate(dest_rep*dest_vol, _well_300_mag, rate=0.2)
-                protocol.delay(seconds=1)
-                p300.move_to(_well_300_mag.move(types.Point(z=10)), speed = 1)
-                p300.dispense(dest_rep*dest_vol, dest.bottom(z=1))
-                p300.drop_tip()
-                dest_rep = 1
-            for i in range(dest_rep):
-                vacuum_aspirate_transfer(
-                    _asp_pos = _well_300_mag,
-                    _asp_spd = 0.2,
-                    _vol = dest_vol,
-                    _dest = dest.bottom(),
-                    _blow_pos = dest.top(),
-                    _reps = 1)
-        p20.drop_tip()
+        elu = lc('eluate', p300)
+
+        for c, (well, dest) in enumerate(zip(wells, dests)):
+            _well_300_mag = well.top().move(types.Point(
+                x=well_300_mag[0],
+                y=well_300_mag[1],
+                z=well_300_mag[2]))
+
+            # only use if dispensing to mag plate & immedietly call sel_96_ring_mag() on other part of size selection
+            _dest_well_300_mag = dest.top().move(types.Point(
+                x=well_300_mag[0],
+                y=well_300_mag[1],
+                z=well_300_mag[2]
+            ))
+
+            _rep = sel.dest_rep
+            if sel.to_mag:
+                if _rep == 8:
+                    tips.need(p300, well)
+                    p300.aspirate(_rep*sel.dest_vol, _well_300_mag, rate=elu.aspirate_rate)
+                    pause(elu.aspirate_delay)
+                    withdraw(p300, elu, well, _well_300_mag)
+                    p300.dispense(_rep*sel.dest_vol, _dest_well_300_mag, rate=elu.dispense_rate)
+                    pause(elu.dispense_delay)
+                    withdraw(p300, elu, dest, _dest_well_300_mag)
+                    p300.move_to(dest.top())
+                    _rep = 1
+                for i in range(_rep):
+                    vacuum_aspirate_transfer(
+                        _asp_pos = _well_300_mag,
+                        _liquid = 'eluate',
+                        _vol = sel.dest_vol,
+                        _dest = _dest_well_300_mag,
+                        _blow_pos = dest.top(),
+                        _reps = 1)
+            else:
+                if _rep == 8:
+                    tips.need(p300, well)
+                    p300.aspirate(_rep*sel.dest_vol, _well_300_mag, rate=elu.aspirate_rate)
+                    pause(elu.aspirate_delay)
+                    withdraw(p300, elu, well, _well_300_mag)
+                    p300.dispense(_rep*sel.dest_vol, dest.bottom(z=1), rate=elu.dispense_rate)
+                    _rep = 1
+                for i in range(_rep):
+                    vacuum_aspirate_transfer(
+                        _asp_pos = _well_300_mag,
+                        _liquid = 'eluate',
+                        _vol = sel.dest_vol,
+                        _dest = liquid.surface(dest, sel.dest_vol, depth=0),    # at the liquid level
+                        _blow_pos = dest.top(),
+                        _reps = 1)
         mag.disengage() # magnet will be engaged if pel is True 
+        ckpt.save()
     
+    # SPRI into empty mag wells ahead of their sel_96_ring_mag(), run as a thermocycler hold filler
+    def stage_spri(
+        vol: float,
+        wells: list
+    ):
+        spri_stock_mix_transfer(
+            vol = vol,
+            dests = wells,
+            dest_vol = 0)
+        spri_staged.add(str(wells[0]))
+
+    def queue_spri(
+        vol: float,
+        wells: list
+    ):
+        # seconds, from time_model: ~100s stock mix, then per column; p20 splits 20-40ul into two transfers
+        if vol > 40:
+            col_sec = 45
+        elif vol > 20:
+            col_sec = 110
+        else:
+            col_sec = 50
+        spri_fills[wells[0]] = sched.fill(
+            "stage " + str(vol) + "ul SPRI in " + " ".join(w.well_name for w in wells),
+            lambda: stage_spri(vol, wells),
+            100 + col_sec*len(wells))
+
+    # a pipetted tc reaction from the stage table, run with its tc_profiles.json profile: lid, holds,
+    # cycling & cool down, leaves the lid open
+    def thermocycle(
+        pcr: stages.Thermocycle,
+        cycles: int = None
+    ):
+        prof = pcr.tc
+        log(pcr.name + ": " + prof.name + ", " + time_model.hms(pcr.waits(cycles)) + " on the block")
+        if pcr.ready_at is not None:
+            log("bringing block to " + str(pcr.ready_at))
+            thermal.block(pcr.ready_at, prof.block_max_volume)
+        log("bringing lid to " + str(prof.lid))
+        thermal.lid(prof.lid)
+        log("closing lid")
+        tc.close_lid()
+        for temp, sec in prof.holds:
+            log(pcr.name + ": " + str(temp) + "C", seconds=sec)
+            sched.hold(temp, seconds=sec, block_max_volume=prof.block_max_volume)
+            sched.wait()
+        if prof.cycle:
+            _cycles = prof.cycles_for(cycles)
+            log("entering loop for " + str(_cycles) + " reps")
+            tc.execute_profile(steps=prof.cycle_steps(), repetitions=_cycles, block_max_volume=prof.block_max_volume)
+        for temp, sec in prof.final:
+            log(pcr.name + ": " + str(temp) + "C", seconds=sec)
+            sched.hold(temp, seconds=sec, block_max_volume=prof.block_max_volume)
+            sched.wait()
+        log("done, cooling block to " + str(prof.cool_to))
+        tc.set_block_temperature(prof.cool_to, block_max_volume=prof.block_max_volume)
+        log("opening lid")
+        tc.open_lid()
+        thermal.release_lid()
+
     ## END HELPER FUNCTIONS ##
 
+    @hwproxy.stage
     def dyn_cleanup_amplification(
-        _well: protocol_api.labware.Well,
-        _tc_dest: protocol_api.labware.Well,
+        _wells: list,
+        _tc_dests: list,
         _amp_rxn_mix_stock: protocol_api.labware.Well
     ):
         """
-        _well:              new magnet well to mix in
-        _tc_dest:           TC well destination
-        _amp_rxn_mix_stock: amp rxn mix stock on ice (prepped but not mixed)
+        _wells:             new magnet wells to mix in, one per column
+        _tc_dests:          TC well destinations
+        _amp_rxn_mix_stock: amp rxn mix stock on ice (prepped but not mixed), shared by all columns
         """
-        
-        print("Load 90ul GEM sample in: " + str(_well))
-        print("Add 125ul pink recovery agent to 90ul GEM sample in: " + str(_well))
-        print("    wait 2 minutes for separation")
-        print("        if sep incomplete:")
-        print("            transfer to tubestrip extremely gently")
-        print("            invert tubestrip 5x")
-        print("            centrifuge briefly")
-        print("            transfer back to: " + str(_well))
-        print("Slowly remove 125ul recovery agent/artitioning oil (pink) from bottom of tube")
-        print("    do not aspirate aqueous sample")
-        input("press enter to continue...")
+        if not ckpt.pending("GEM cleanup & cDNA amplification"):
+            return
+        dyn, = plan.steps('dyn_cleanup_amplification', stages.DynabeadCleanup)
+        pcr, = plan.steps('dyn_cleanup_amplification', stages.Thermocycle)
+
+        _names = " ".join(str(w) for w in _wells)
+        operator_input("press enter to continue...", details=[
+            "Load 90ul GEM sample in: " + _names,
+            "Add 125ul pink recovery agent to 90ul GEM sample in: " + _names,
+            "    wait 2 minutes for separation",
+            "        if sep incomplete:",
+            "            transfer to tubestrip extremely gently",
+            "            invert tubestrip 5x",
+            "            centrifuge briefly",
+            "            transfer back to: " + _names,
+            "Slowly remove 125ul recovery agent/artitioning oil (pink) from bottom of tube",
+            "    do not aspirate aqueous sample"])
 
         # positions referencing specific _well
-        _well_300_nomag = _well.top().move(types.Point(
-            x=well_300_nomag[0],
-            y=well_300_nomag[1],
-            z=well_300_nomag[2]))
-        _well_300_mag = _well.top().move(types.Point(
-            x=well_300_mag[0],
-            y=well_300_mag[1],
-            z=well_300_mag[2]))
+        def _well_300_nomag(_well):
+            return _well.top().move(types.Point(
+                x=well_300_nomag[0],
+                y=well_300_nomag[1],
+                z=well_300_nomag[2]))
+        def _well_300_mag(_well):
+            return _well.top().move(types.Point(
+                x=well_300_mag[0],
+                y=well_300_mag[1],
+                z=well_300_mag[2]))
 
         mag.disengage()
-        p300.pick_up_tip()
-        p20.pick_up_tip()
-        p300.mix(30, 180, dyn_stock, rate=2.0)
-        p300.aspirate(200, dyn_stock, rate=0.2)
-        protocol.delay(seconds=4)
-        p300.move_to(dyn_stock.top())
-        protocol.delay(seconds=4)
-        p300.touch_tip()
-        p300.dispense(200, _well.top(), rate=0.2)
-        protocol.delay(seconds=1)
-        inc_sec = 600
-        print("dynabead incubation starting: " + str(inc_sec) + " seconds")
-        inc_start = time.monotonic()
-        while time.monotonic() < inc_start + inc_sec:
-            p300.aspirate(200, _well_300_mag)
-            p300.dispense(200, _well_300_mag)
-        print(datetime.datetime.now())
-        p300.move_to(_well.top(z=4), speed = 4.4)
+        tips.need(p300, dyn_stock)
+        mixer.mix(p300, 180, dyn_stock, cycles=30, liquid='bead_stock', label='dynabead stock')
+        beads = lc('dynabeads', p300)
+        for _well in _wells:    # dispensed from the top, one tip serves every column
+            p300.aspirate(200, dyn_stock, rate=beads.aspirate_rate)
+            pause(beads.aspirate_delay)
+            p300.move_to(dyn_stock.top(), speed=beads.withdraw_speed)
+            pause(beads.drip_delay)
+            p300.touch_tip()
+            p300.dispense(200, _well.top(), rate=beads.dispense_rate)
+            pause(beads.dispense_delay)
+        inc_sec = dyn.inc_sec
+        log("dynabead incubation starting", seconds=inc_sec)
+        # columns take turns mixing for an equal share of the incubation
+        inc_start = CLOCK.monotonic()
+        for c, _well in enumerate(_wells):
+            if c > 0:
+                p300.blow_out()
+            tips.need(p300, _well)
+            mixer.mix(p300, 200, _well_300_mag(_well), seconds=inc_start + inc_sec*(c + 1)/len(_wells) - CLOCK.monotonic(),
+                      liquid='dynabead_inc', label='dynabead incubation')
+            withdraw(p300, lc('dynabead_inc', p300), _well, _well_300_mag(_well))
+            p300.move_to(_well.top(z=4))
+        log("dynabead incubation finished")
         mag.engage(height=mag_z)
-        protocol.delay(seconds=20)
+        deadlines.start('magnet engaged')
+        deadlines.wait('magnet engaged', 20)
         p300.blow_out()
-        protocol.delay(seconds=220)
-        for _ in range(2):
-            p300.aspirate(200, _well_300_mag, rate=0.2)
-            p300.move_to(_well_300_mag.move(types.Point(z=2)), speed=1)
-            p300.dispense(200, protocol.fixed_trash['A1'])
-        p300.drop_tip()
+        deadlines.wait('magnet engaged', dyn.mag_sec)
+        # last column first, its mixing tip can take the supernatant to the trash
+        for c, _well in enumerate(reversed(_wells)):
+            tips.need(p300, _well, waste=True)
+            sup = lc('supernatant', p300)
+            for _ in range(2):
+                p300.aspirate(200, _well_300_mag(_well), rate=sup.aspirate_rate)
+                pause(sup.aspirate_delay)
+                withdraw(p300, sup, _well, _well_300_mag(_well), upto=_well_300_mag(_well).move(types.Point(z=2)))
+                p300.dispense(200, protocol.fixed_trash['A1'], rate=sup.dispense_rate)
         
-        eth_wash_drain(getEthStock(), _well, _w=[260,250])
+        eth_wash_drain(_wells, _w=dyn.ethanol, _wash_sec=dyn.eth_wash_sec, _sep_sec=dyn.eth_sep_sec)
 
-        protocol.delay(seconds=30)  # exactly 1-minute after ethanol is removed from pellet (10x protocol)
+        deadlines.wait('ethanol removed', dyn.dry_sec)     # exactly 1-minute after ethanol is removed from pellet (10x protocol)
 
         mag.disengage()
 
-        vol = 36
-        for i in range(2):
-            p20.aspirate(vol/2, elu_sol_1.bottom(z=getEppendorf_1_5Height(STATE['elu_stock_vol'] - i*(vol/2))), rate=1)
-            p20.dispense(vol/2, _well_300_nomag.move(types.Point(z=getMagWellHeight((i+1)*(vol/2)))), rate=1)
-            p20.move_to(_well_300_nomag.move(types.Point(z=getMagWellHeight((i+1)*(vol/2) + 40))), speed = 4.4)   #slowly +Z pipette, pulling droplet out of tip
-            p20.blow_out()                                                                      #blows bubble out tip
-            p20.move_to(_well.top())
-        p300.pick_up_tip()
-
-        inc_sec_elu = 140
-        print("elu_sol_1 incubation starting: " + str(inc_sec_elu) + " seconds")
-        inc_start_elu = time.monotonic()
-        while time.monotonic() < inc_start_elu + inc_sec_elu:
-            p300.aspirate(30, _well_300_nomag.move(types.Point(z=-0.5)), rate=2)
-            p300.move_to(_well_300_nomag.move(types.Point(z=0.5)), speed=1)
-            p300.dispense(30, _well_300_nomag.move(types.Point(z=0.5)), rate=2)
-            protocol.delay(seconds=0.5)
-        print(datetime.datetime.now())
-        protocol.delay(seconds=1)
-        p300.move_to(_well_300_nomag.move(types.Point(z=getMagWellHeight(35 + 80))), speed=2)
-        protocol.delay(seconds=1)
-        p300.blow_out()
-        p300.drop_tip()
+        vol = dyn.elu_vol
+        elu = lc('elution', p20)
+        for c, _well in enumerate(_wells):
+            for i in range(2):
+                tips.need(p20, elu_sol_1)
+                p20.aspirate(vol/2, liquid.surface(elu_sol_1, -vol/2), rate=elu.aspirate_rate)
+                pause(elu.aspirate_delay)
+                p20.dispense(vol/2, _well_300_nomag(_well).move(types.Point(z=getMagWellHeight((i+1)*(vol/2)))), rate=elu.dispense_rate)
+                pause(elu.dispense_delay)
+                p20.move_to(_well_300_nomag(_well).move(types.Point(z=getMagWellHeight((i+1)*(vol/2)) + clear_mm)), speed=elu.rise_speed)   #slowly +Z pipette, pulling droplet out of tip
+                p20.blow_out()                                                                      #blows bubble out tip
+                p20.move_to(_well.top())
+
+        inc_sec_elu = dyn.elu_inc_sec
+        log("elu_sol_1 incubation starting", seconds=inc_sec_elu)
+        inc_start_elu = CLOCK.monotonic()
+        for c, _well in enumerate(_wells):
+            tips.need(p300, _well)
+            mixer.mix(p300, 30, _well_300_nomag(_well).move(types.Point(z=-0.5)),
+                      seconds=inc_start_elu + inc_sec_elu*(c + 1)/len(_wells) - CLOCK.monotonic(), liquid='elution_mix',
+                      label='elution incubation', dispense_at=_well_300_nomag(_well).move(types.Point(z=0.5)))
+            log("elu_sol_1 mixing finished", well=str(_well))
+            susp = lc('bead_suspension', p300)
+            pause(susp.dispense_delay)
+            p300.move_to(_well_300_nomag(_well).move(types.Point(z=getMagWellHeight(35) + clear_mm)), speed=susp.rise_speed)
+            pause(susp.dispense_delay)
+            p300.blow_out()
         mag.engage(height=mag_z)
 
         # lid open takes between 28 and 4 seconds, plenty of time for mag sep in small volume
         tc.open_lid()
 
-        # amp_mix_into_tc
-        p300.pick_up_tip()
-        for _ in range(30):
-            p300.aspirate(40, _amp_rxn_mix_stock.bottom(z=0.5))
-            p300.dispense(40, _amp_rxn_mix_stock.bottom(z=0.5))
-        p300.aspirate(65, _amp_rxn_mix_stock.bottom(z=0.5), rate = 0.2)
-        protocol.delay(seconds=0.5)
-        p300.move_to(_amp_rxn_mix_stock.bottom(z=2), speed=1)
-        p300.dispense(65, _tc_dest.bottom(z=1), rate=0.2)
-        protocol.delay(seconds=0.5)
-        p300.move_to(_tc_dest.bottom(z=10), speed = 1)
-        p300.move_to(_tc_dest.top())
-        p300.blow_out()
-        p300.drop_tip()
-        p300.pick_up_tip()
+        # amp_mix_into_tc: tc wells are empty, one tip serves every column
+        tips.need(p300, _amp_rxn_mix_stock)
+        mixer.mix(p300, 40, _amp_rxn_mix_stock.bottom(z=0.5), cycles=30, label='amp rxn mix')
+        mix = lc('enzyme_mix', p300)
+        for _tc_dest in _tc_dests:
+            _asp = liquid.surface(_amp_rxn_mix_stock, -65)
+            p300.aspirate(65, _asp, rate=mix.aspirate_rate)
+            pause(mix.aspirate_delay)
+            withdraw(p300, mix, _amp_rxn_mix_stock, _asp)
+            p300.dispense(65, _tc_dest.bottom(z=1), rate=mix.dispense_rate)
+            pause(mix.dispense_delay)
+            withdraw(p300, mix, _tc_dest, _tc_dest.bottom(z=1))
+            p300.move_to(_tc_dest.top())
+            p300.blow_out()
 
         # duration: 1:06
         _sup_vol = 17.5
         _sup_rep = 2
         # transfer supernatent (_well must be magnet well)
-        vacuum_aspirate_transfer(
-            _asp_pos=_well_300_mag,
-            _asp_spd=0.2,
-            _vol=_sup_vol,
-            _dest=_tc_dest.bottom(),
-            _blow_pos=_tc_dest.top(),
-            _reps=_sup_rep)
+        for c, (_well, _tc_dest) in enumerate(zip(_wells, _tc_dests)):
+            vacuum_aspirate_transfer(
+                _asp_pos=_well_300_mag(_well),
+                _liquid='eluate',
+                _vol=_sup_vol,
+                _dest=_tc_dest.bottom(),
+                _blow_pos=_tc_dest.top(),
+                _reps=_sup_rep)
         mag.disengage()
-        p20.drop_tip()
 
-        p300.aspirate(65, _tc_dest.bottom(z=1))
-        for i in range(30):
-            p300.dispense(60, _tc_dest)
-            p300.aspirate(60, _tc_dest.bottom(z=1))
-        p300.dispense(65, _tc_dest.bottom(z=1))
+        for c, _tc_dest in enumerate(_tc_dests):
+            tips.need(p300, _tc_dest)     # the amp mix tip carries nothing the first column lacks
+            mixer.mix(p300, 60, _tc_dest.bottom(z=1), cycles=30, label='amp reaction')
 
-        p300.move_to(_tc_dest.top())
-        protocol.delay(seconds=1)
-        p300.blow_out()
-        p300.drop_tip()
+            p300.move_to(_tc_dest.top())
+            pause(mix.drip_delay)
+            p300.blow_out()
 
         # start: 58:54
-        cdna_amp_pcr_loop_prof = [
-            {"temperature": 98, "hold_time_seconds": 15},
-            {"temperature": 63, "hold_time_seconds": 20},
-            {"temperature": 72, "hold_time_seconds": 60}
-        ] # 11 cycles if sampling large number of cells, 12 cycles if small (<12,000 targeted cell recov. per GEM well)
-        
-        tc.close_lid()
-        print("bringing lid to temp: " + str(datetime.datetime.now()))
-        tc.set_lid_temperature(105)
-        print("block temp: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(98, hold_time_minutes=3, block_max_volume=100)
-        print("looping: " + str(datetime.datetime.now()))
-        tc.execute_profile(steps= cdna_amp_pcr_loop_prof, repetitions=12, block_max_volume=100)
-        print("pcr: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(72, hold_time_seconds=60, block_max_volume=100)
-        print("pcr done, cooling: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(4)
-        print("opening lid: " + str(datetime.datetime.now()))
-        tc.open_lid()
+        # 11 cycles if sampling large number of cells, 12 cycles if small (<12,000 targeted cell recov. per GEM well)
+        thermocycle(pcr)
+        ckpt.save()
         # end: 1:42:28
         # iteration_8 duration: 44:34
 
 
-    def cDNA_cleanup_pellet_cleanup(
-        _tc_source: protocol_api.labware.Well,
-        _well: protocol_api.labware.Well,
-        _purified_cDNA: protocol_api.labware.Well,
-        _multiplex: bool
-    ):
-        """
-        _tc_source:     _tc_dest of dyn_cleanup_amplification
-        _well:          new magnet well to mix in
-        _purified_cDNA: destination on temp plate for final product of 2.3A
-        """
-
-        sel_96_ring_mag(
-            well = _well,
-            cDNA = _tc_source,
-            spri_vol = 60,
-            cDNA_vol = 100,
-            mix_vol = 130, 
-            mix_rep = 30,
-            inc_sec = 300,
-            mag_sec = 240,
-            pel = True,
-            dry_sec = 120,
-            eb_vol = 41,
-            inc_sec_2 = 120,
-            mag_sec_2 = 120,
-            dest = _purified_cDNA,
-            dest_vol = 20,
-            dest_rep = 2,
-            _w = [200,200],
-            multiplex = _multiplex,
-            mag_source = False,
-            to_mag = True
-        )
-
-        if _multiplex:
-            sel_96_ring_mag(
-                well = mult_cleanup,
-                cDNA = mult_cleanup,
-                spri_vol = 70,
-                cDNA_vol = 75,
-                mix_vol = 130, 
-                mix_rep = 30,
-                inc_sec = 300,
-                mag_sec = 300,
-                pel = True,
-                dry_sec = 120,
-                eb_vol = 41,
-                inc_sec_2 = 120,
-                mag_sec_2 = 120,
-                dest = multiplex_cln,
-                dest_vol = 20,
-                dest_rep = 2,
-                _w = [230,230],
-                multiplex = False,
-                mag_source = True,
-                to_mag = False,
-            )
+    @hwproxy.stage
+    def cDNA_cleanup_pellet_cleanup():
+        """cDNA_amp_tc of dyn_cleanup_amplification, cleaned up into purified_cDNA on the temp plate
+        (& multiplex_cln when multiplexing), see stages.json"""
+        for sel in plan.steps('cDNA_cleanup_pellet_cleanup', stages.SizeSelection):
+            sel_96_ring_mag(sel)
 
+    @hwproxy.stage
     def frag_end_repair_a_tailing_size_sel(
         _frag_mix: protocol_api.labware.Well,
-        _frag_mix_tc: protocol_api.labware.Well,
-        _purified_cDNA: protocol_api.labware.Well,
-        _treated_cDNA: protocol_api.labware.Well,
-        _size_sel_0_cDNA: protocol_api.labware.Well
+        _frag_mix_tcs: list,
+        _purified_cDNAs: list
     ):
         """
-        _frag_mix is frag buffer & enzyme added to same well on temp plate @4C (tranferred to TC, then mixed)
-        _frag_mix_tc is destination for cDNA mix on TC plate
-        _purified_cDNA is destination on temp plate for final product of 2.3A
+        _frag_mix is frag buffer & enzyme added to same well on temp plate @4C (tranferred to TC, then mixed), shared by all columns
+        _frag_mix_tcs are destinations for cDNA mix on TC plate
+        _purified_cDNAs are destinations on temp plate for final product of 2.3A
         EB buffer stock
-        _treated_cDNA is magnet well for post-tc _frag_mix_tc solution
-        _size_sel_0_cDNA is _treated_cDNA, after one round of SPRIselect
-        _ada_lig_mix is final destination of _size_sel_cDNA for ada_lig_cleanup next step (temp plate)
-                    is already prepped on ice with lig buffer, dna ligase, and ada oligo (unmixed)
+        size selections into ada_lig_mix for ada_lig_cleanup next step (temp plate), see stages.json
+                    ada_lig_mix is already prepped on ice with lig buffer, dna ligase, and ada oligo (unmixed)
         """
 
-        # tc already pre-cooled, open from dyn_cleanup_amplification
-        print("pre-cooling tc block to 4C if not already pre-cooled: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(4)
-        print("opening lid: " + str(datetime.datetime.now()))
-        tc.open_lid()
+        pcr, = plan.steps('frag_end_repair_a_tailing_size_sel', stages.Thermocycle)
+        sel_0, sel_1 = plan.steps('frag_end_repair_a_tailing_size_sel', stages.SizeSelection)
+        if ckpt.pending(pcr.name):
+            # tc already pre-cooled, open from dyn_cleanup_amplification
+            log("pre-cooling tc block to " + str(pcr.assemble_at) + "C if not already pre-cooled")
+            thermal.block(pcr.assemble_at)
+            log("opening lid")
+            tc.open_lid()
+
+            eb = lc('eb', p20)
+            tips.need(p20, eb_stock)
+            for _frag_mix_tc in _frag_mix_tcs:     # tc wells are empty, one tip serves every column
+                p20.aspirate(15, liquid.surface(eb_stock, -15), rate=eb.aspirate_rate)
+                pause(eb.aspirate_delay)
+                p20.move_to(eb_stock.top(), speed=eb.withdraw_speed)
+                p20.dispense(15, _frag_mix_tc.bottom(z=0.2), rate=eb.dispense_rate)
+                pause(eb.dispense_delay)
+                p20.move_to(_frag_mix_tc.bottom(z=4), speed=eb.rise_speed)
+                pause(eb.dispense_delay)
+                p20.move_to(_frag_mix_tc.top())
+                p20.blow_out()
+                p20.touch_tip()
 
-        p20.pick_up_tip()
-        p20.aspirate(15, eb_stock.bottom(z=getEppendorf_1_5Height(STATE['eb_stock_vol'] - 15)), rate=0.25)
-        protocol.delay(seconds=1)
-        p20.move_to(eb_stock.top(), speed=10)
-        p20.dispense(15, _frag_mix_tc.bottom(z=0.2), rate=1.0)
-        protocol.delay(seconds=0.5)
-        p20.move_to(_frag_mix_tc.bottom(z=4), speed = 4.4)
-        protocol.delay(seconds=0.5)
-        p20.move_to(_frag_mix_tc.top())
-        p20.blow_out()
-        p20.touch_tip()
-        p20.drop_tip()
-
-        p20.pick_up_tip()
-        for _ in range(15):
-            p20.aspirate(14, _frag_mix.bottom(z=0.1))
-            p20.dispense(14, _frag_mix.bottom(z=0.1))
-        vacuum_aspirate_transfer(
-            _asp_pos=_frag_mix.bottom(z=0.1),
-            _asp_spd=0.2,
-            _vol=15,
-            _dest=_frag_mix_tc,
-            _blow_pos=_frag_mix_tc.top(),
-            _reps=1)
-        p20.touch_tip()
-        p20.touch_tip()
-        p20.drop_tip()
-        p20.pick_up_tip()
-        vacuum_aspirate_transfer(
-            _asp_pos=_purified_cDNA.bottom(z=0.2),
-            _asp_spd=0.2,
-            _vol=20,
-            _dest=_frag_mix_tc,
-            _blow_pos=_frag_mix_tc.top(),
-            _reps=1)
-        p20.blow_out(_frag_mix_tc)
-        p20.touch_tip()
-        p20.touch_tip()
-        p20.drop_tip()
-
-        p300.pick_up_tip()
-        for _ in range(30):
-            p300.aspirate(30, _frag_mix_tc.bottom(0.2))
-            p300.dispense(30, _frag_mix_tc.bottom(0.2))
-        p300.move_to(_frag_mix_tc.top())
-        protocol.delay(seconds=4)
-        p300.blow_out(_frag_mix_tc.top())
-        p300.touch_tip()
-        p300.drop_tip()
-        
-        # iteration_8 start: 2:14:00
-        print("bringing lid to temp: " + str(datetime.datetime.now()))
-        tc.set_lid_temperature(65)
-        print("closing lid: " + str(datetime.datetime.now()))
-        tc.close_lid()
-        print("starting fragmentation, 5min: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(32, hold_time_minutes=5, block_max_volume=50)
-        print("starting end repair, a-tailing. 30min: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(65, hold_time_minutes=30, block_max_volume=50)
-        print("done, starting to cool block: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(4)
-        # 3:03:20  
-        print("opening lid: " + str(datetime.datetime.now()))
-        tc.open_lid()
-        # 3:04:08 
-        print("pre-cooling lid for next step: " + str(datetime.datetime.now()))
-        tc.set_lid_temperature(37)
-        # iteration_8 end: 3:31:00  30 minute lid temp change????!!?
-
-        sel_96_ring_mag(
-            well = _treated_cDNA,
-            cDNA = _frag_mix_tc,
-            spri_vol = 30,
-            cDNA_vol = 50,
-            mix_vol = 50,
-            mix_rep = 30,
-            inc_sec = 300,
-            mag_sec = 240,
-            pel = False,
-            dry_sec = 0,
-            eb_vol = 0,
-            inc_sec_2 = 0,
-            mag_sec_2 = 0,
-            dest = size_sel_0_cDNA,
-            dest_vol = 18.75,
-            dest_rep = 4,
-            _w = [0,0],
-            multiplex = False,
-            mag_source = False,
-            to_mag = True
-        )
+            tips.need(p20, _frag_mix)
+            mixer.mix(p20, 14, _frag_mix.bottom(z=0.1), cycles=15, label='frag mix')
+            for _frag_mix_tc in _frag_mix_tcs:     # tc wells only hold EB so far
+                vacuum_aspirate_transfer(
+                    _asp_pos=liquid.surface(_frag_mix, -15, floor=0.1),
+                    _liquid='enzyme_mix',
+                    _vol=15,
+                    _dest=_frag_mix_tc,
+                    _blow_pos=_frag_mix_tc.top(),
+                    _reps=1)
+                p20.touch_tip()
+                p20.touch_tip()
+            for _purified_cDNA, _frag_mix_tc in zip(_purified_cDNAs, _frag_mix_tcs):
+                vacuum_aspirate_transfer(
+                    _asp_pos=_purified_cDNA.bottom(z=0.2),
+                    _liquid='aqueous',
+                    _vol=20,
+                    _dest=_frag_mix_tc,
+                    _blow_pos=_frag_mix_tc.top(),
+                    _reps=1)
+                p20.blow_out(_frag_mix_tc)
+                p20.touch_tip()
+                p20.touch_tip()
 
-        sel_96_ring_mag(
-            well = _size_sel_0_cDNA,
-            cDNA = size_sel_0_cDNA,
-            spri_vol = 10,
-            cDNA_vol = 75,
-            mix_vol = 55,
-            mix_rep = 30,
-            inc_sec = 300,
-            mag_sec = 240,
-            pel = True,
-            dry_sec = 60,
-            eb_vol = 51,
-            inc_sec_2 = 120,
-            mag_sec_2 = 120,
-            dest = ada_lig_mix,
-            dest_vol = 16.67,
-            dest_rep = 3,
-            _w = [125,125],
-            multiplex = False,
-            mag_source = True,
-            to_mag = False
-        )
+            for _frag_mix_tc in _frag_mix_tcs:
+                tips.need(p300, _frag_mix_tc)
+                mixer.mix(p300, 30, _frag_mix_tc.bottom(0.2), cycles=30, label='frag reaction')
+                p300.move_to(_frag_mix_tc.top())
+                pause(lc('enzyme_mix', p300).drip_delay)
+                p300.blow_out(_frag_mix_tc.top())
+                p300.touch_tip()
+        
+            # iteration_8 start: 2:14:00
+            # fragmentation, then end repair & a-tailing; the lid cools during the size selections instead of blocking here
+            thermocycle(pcr)
+            # iteration_8 end: 3:31:00  30 minute lid temp change????!!?
+            ckpt.save()
+
+        sel_96_ring_mag(sel_0)
+        thermal.release_block()     # tc plate is empty until ligation
+        sel_96_ring_mag(sel_1)
     
+    @hwproxy.stage
     def ada_lig_cleanup(
-        _ada_lig_mix: protocol_api.labware.Well,
-        _ada_lig_mix_tc: protocol_api.labware.Well
+        _ada_lig_mixes: list,
+        _ada_lig_mix_tcs: list
     ):
         """
-        _ada_lig_mix is 50ul final product of previous frag_end_repair_a_tailing_size_sel step
+        _ada_lig_mixes are 50ul final product of previous frag_end_repair_a_tailing_size_sel step
                     50ul adaptor ligation mix (unmixed) prepared within well previous step
-        _ada_lig_mix_tc is tc destination for mixed 100ul _ada_lig_mix, prev step product
+        _ada_lig_mix_tcs are tc destinations for mixed 100ul _ada_lig_mixes, prev step product
         """
 
-        print("bringing block to 20C")
-        tc.set_block_temperature(20)
-        p300.pick_up_tip()
-        for _ in range(30):
-            p300.aspirate(70, _ada_lig_mix.bottom(z=0.3))
-            p300.dispense(70, _ada_lig_mix.bottom(z=0.3))
-        p300.aspirate(90, _ada_lig_mix.bottom(z=0.3))
-        p300.dispense(90, _ada_lig_mix.bottom(z=0.3))
-        p300.aspirate(90, _ada_lig_mix.bottom(z=0.3), rate=0.2)
-        protocol.delay(seconds=1)
-        p300.move_to(_ada_lig_mix.bottom(z=2), speed=1)
-        p300.move_to(_ada_lig_mix.top())
-        p300.dispense(90, _ada_lig_mix_tc.bottom(z=0.3))
-        p300.move_to(_ada_lig_mix_tc.top())
-        protocol.delay(seconds=4)
-        p300.blow_out(_ada_lig_mix_tc.top())
-        p300.touch_tip()
-        p300.drop_tip()
-        p20.pick_up_tip()
-        # fetch remaining 10ul, + extra volume if accuracy is not perfect
-        vacuum_aspirate_transfer(
-            _asp_pos=_ada_lig_mix.bottom(),
-            _asp_spd=1.0,
-            _vol=16.67,
-            _dest=_ada_lig_mix_tc.top(z=-2),    #TODO: dispense just above liquid height to avoid bubbles
-            _blow_pos=_ada_lig_mix_tc.top(),
-            _reps=1)
-        p20.drop_tip()
-        print("closing lid: " + str(datetime.datetime.now()))
-        tc.close_lid()
-        print("bringing lid to temp: " + str(datetime.datetime.now()))
-        tc.set_lid_temperature(37)
-        print("20c for 15min: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(20, hold_time_minutes=15, block_max_volume=100)
-        print("incubate done, cooling: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(4)
-        print("opening lid: " + str(datetime.datetime.now()))
-        tc.open_lid()
-
-        sel_96_ring_mag(
-            well = lig_cleanup_0,
-            cDNA = _ada_lig_mix_tc,
-            spri_vol = 80,
-            cDNA_vol = 100,
-            mix_vol = 140, 
-            mix_rep = 30,
-            inc_sec = 300,
-            mag_sec = 240,
-            pel = True,
-            dry_sec = 120,
-            eb_vol = 31,
-            inc_sec_2 = 120,
-            mag_sec_2 = 120,
-            dest = postlig_cleanup,
-            dest_vol = 15,
-            dest_rep = 2,
-            _w = [200,200],
-            multiplex = False,
-            mag_source = False,
-            to_mag = False
-        )
-
+        pcr, = plan.steps('ada_lig_cleanup', stages.Thermocycle)
+        if ckpt.pending(pcr.name):
+            log("bringing block to " + str(pcr.assemble_at) + "C")
+            thermal.block(pcr.assemble_at)
+            mix = lc('enzyme_mix', p300)
+            for _ada_lig_mix, _ada_lig_mix_tc in zip(_ada_lig_mixes, _ada_lig_mix_tcs):
+                tips.need(p300, _ada_lig_mix)
+                mixer.mix(p300, 70, _ada_lig_mix.bottom(z=0.3), cycles=30, label='ligation mix')
+                # one full-volume pass takes up what the 70ul cycles left above the tip
+                mixer.mix(p300, 90, _ada_lig_mix.bottom(z=0.3), cycles=1, liquid='aqueous', label='ligation mix, full volume')
+                p300.aspirate(90, _ada_lig_mix.bottom(z=0.3), rate=mix.aspirate_rate)
+                pause(mix.aspirate_delay)
+                withdraw(p300, mix, _ada_lig_mix, _ada_lig_mix.bottom(z=0.3))
+                p300.move_to(_ada_lig_mix.top())
+                p300.dispense(90, _ada_lig_mix_tc.bottom(z=0.3), rate=mix.dispense_rate)
+                pause(mix.dispense_delay)
+                p300.move_to(_ada_lig_mix_tc.top())
+                pause(mix.drip_delay)
+                p300.blow_out(_ada_lig_mix_tc.top())
+                p300.touch_tip()
+                # fetch remaining 10ul, + extra volume if accuracy is not perfect
+                vacuum_aspirate_transfer(
+                    _asp_pos=_ada_lig_mix.bottom(),
+                    _liquid='enzyme_mix',
+                    _vol=16.67,
+                    _dest=liquid.surface(_ada_lig_mix_tc, 16.67, depth=-0.5),   # just above the liquid, no bubbles
+                    _blow_pos=_ada_lig_mix_tc.top(),
+                    _reps=1)
+            thermocycle(pcr)
+            ckpt.save()
+
+        for sel in plan.steps('ada_lig_cleanup', stages.SizeSelection):
+            sel_96_ring_mag(sel)
+
+    @hwproxy.stage
     def index_pcr_size_sel(
-        _samp_index_pcr: protocol_api.labware.Well,
-        _dual_ind_tt_set_a: protocol_api.labware.Well
+        _samp_index_pcrs: list,
+        _dual_ind_tt_set_as: list
     ):
         """
-        _samp_index_pcr is tc location of final product from previous step
+        _samp_index_pcrs are tc locations of final product from previous step
                     is not yet mixed with Amp mix or dual index TT set A
-        _amp_mix is >=50ul amp mix stock on temp plate
-        _dual_ind_tt_set_a is pre-aliquotted onto temp plate
+        _amp_mix is >=50ul amp mix stock per column on temp plate, shared by all columns
+        _dual_ind_tt_set_as are pre-aliquotted onto temp plate
         """
 
-        p20.pick_up_tip()
-        # TODO: centralize Amp mix location on temp block, use for amp_rxn_mix prep
-        vacuum_aspirate_transfer(
-            _asp_pos=postlig_cleanup.bottom(z=0.1),
-            _asp_spd=0.2,
-            _vol=15,
-            _dest=_samp_index_pcr,
-            _blow_pos=_samp_index_pcr.top(),
-            _reps=2)
-        vacuum_aspirate_transfer(
-            _asp_pos=amp_mix.bottom(z=0.1),
-            _asp_spd=0.2,
-            _vol=16.67,
-            _dest=_samp_index_pcr,
-            _blow_pos=_samp_index_pcr.top(),
-            _reps=3)
-        vacuum_aspirate_transfer(
-            _asp_pos = _dual_ind_tt_set_a.bottom(z=0.1),
-            _asp_spd = 0.2,
-            _vol=20,
-            _dest=_samp_index_pcr,
-            _blow_pos=samp_index_pcr.top(),
-            _reps=1)
-        p20.drop_tip()
-        p300.pick_up_tip()
-        for _ in range(10):
-            p300.aspirate(70, _samp_index_pcr.bottom(z=0.3))
-            p300.dispense(70, _samp_index_pcr.bottom(z=0.3))
-        p300.move_to(_samp_index_pcr.top())
-        protocol.delay(seconds=4)
-        p300.touch_tip()
-        p300.blow_out(_samp_index_pcr)
-        p300.touch_tip()
-        p300.drop_tip()
-        print("bringing block to 20: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(20)
-        print("bringing lid to 105: " + str(datetime.datetime.now()))
-        tc.set_lid_temperature(105)
-        print("closing lid: " + str(datetime.datetime.now()))
-        
-        tc.close_lid()
-
-        with open('thermo-cycles-3.5.json') as cycle_file:
-            json_def = json.load(cycle_file)
-            _cycles = int(json_def["num-cycles"])
-
-        if _cycles == 0:
-            while True:
-                print("3.5: begining automated PCR steps. Please input # of cycles calculated from cDNA input from 2.4QC")
-                _in = input("total cycles: ")
+        pcr, = plan.steps('index_pcr_size_sel', stages.Thermocycle)
+        if ckpt.pending(pcr.name):
+            # amp mix goes first, into empty tc wells, so its tip never touches a sample & serves every column
+            # TODO: centralize Amp mix location on temp block, use for amp_rxn_mix prep
+            for _samp_index_pcr in _samp_index_pcrs:
+                vacuum_aspirate_transfer(
+                    _asp_pos=liquid.surface(amp_mix, -3*16.67, floor=0.1),
+                    _liquid='enzyme_mix',
+                    _vol=16.67,
+                    _dest=_samp_index_pcr,
+                    _blow_pos=_samp_index_pcr.top(),
+                    _reps=3)
+            for _postlig_cleanup, _samp_index_pcr, _dual_ind_tt_set_a in zip(postlig_cleanup, _samp_index_pcrs, _dual_ind_tt_set_as):
+                vacuum_aspirate_transfer(
+                    _asp_pos=_postlig_cleanup.bottom(z=0.1),
+                    _liquid='aqueous',
+                    _vol=15,
+                    _dest=_samp_index_pcr,
+                    _blow_pos=_samp_index_pcr.top(),
+                    _reps=2)
+                vacuum_aspirate_transfer(
+                    _asp_pos = _dual_ind_tt_set_a.bottom(z=0.1),
+                    _liquid = 'aqueous',
+                    _vol=20,
+                    _dest=_samp_index_pcr,
+                    _blow_pos=_samp_index_pcr.top(),
+                    _reps=1)
+            for _samp_index_pcr in _samp_index_pcrs:
+                tips.need(p300, _samp_index_pcr)
+                mixer.mix(p300, 70, _samp_index_pcr.bottom(z=0.3), cycles=10, label='index PCR mix')
+                p300.move_to(_samp_index_pcr.top())
+                pause(lc('enzyme_mix', p300).drip_delay)
+                p300.touch_tip()
+                p300.blow_out(_samp_index_pcr)
+                p300.touch_tip()
+
+            # no cycles in the stage table: they're set per run in thermo-cycles-3.5.json
+            _cycles = pcr.tc.cycles
+            _lo, _hi = pcr.tc.cycle_range or (1, 99)
+            if _cycles is None:
+                with open('thermo-cycles-3.5.json') as cycle_file:
+                    json_def = json.load(cycle_file)
+                    _cycles = int(json_def["num-cycles"])
+
+            if _cycles == 0:
+                def _cycles_ok(_in):
+                    try:
+                        _n = int(float(_in))
+                    except ValueError:
+                        return "invalid input"
+                    if _n < _lo or _n > _hi:
+                        return "invalid input, " + str(_lo) + "-" + str(_hi) + " cycles"
+                    return None
+                _in = operator_input("total cycles: ", check=_cycles_ok, details=[
+                    "3.5: begining automated PCR steps. Please input # of cycles calculated from cDNA input from 2.4QC"])
                 _cycles = int(float(_in))
-                if _cycles >= 5 and _cycles <=20:
-                   break
-                else:
-                    print("invalid input")
-
-        # sample index PCR
-        amp_ind_pcr_loop_prof = [
-            {'temperature': 98, 'hold_time_seconds': 20},
-            {'temperature': 54, 'hold_time_seconds': 30},
-            {'temperature': 72, 'hold_time_seconds': 20}
-        ]
-        # iteration_8 start: 44:15
-        print("bringing block to temp: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(98, hold_time_seconds=45, block_max_volume=100)
-        print("entering loop for " + str(_cycles) + "~70sec reps: " + str(datetime.datetime.now()))
-        tc.execute_profile(steps= amp_ind_pcr_loop_prof, repetitions=_cycles, block_max_volume=100)
-        print("bringing block to temp: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(72, hold_time_seconds=60, block_max_volume=100)
-        print("done, cooling block to 4: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(4)
-        print("opening lid: " + str(datetime.datetime.now()))
-        tc.open_lid()
-        # iteration_8 end: 1:27:23
-
-        sel_96_ring_mag(
-            well = indexed_cDNA,
-            cDNA = samp_index_pcr,
-            spri_vol = 60,
-            cDNA_vol = 100,
-            mix_vol = 120,
-            mix_rep = 30,
-            inc_sec = 300,
-            mag_sec = 240,
-            pel = False,
-            dry_sec = 0,
-            eb_vol = 0,
-            inc_sec_2 = 0,
-            mag_sec_2 = 0,
-            dest = size_sel_0_ind_cDNA,
-            dest_vol = 18.75,
-            dest_rep = 8,
-            _w = [0,0],
-            multiplex = False,
-            mag_source = False,
-            to_mag = True
-        )
 
-        sel_96_ring_mag(
-            well = size_sel_0_ind_cDNA,
-            cDNA = size_sel_0_ind_cDNA,
-            spri_vol = 20,
-            cDNA_vol = 150,
-            mix_vol = 150,
-            mix_rep = 60,
-            inc_sec = 300,
-            mag_sec = 240,
-            pel = True,
-            dry_sec = 39,
-            eb_vol = 36,
-            inc_sec_2 = 120,
-            mag_sec_2 = 120,
-            dest = final_product,
-            dest_vol = 18,
-            dest_rep = 2,
-            _w = [200,200],
-            multiplex = False,
-            mag_source = True,
-            to_mag = False
-        )
+            # iteration_8 start: 44:15
+            thermocycle(pcr, _cycles)
+            # iteration_8 end: 1:27:23
+            ckpt.save()
 
-    def multiplex_index_pcr_size_sel():
-        p20.pick_up_tip()
-        # TODO: centralize Amp mix location on temp block, use for amp_rxn_mix prep
-        vacuum_aspirate_transfer(
-            _asp_pos=multiplex_cln.bottom(z=0.1),
-            _asp_spd=0.2,
-            _vol=10,
-            _dest=mult_index_pcr,
-            _blow_pos=mult_index_pcr.top(),
-            _reps=1)
-        vacuum_aspirate_transfer(
-            _asp_pos=multiplex_ind_pcr.bottom(z=0.1),
-            _asp_spd=0.2,
-            _vol=17.5,
-            _dest=mult_index_pcr,
-            _blow_pos=mult_index_pcr.top(),
-            _reps=4)
-        vacuum_aspirate_transfer(
-            _asp_pos = dual_ind_nn_set_a.bottom(z=0.1),
-            _asp_spd = 0.2,
-            _vol=20,
-            _dest=mult_index_pcr,
-            _blow_pos=mult_index_pcr.top(),
-            _reps=1)
-        p20.drop_tip()
-        p300.pick_up_tip()
-        for _ in range(10):
-            p300.aspirate(80, mult_index_pcr.bottom(z=0.3))
-            p300.dispense(80, mult_index_pcr.bottom(z=0.3))
-        p300.move_to(mult_index_pcr.top())
-        protocol.delay(seconds=4)
-        p300.touch_tip()
-        p300.blow_out(mult_index_pcr)
-        p300.touch_tip()
-        p300.drop_tip()
-        print("bringing block to 20: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(20)
-        print("bringing lid to 105: " + str(datetime.datetime.now()))
-        tc.set_lid_temperature(105)
-        print("closing lid: " + str(datetime.datetime.now()))
-        tc.close_lid()
+        for sel in plan.steps('index_pcr_size_sel', stages.SizeSelection):
+            sel_96_ring_mag(sel)
 
-        # multiplex index PCR
-        amp_multi_index_pcr_loop_prof = [
-            {'temperature': 98, 'hold_time_seconds': 20},
-            {'temperature': 54, 'hold_time_seconds': 30},
-            {'temperature': 72, 'hold_time_seconds': 20}
-        ]
-        
-        print("bringing block to temp: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(98, hold_time_seconds=45, block_max_volume=100)
-        print("entering loop for 6 ~70sec reps: " + str(datetime.datetime.now()))
-        tc.execute_profile(steps= amp_multi_index_pcr_loop_prof, repetitions=6, block_max_volume=100)
-        print("bringing block to temp: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(72, hold_time_seconds=60, block_max_volume=100)
-        print("done, cooling block to 4: " + str(datetime.datetime.now()))
-        tc.set_block_temperature(4)
-        print("opening lid: " + str(datetime.datetime.now()))
-        tc.open_lid()
-
-        sel_96_ring_mag(
-            well = mult_size_sel,
-            cDNA = mult_index_pcr,
-            spri_vol = 120,
-            cDNA_vol = 100,
-            mix_vol = 150,
-            mix_rep = 60,
-            inc_sec = 300,
-            mag_sec = 360,
-            pel = True,
-            dry_sec = 120,
-            eb_vol = 41,
-            inc_sec_2 = 120,
-            mag_sec_2 = 120,
-            dest = multiplex_fin,
-            dest_vol = 20,
-            dest_rep = 2,
-            _w = [260,260],
-            multiplex = False,
-            mag_source = False,
-            to_mag = False
-        )
+    @hwproxy.stage
+    def multiplex_index_pcr_size_sel():
+        pcr, = plan.steps('multiplex_index_pcr_size_sel', stages.Thermocycle)
+        if ckpt.pending(pcr.name):
+            # index pcr mix goes first, into empty tc wells, so its tip never touches a sample & serves every column
+            # TODO: centralize Amp mix location on temp block, use for amp_rxn_mix prep
+            for _mult_index_pcr in mult_index_pcr:
+                vacuum_aspirate_transfer(
+                    _asp_pos=liquid.surface(multiplex_ind_pcr, -4*17.5, floor=0.1),
+                    _liquid='enzyme_mix',
+                    _vol=17.5,
+                    _dest=_mult_index_pcr,
+                    _blow_pos=_mult_index_pcr.top(),
+                    _reps=4)
+            for _multiplex_cln, _mult_index_pcr, _dual_ind_nn_set_a in zip(multiplex_cln, mult_index_pcr, dual_ind_nn_set_a):
+                vacuum_aspirate_transfer(
+                    _asp_pos=_multiplex_cln.bottom(z=0.1),
+                    _liquid='aqueous',
+                    _vol=10,
+                    _dest=_mult_index_pcr,
+                    _blow_pos=_mult_index_pcr.top(),
+                    _reps=1)
+                vacuum_aspirate_transfer(
+                    _asp_pos = _dual_ind_nn_set_a.bottom(z=0.1),
+                    _liquid = 'aqueous',
+                    _vol=20,
+                    _dest=_mult_index_pcr,
+                    _blow_pos=_mult_index_pcr.top(),
+                    _reps=1)
+            for _mult_index_pcr in mult_index_pcr:
+                tips.need(p300, _mult_index_pcr)
+                mixer.mix(p300, 80, _mult_index_pcr.bottom(z=0.3), cycles=10, label='multiplex index PCR mix')
+                p300.move_to(_mult_index_pcr.top())
+                pause(lc('enzyme_mix', p300).drip_delay)
+                p300.touch_tip()
+                p300.blow_out(_mult_index_pcr)
+                p300.touch_tip()
+            thermocycle(pcr)
+            ckpt.save()
+
+        for sel in plan.steps('multiplex_index_pcr_size_sel', stages.SizeSelection):
+            sel_96_ring_mag(sel)
 
     ## STONKS ##
     # TODO: remove tip height adjustment for these stock well
-    spri_stock  = r15['A3']
-    eb_stock    = r15['A4']
-    elu_sol_1   = r15['A5']
-    dyn_stock   = r15['A6']
-    eth_stock   = r15['A8']     #10000ul ethanol
-    eth2_stock  = r15['A9']     #10000ul ethanol
-    eth3_stock  = r15['A10']    #10000ul ethanol
-    
+    reservoir = DECK['reservoir']
+    spri_stock  = r15['A' + str(reservoir['spri_stock'])]
+    eb_stock    = r15['A' + str(reservoir['eb_stock'])]
+    elu_sol_1   = r15['A' + str(reservoir['elu_sol_1'])]
+    dyn_stock   = r15['A' + str(reservoir['dyn_stock'])]     #1600ul dynabeads per column
+    eth_stocks  = [r15['A' + str(c)] for c in reservoir['eth_stocks']][:3*NUM_COLS]   #10000ul ethanol each, 3 per column
+    if len(eth_stocks) < 3*NUM_COLS:
+        raise Exception("reservoir has room for ethanol for 2 columns, not " + str(NUM_COLS))
+
     ## WELLS ##
-    dyn_cleanup         = mag_plate['A12']
-    cDNA_cleanup        = mag_plate['A11']
-    treated_cDNA        = mag_plate['A10']  #3.2 size sel 0            
-    size_sel_0_cDNA     = mag_plate['A9']   #3.2 size sel 1
-    lig_cleanup_0       = mag_plate['A8']   #3.4 lig cleanup
-    indexed_cDNA        = mag_plate['A7']   #3.6 size sel 0
-    size_sel_0_ind_cDNA = mag_plate['A6']   #3.6 size sel 1
-    mult_cleanup        = mag_plate['A5']
-    mult_size_sel       = mag_plate['A4']
-
-    cDNA_amp_tc         = tc_plate['A5']
-    frag_mix_tc         = tc_plate['A6']
-    ada_lig_mix_tc      = tc_plate['A7']
-    samp_index_pcr      = tc_plate['A8']
-    mult_index_pcr      = tc_plate['A9']
+    multiplex = MULTIPLEX
+    room = "run fewer columns" + (", or --no-multiplex" if multiplex else "")
+
+    # one column per role for each column of samples, see layout.py
+    mag_2 = [('dyn_cleanup', NUM_COLS), ('cDNA_cleanup', NUM_COLS)]
+    mag_3 = [
+        ('treated_cDNA', NUM_COLS),         #3.2 size sel 0
+        ('size_sel_0_cDNA', NUM_COLS),      #3.2 size sel 1
+        ('lig_cleanup_0', NUM_COLS),        #3.4 lig cleanup
+        ('indexed_cDNA', NUM_COLS),         #3.6 size sel 0
+        ('size_sel_0_ind_cDNA', NUM_COLS),  #3.6 size sel 1
+    ]
+    mag_mult_2 = [('mult_cleanup', NUM_COLS)] if multiplex else []
+    mag_mult_3 = [('mult_size_sel', NUM_COLS)] if multiplex else []
+    mag_roles = mag_2 + mag_3 + mag_mult_2 + mag_mult_3
+    if sum(n for _, n in mag_roles) <= 12:
+        mag_wells = layout.allocate(mag_plate, "mag plate", mag_roles, 12, -1, hint=room)
+        mag_swap = False
+    else:   # step 2 wells are done with by the step 3 visit: a fresh mag plate goes on then
+        mag_wells = layout.allocate(mag_plate, "step 2 mag plate", mag_2 + mag_mult_2, 12, -1, hint=room)
+        mag_wells.update(layout.allocate(mag_plate, "step 3 mag plate", mag_3 + mag_mult_3, 12, -1, hint=room))
+        mag_swap = True
+    dyn_cleanup         = mag_wells['dyn_cleanup']
+
+    tc_wells = layout.allocate(tc_plate, "tc plate", [
+        ('cDNA_amp_tc', NUM_COLS),
+        ('frag_mix_tc', NUM_COLS),
+        ('ada_lig_mix_tc', NUM_COLS),
+        ('samp_index_pcr', NUM_COLS),
+    ] + ([('mult_index_pcr', NUM_COLS)] if multiplex else []), 5, hint=room)
+    cDNA_amp_tc         = tc_wells['cDNA_amp_tc']
+    frag_mix_tc         = tc_wells['frag_mix_tc']
+    ada_lig_mix_tc      = tc_wells['ada_lig_mix_tc']
+    samp_index_pcr      = tc_wells['samp_index_pcr']
+    mult_index_pcr      = tc_wells.get('mult_index_pcr')
+
+    # temp plate: 4C stocks shared by every column take one column, samples take one per column
+    # with more than one column, frag mix goes into the amp rxn mix column at the step 3 visit
+    temp_wells = layout.allocate(temp_plate, "temp plate", [
+        ('amp_rxn_mix', 1),
+        ('frag_mix', 1 if NUM_COLS == 1 else 0),
+        ('ada_lig_mix', NUM_COLS),
+        ('amp_mix', 1),
+        ('dual_ind_tt_set_a', NUM_COLS),
+    ] + ([
+        ('dual_ind_nn_set_a', NUM_COLS),
+        ('multiplex_ind_pcr', 1),
+    ] if multiplex or NUM_COLS == 1 else []) + [
+        ('postlig_cleanup', NUM_COLS),
+    ] + ([('multiplex_cln', NUM_COLS)] if multiplex or NUM_COLS == 1 else []) + [
+        ('purified_cDNA', NUM_COLS),
+        ('final_product', NUM_COLS),
+    ] + ([('multiplex_fin', NUM_COLS)] if multiplex or NUM_COLS == 1 else []), 1, hint=room)
+    if NUM_COLS > 1:
+        temp_wells['frag_mix'] = temp_wells['amp_rxn_mix']
+
+    ## STAGE TABLE ##
+    # step parameters by stage, wells by role name, see stages.py
+    roles = dict(**mag_wells, **tc_wells, **temp_wells)
+    plan = stages.compile_plan(stages.load(STAGES), multiplex, roles, STAGES, tc_profiles.load(PROFILES))
 
     ## COLD SAMPLES ##
-    postlig_cleanup     = temp_plate['A8']
-    multiplex_cln       = temp_plate['A9']  #3
-    purified_cDNA       = temp_plate['A10'] #3
-    final_product       = temp_plate['A11'] #3
-    multiplex_fin       = temp_plate['A12'] #3
+    postlig_cleanup     = temp_wells['postlig_cleanup']
+    multiplex_cln       = temp_wells.get('multiplex_cln')   #3
+    purified_cDNA       = temp_wells['purified_cDNA']       #3
+    final_product       = temp_wells['final_product']       #3
+    multiplex_fin       = temp_wells.get('multiplex_fin')   #3
 
     # 4C STOCKS #
-    amp_rxn_mix         = temp_plate['A1']      #  55ul amp mix                     [1x+10%]
-                                                #  16.5ul feature cDNA Primers 3    [1x+10%]            
-    frag_mix            = temp_plate['A2']      #   5ul frag buffer     [unmixed]
-                                                #  10ul frag enzyme
-    ada_lig_mix         = temp_plate['A3']      #  20ul ligation buffer [unmixed]
-                                                #  10ul DNA ligase
-                                                #  20ul ada oligos 
-    amp_mix             = temp_plate['A4']      #  50ul amp mix
-    dual_ind_tt_set_a   = temp_plate['A5']      #  20ul dual index tt set a  [RECORD INDEX USED]
+    # volumes per column of samples
+    amp_rxn_mix         = temp_wells['amp_rxn_mix'][0]      #  55ul amp mix                     [1x+10%]
+                                                            #  16.5ul feature cDNA Primers 3    [1x+10%]            
+    frag_mix            = temp_wells['frag_mix'][0]         #   5ul frag buffer     [unmixed]
+                                                            #  10ul frag enzyme
+    ada_lig_mix         = temp_wells['ada_lig_mix']         #  20ul ligation buffer [unmixed]
+                                                            #  10ul DNA ligase
+                                                            #  20ul ada oligos 
+    amp_mix             = temp_wells['amp_mix'][0]          #  50ul amp mix
+    dual_ind_tt_set_a   = temp_wells['dual_ind_tt_set_a']   #  20ul dual index tt set a  [RECORD INDEX USED]
     #if multiplexing:
-    multiplex = True
-    dual_ind_nn_set_a   = temp_plate['A6']      #  20ul dual index nn set a  [RECORD INDEX USED]
-    multiplex_ind_pcr   = temp_plate['A7']      #  50ul amp mix
-                                                #  20ul eb
+    dual_ind_nn_set_a   = temp_wells.get('dual_ind_nn_set_a')       #  20ul dual index nn set a  [RECORD INDEX USED]
+    multiplex_ind_pcr   = temp_wells.get('multiplex_ind_pcr', [None])[0]   #  50ul amp mix
+                                                                    #  20ul eb
 
     ## REUSED TIPS ##
-    spri_tip = t300_0['A1']
+    # what every well starts out holding, for the tip policy
+    tips.stock(spri_stock, eb_stock, elu_sol_1, dyn_stock)
+    tips.stock(*eth_stocks, tag='ethanol')     # one reagent across its columns
+    tips.stock(amp_rxn_mix, frag_mix, amp_mix)
+    tips.sample(*dyn_cleanup)
+    for _strip, _dest in zip(dual_ind_tt_set_a, samp_index_pcr):
+        tips.aliquot(_strip, _dest)
+    if multiplex:
+        tips.stock(multiplex_ind_pcr)
+        for _strip, _dest in zip(dual_ind_nn_set_a, mult_index_pcr):
+            tips.aliquot(_strip, _dest)
+
+    ## LOADED LIQUIDS ##
+    # ul per tube (total for reservoir columns), for the liquid ledger; stocks warn when they run dry
+    liquid.calibrate(mag_plate, getMagWellHeight, bottom=-well_300_nomag[2])
+    for _labware in (r15, tc_plate, temp_plate):
+        liquid.calibrate(_labware, height_tables[_labware.load_name].height)
+    liquid.stock(spri_stock, STATE['spri_stock_vol'])
+    liquid.stock(eb_stock, STATE['eb_stock_vol'])
+    liquid.stock(elu_sol_1, STATE['elu_stock_vol'])
+    liquid.stock(dyn_stock, STATE['dyn_stock_vol'])
+    for _eth_stock in eth_stocks:
+        liquid.stock(_eth_stock, ETH_COL_VOL)
+    for _well in dyn_cleanup:
+        liquid.load(_well, 90)                  # GEMs, recovery agent removed
+    liquid.stock(amp_rxn_mix, 71.5*NUM_COLS)
+    if NUM_COLS == 1:
+        liquid.stock(frag_mix, 15)
+    liquid.stock(amp_mix, 50*NUM_COLS)
+    for _well in ada_lig_mix:
+        liquid.load(_well, 50)
+    for _well in dual_ind_tt_set_a:
+        liquid.load(_well, 20)
+    if multiplex:
+        liquid.stock(multiplex_ind_pcr, 70*NUM_COLS)
+        for _well in dual_ind_nn_set_a:
+            liquid.load(_well, 20)
     
-    #| tc |t300|
-    #| tc |t300|temp|
-    #|magm|t300|resv|
-    #| t20| t20|t300|
+    # deck: deck.json & the README deck table
 
-    #temp:
-    #|amp_rxn_mix|frag_mix|ada_lig_mix|amp_mix|dual_ind_tt_set_a|dual_ind_nn_set_a|multiplex_ind_pcr|postlig_cleanup|multiplex_cln|multiplex_fin|purified_cDNA|final_product|
+    #temp (1 column):
+    #|amp_rxn_mix|frag_mix|ada_lig_mix|amp_mix|dual_ind_tt_set_a|dual_ind_nn_set_a|multiplex_ind_pcr|postlig_cleanup|multiplex_cln|purified_cDNA|final_product|multiplex_fin|
     
-    ## REAGENTS NEEDED, OPEN ##
-    print("reagents are open...")
-
-    #est: 0h:49m
-    input("press enter to proceed to: dyn_cleanup_amplification")
-    dyn_cleanup_amplification(
-        _well               = dyn_cleanup,
-        _tc_dest            = cDNA_amp_tc,
-        _amp_rxn_mix_stock  = amp_rxn_mix
+    ## THERMAL LOOKAHEAD ##
+    # lid/block temperatures each stage will ask for, in order, see thermal.py
+    thermal = thermal_planner.ThermalPlanner(
+        tc, CLOCK,
+        lid_plan = plan.lid_plan(),
+        block_plan = plan.block_plan(),
+        temp_mod = temp_mod,
+        note = log)
+
+    ## CHECKPOINTS ##
+    # saved after every step, `--resume` carries on from the last one, see checkpoint.py
+    ckpt = checkpoint.Checkpoint(
+        CHECKPOINT, RESUME,
+        labware = [r15, mag_plate, tc_plate, temp_plate, protocol.fixed_trash],
+        pipettes = [p20, p300],
+        tc = tc, temp_mod = temp_mod, mag = mag,
+        settings = dict(columns=NUM_COLS, multiplex=multiplex))
+    ckpt.track('liquid', liquid)
+    ckpt.track('tips', tips)
+    ckpt.track('thermal', thermal)
+    ckpt.keep('STATE', STATE)
+    ckpt.keep('spri_staged', spri_staged)
+    hwproxy.BUS.subscribe(ckpt)
+
+    ## STAGES ##
+    # each stage on the wells it runs on, for prep() & for a stage run on its own (`--only`, bench.py)
+    stage_calls = dict(
+        dyn_cleanup_amplification           = lambda: dyn_cleanup_amplification(
+            _wells              = dyn_cleanup,
+            _tc_dests           = cDNA_amp_tc,
+            _amp_rxn_mix_stock  = amp_rxn_mix),
+        cDNA_cleanup_pellet_cleanup         = cDNA_cleanup_pellet_cleanup,
+        frag_end_repair_a_tailing_size_sel  = lambda: frag_end_repair_a_tailing_size_sel(
+            _frag_mix           = frag_mix,
+            _frag_mix_tcs       = frag_mix_tc,
+            _purified_cDNAs     = purified_cDNA),
+        ada_lig_cleanup                     = lambda: ada_lig_cleanup(
+            _ada_lig_mixes      = ada_lig_mix,
+            _ada_lig_mix_tcs    = ada_lig_mix_tc),
+        index_pcr_size_sel                  = lambda: index_pcr_size_sel(
+            _samp_index_pcrs    = samp_index_pcr,
+            _dual_ind_tt_set_as = dual_ind_tt_set_a),
+        multiplex_index_pcr_size_sel        = multiplex_index_pcr_size_sel,
     )
+
+    def run_stage(name: str):
+        """one stage on a freshly loaded deck, with the SPRI & temperatures prep() has ready for it;
+        wells earlier stages would have filled are empty, the stage's own work is the same"""
+        if name not in plan.names():
+            raise Exception("no stage " + name + " in this run, stages: " + ", ".join(plan.names()))
+        rest = stages.Plan(plan.stages[plan.names().index(name):])
+        thermal.restore(dict(lid_plan=rest.lid_plan(), block_plan=rest.block_plan()), {})
+        thermal.start_cold_block(4)
+        thermal.release_lid()
+        for sel in plan.fills(name):
+            queue_spri(sel.spri_vol, roles[sel.wells])
+        thermal.cold_block(4)
+        stage_calls[name]()
+        tips.release()
+
+    ## THE PREP ##
+    def prep():
+        """every stage in order, from the operator's first visit to the final reports"""
+        if RESUME:
+            print(ckpt.describe())
+            operator_input("check the deck is as that step left it, take any tips off the pipettes, then press enter...")
+            ckpt.restore()
+        thermal.start_cold_block(4)
+        thermal.release_lid()
+
+        ## REAGENTS NEEDED, OPEN ##
+        print("reagents are open...")
+
+        # a resumed run skips the visits & hold fillers of stages it already started
+        #est: 0h:49m
+        if ckpt.fresh('dyn_cleanup_amplification'):
+            operator_input("press enter to proceed to: dyn_cleanup_amplification")
+            for sel in plan.fills('dyn_cleanup_amplification'):
+                queue_spri(sel.spri_vol, roles[sel.wells])
+        thermal.cold_block(4)
+        stage_calls['dyn_cleanup_amplification']()
     
-    #est: 0h:17m
-    input("press enter to proceed to: cDNA_cleanup_pellet_cleanup")
-    cDNA_cleanup_pellet_cleanup(
-        _tc_source          = cDNA_amp_tc,
-        _well               = cDNA_cleanup,
-        _purified_cDNA      = purified_cDNA,
-        _multiplex          = multiplex
-    )
+        #est: 0h:17m
+        operator_input("press enter to proceed to: cDNA_cleanup_pellet_cleanup")
+        stage_calls['cDNA_cleanup_pellet_cleanup']()
     
-    #est: 1h:11m
-    print("prepare step 3 reagents, place at proper locations on temp block")
-    print("refill ethanol")
-    print("replace tips: " + str(t300_0) + str(t300_1))
-    input("press enter to proceed to: frag_end_repair_a_tailing_size_sel")
-    p300.reset_tipracks()
-    p300.starting_tip=t300_0['A2']        #accomidates SPRIselect mixing tip reuse 
-    frag_end_repair_a_tailing_size_sel(
-        _frag_mix           = frag_mix,
-        _frag_mix_tc        = frag_mix_tc,
-        _purified_cDNA      = purified_cDNA,
-        _treated_cDNA       = treated_cDNA,
-        _size_sel_0_cDNA    = size_sel_0_cDNA
-    )
+        #est: 1h:11m
+        if ckpt.fresh('frag_end_repair_a_tailing_size_sel'):
+            _visit = ["prepare step 3 reagents, place at proper locations on temp block"]
+            _visit += layout.describe(temp_wells).split("\n")
+            if mag_swap:
+                _visit.append("replace mag plate with a fresh one")
+            _visit.append("refill ethanol")
+            tips.release()
+            tip_swaps = [pip for pip in (p20, p300) if tips.left(pip) < STEP_3_TIPS[pip._name]*NUM_COLS]
+            for pip in tip_swaps:
+                _visit.append("replace used tips: " + ", ".join(str(r) for r in pip.tip_racks if not all(w.has_tip for w in r.wells())))
+            operator_input("press enter to proceed to: frag_end_repair_a_tailing_size_sel", details=_visit)
+            for _eth_stock in eth_stocks:               # refilled
+                liquid.stock(_eth_stock, ETH_COL_VOL)
+            if NUM_COLS > 1:
+                tips.stock(frag_mix, tag='frag_mix')    # loaded where the amp rxn mix was
+                liquid.stock(frag_mix, 15*NUM_COLS)
+            for pip in tip_swaps:
+                pip.reset_tipracks()
+            for sel in plan.fills('frag_end_repair_a_tailing_size_sel'):
+                queue_spri(sel.spri_vol, roles[sel.wells])
+        stage_calls['frag_end_repair_a_tailing_size_sel']()
     
-    #est: 0h:45m 
-    #input("press enter to proceed to: ada_lig_cleanup")
-    ada_lig_cleanup(
-        _ada_lig_mix        = ada_lig_mix,
-        _ada_lig_mix_tc     = ada_lig_mix_tc
-    )
-
-    #est: 0h:53m
-    #input("press enter to proceed to: index_pcr_size_sel")
-    index_pcr_size_sel(
-        _samp_index_pcr     = samp_index_pcr,
-        _dual_ind_tt_set_a  = dual_ind_tt_set_a
-    )
+        #est: 0h:45m 
+        #operator_input("press enter to proceed to: ada_lig_cleanup")
+        if ckpt.fresh('ada_lig_cleanup'):
+            for sel in plan.fills('ada_lig_cleanup'):
+                queue_spri(sel.spri_vol, roles[sel.wells])
+        stage_calls['ada_lig_cleanup']()
+
+        #est: 0h:53m
+        #operator_input("press enter to proceed to: index_pcr_size_sel")
+        if ckpt.fresh('index_pcr_size_sel'):
+            for sel in plan.fills('index_pcr_size_sel'):
+                queue_spri(sel.spri_vol, roles[sel.wells])
+        stage_calls['index_pcr_size_sel']()
     
-    if multiplex:
-        multiplex_index_pcr_size_sel()
+        if multiplex:
+            if ckpt.fresh('multiplex_index_pcr_size_sel'):
+                for sel in plan.fills('multiplex_index_pcr_size_sel'):
+                    queue_spri(sel.spri_vol, roles[sel.wells])
+            stage_calls['multiplex_index_pcr_size_sel']()
+
+        tips.release()
+        print(tips.report())
+        print(liquid.report())
+        print(mixer.report())
+        print(deadlines.report())
 
-run(protocol)
+    return SimpleNamespace(**locals())
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    """the whole prep on `protocol`, as the Opentrons app runs it"""
+    build(protocol).prep()
+
+
+def main(argv: list):
+    """the command line: settings, the robot (or the simulator), the prep, then the reports"""
+    configure(argv[1:])
+    protocol = connect()
+    EVENTS.note("run started", simulate=SIMULATE, columns=NUM_COLS, multiplex=MULTIPLEX, only=ONLY)
+    if ONLY is None:
+        run(protocol)
+    else:
+        build(protocol).run_stage(ONLY)
+    if PEEPHOLE is not None:
+        PEEPHOLE.flush()
+    EVENTS.note("run finished")
+    EVENTS.close()
+    if CONTROL is not None:
+        print(CONTROL.report())
+        CONTROL.close()
+
+    print(ESTIMATOR.report())
+    if PEEPHOLE is not None:
+        print(PEEPHOLE.report())
+    if PROFILER is not None:
+        PROFILER.write(PROFILE)
+        print(PROFILER.report())
+        print("collapsed stacks written to " + PROFILE)
+    if SIMULATE:
+        print("simulated run: " + str(COUNTER.total()) + " commands, " + str(round(CLOCK.monotonic()/3600, 2)) + " h")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
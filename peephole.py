@@ -0,0 +1,130 @@
+"""peephole optimizer over the traced command stream
+
+Installed as hwproxy.WINDOW, every traced command is handed to Window.issue()
+as a Command (the recorded form of the call) together with a thunk that runs
+it. Pipette moves & touch_tips are held back until the next command shows
+whether they can be rewritten; everything else first flushes what is held and
+then runs. Rewrites, each only where the robot ends up doing the same thing:
+
+    dead move       move_to(...) at default speed straight before drop_tip /
+                    return_tip: tip handling leaves the well the same way
+    z fuse          move_to(a) then move_to(b) at the same speed, with a on the
+                    vertical line from where the pipette is to b: one move to b
+    touch_tip       the same touch_tip twice in a row: the second finds no drop
+
+Slow moves (speed=...) are never dropped: they pull liquid off the tip. A move
+back down before a move up (e.g. merging a bubble with the surface) isn't on
+the line to the second target and is kept.
+
+Commands are held until the next one, so the stream isn't recorded ahead of
+run(): the helpers branch on hardware state (tips on, staged fillers, ledger
+volumes) and a 2 command window is all the rewrites need. Listeners on BUS
+see the optimized stream; report() gives what the rewrites saved.
+"""
+import math
+
+from hwproxy import Command
+import time_model
+
+HELD        = ('move_to', 'touch_tip')          # pipette commands worth waiting on
+TIP_HANDLING = ('drop_tip', 'return_tip')
+LINE_MM     = 0.1       # slack for points on a vertical line
+PIPETTES    = ('p20', 'p300')
+
+
+class Window:
+    def __init__(self):
+        self.held = None            # (cmd, thunk) not run yet
+        self.issued = time_model.TimeModel()        # the stream as the protocol issued it
+        self.executed = time_model.TimeModel()      # the stream the robot runs
+        self.gantry = dict(issued=0, executed=0)    # s of moves & touch_tips
+        self.rewrites = {}          # rule -> count
+
+    def issue(self, cmd: Command, thunk):
+        """run cmd (via thunk) now, later, or not at all"""
+        self._model(self.issued, 'issued', cmd)
+        if self.held is not None:
+            rule = self._rewrite(cmd)
+            if rule == 'touch_tip':         # new one dropped, the held one stands
+                self._count(rule)
+                return None
+            if rule is not None:            # held one dropped
+                self._count(rule)
+                self.held = None
+        self.flush()
+        if cmd.source in PIPETTES and cmd.name in HELD:
+            self.held = (cmd, thunk)
+            return None
+        self._model(self.executed, 'executed', cmd)
+        return thunk()
+
+    def flush(self):
+        """run what's held, e.g. before a stage boundary or an operator prompt"""
+        if self.held is None:
+            return
+        cmd, thunk = self.held
+        self.held = None
+        self._model(self.executed, 'executed', cmd)
+        thunk()
+
+    ## RULES ##
+    def _rewrite(self, cmd: Command):
+        """name of the rule that applies to the held command & cmd, if any"""
+        held, _ = self.held
+        if cmd.source != held.source:
+            return None
+        if held.name == 'touch_tip' and cmd.name == 'touch_tip':
+            if held.args == cmd.args and held.kwargs == cmd.kwargs:
+                return 'touch_tip'
+            return None
+        if held.name != 'move_to' or _move_options(held):
+            return None
+        if cmd.name in TIP_HANDLING and held.arg('speed', 3) is None:
+            return 'dead move'
+        if cmd.name == 'move_to' and not _move_options(cmd) and held.arg('speed', 3) == cmd.arg('speed', 3):
+            frm = self.executed.pos.get(cmd.source)
+            mid = time_model.location_point(held.arg('location', 0))
+            to = time_model.location_point(cmd.arg('location', 0))
+            if _on_line(frm, mid, to):
+                return 'z fuse'
+        return None
+
+    ## ACCOUNTING ##
+    def _model(self, model: time_model.TimeModel, which: str, cmd: Command):
+        sec = model.command_sec(cmd)
+        if cmd.name in HELD:
+            self.gantry[which] += sec
+
+    def _count(self, rule: str):
+        self.rewrites[rule] = self.rewrites.get(rule, 0) + 1
+
+    def report(self) -> str:
+        lines = ["{:<40}{:>12}".format("peephole rewrite", "commands")]
+        for rule, n in sorted(self.rewrites.items()):
+            lines.append("{:<40}{:>12}".format(rule, n))
+        saved = self.gantry['issued'] - self.gantry['executed']
+        lines.append("{:<40}{:>12}".format("gantry time saved", time_model.hms(saved)))
+        return "\n".join(lines)
+
+    ## BUS LISTENER ##
+    def stage_start(self, name: str):
+        self.flush()
+
+    def stage_end(self, name: str):
+        self.flush()
+
+
+def _move_options(cmd: Command) -> bool:
+    """move_to with a path of its own (force_direct, minimum_z_height), left alone"""
+    return cmd.arg('force_direct', 1) or cmd.arg('minimum_z_height', 2) is not None
+
+
+def _on_line(frm, mid, to) -> bool:
+    """mid on the vertical segment from frm to to"""
+    if frm is None or mid is None or to is None:
+        return False
+    for p in (mid, to):
+        if math.hypot(p[0] - frm[0], p[1] - frm[1]) > LINE_MM:
+            return False
+    lo, hi = min(frm[2], to[2]), max(frm[2], to[2])
+    return lo - LINE_MM <= mid[2] <= hi + LINE_MM
@@ -0,0 +1,88 @@
+"""profiler: run time per protocol helper & command type, as collapsed stacks
+
+Profiler subscribes to hwproxy.BUS, so it times every traced command: the
+pipettes, the modules (mag, tc, temp) and protocol delays. Each command's time
+on the run clock (measured on the robot, modelled when simulating) is charged
+to the stack of protocol helpers that issued it, under its stage, with the
+command's type (time_model.CATEGORY: aspirate, dispense, move, delay, tips,
+thermocycler, magnet, ...) as the leaf:
+
+    cDNA_cleanup_pellet_cleanup;sel_96_ring_mag;spri_stock_mix;mixing.mix;aspirate 41230
+
+write() saves those as a collapsed-stack file, ms per stack, for flamegraph.pl
+or speedscope; report() totals them per innermost helper of the protocol file
+(what it calls in other modules included) & command type.
+
+Helpers are the functions of the protocol file on the Python stack, and those
+of the modules it calls into (as module.function, e.g. mixing.mix); the
+tracing machinery itself is left out. A move the peephole window holds back
+runs, and is charged, with the command after it, nearly always from the same
+helper.
+"""
+import os
+import sys
+
+import time_model
+
+SKIP_MODULES = ('hwproxy', 'peephole', 'profiler', 'events', 'time_model', 'clock')
+SKIP_FUNCTIONS = ('main', 'run', 'build', 'prep', '<module>', 'wrapper', 'pause')
+
+
+class Profiler:
+    def __init__(self, clock, protocol_file: str):
+        self.clock = clock
+        self.root = os.path.dirname(os.path.abspath(protocol_file))
+        self.protocol = os.path.splitext(os.path.basename(protocol_file))[0]
+        self.stage = 'setup'
+        self.started = []       # (monotonic start, stack) of each command in flight
+        self.stacks = {}        # (stage, helper, ..., category) -> s
+
+    def helpers(self) -> tuple:
+        """the protocol helpers on the Python stack, outermost first"""
+        names = []
+        f = sys._getframe(1)
+        while f is not None:
+            path = os.path.abspath(f.f_code.co_filename)
+            module = os.path.splitext(os.path.basename(path))[0]
+            name = f.f_code.co_name
+            if os.path.dirname(path) == self.root and module not in SKIP_MODULES and name not in SKIP_FUNCTIONS:
+                names.append(name if module == self.protocol else module + "." + name)
+            f = f.f_back
+        return tuple(reversed(names))
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, sec in sorted(self.stacks.items()):
+                ms = round(sec*1000)
+                if ms > 0:
+                    f.write(";".join(stack) + " " + str(ms) + "\n")
+
+    def report(self) -> str:
+        totals = {}             # innermost protocol helper -> category -> s
+        for stack, sec in self.stacks.items():
+            helper = ([h for h in stack[1:-1] if '.' not in h] or ["(" + stack[0] + ")"])[-1]
+            by = totals.setdefault(helper, {})
+            by[stack[-1]] = by.get(stack[-1], 0) + sec
+        cats = sorted({c for by in totals.values() for c in by})
+        lines = ["{:<36}{:>10}".format("helper", "total") + "".join("{:>14}".format(c[:13]) for c in cats)]
+        for helper, by in sorted(totals.items(), key=lambda kv: -sum(kv[1].values())):
+            lines.append("{:<36}{:>10}".format(helper[:35], time_model.hms(sum(by.values())))
+                         + "".join("{:>14}".format(time_model.hms(by[c]) if c in by else "-") for c in cats))
+        return "\n".join(lines)
+
+    ## BUS LISTENER ##
+    def before(self, cmd):
+        self.started.append((self.clock.monotonic(), self.helpers()))
+
+    def after(self, cmd):
+        start, helpers = self.started.pop()
+        if cmd.name == 'setattr':
+            return
+        key = (self.stage,) + helpers + (time_model.CATEGORY.get(cmd.name, 'other'),)
+        self.stacks[key] = self.stacks.get(key, 0) + self.clock.monotonic() - start
+
+    def stage_start(self, name: str):
+        self.stage = name
+
+    def stage_end(self, name: str):
+        self.stage = 'between stages'
@@ -0,0 +1,86 @@
+"""thermocycler holds that don't tie up the deck
+
+With api 2.12, tc.set_block_temperature(..., hold_time_minutes=...) blocks
+until the hold ends and the robot sits idle. HoldScheduler instead brings the
+block to temperature, times the hold on the clock, and fills the window with
+queued tasks that don't touch the tc plate (e.g. SPRI staged into the next
+cleanup's mag well). It only waits out the hold when the next step that needs
+the plate calls wait().
+
+Fillers run as late as possible in a window, and only if their estimate (with
+a safety margin) fits in what's left, so holds are never stretched. Each
+filler is noted, a hold the fillers or the commands before wait() overran is a
+warning.
+execute_profile cycles stay blocking: their 15-60 s steps are shorter than any
+filler. The holds around them (initial denaturation, final extension) are
+filled.
+"""
+from time_model import hold_sec
+
+FILLER_SAFETY = 1.2     # estimate multiplier before a filler is allowed into a window
+
+
+class Filler:
+    def __init__(self, name: str, fn, est_sec: float):
+        self.name = name
+        self.fn = fn
+        self.est_sec = est_sec
+        self.done = False
+
+
+class HoldScheduler:
+    def __init__(self, protocol, tc, clock, note=None, warn=None):
+        """note(message, **fields) reports each filler, warn(...) each overrun hold, e.g. EventLog.note & warn"""
+        self.protocol = protocol
+        self.tc = tc
+        self.clock = clock
+        self.note = note
+        self.warn = warn
+        self.fillers = []
+        self.hold_end = None
+
+    def fill(self, name: str, fn, est_sec: float) -> Filler:
+        """queue pipetting that may run during any later hold"""
+        f = Filler(name, fn, est_sec)
+        self.fillers.append(f)
+        return f
+
+    def cancel(self, f: Filler):
+        """drop a filler whose window has passed; the dependent step does the work itself"""
+        if f in self.fillers:
+            self.fillers.remove(f)
+
+    def hold(self, temperature: float, seconds: float = 0, minutes: float = 0, block_max_volume: float = None):
+        """ramp the block (blocking), then return with the hold running"""
+        self.wait()
+        self.tc.set_block_temperature(temperature, block_max_volume=block_max_volume)
+        self.hold_end = self.clock.monotonic() + hold_sec(seconds, minutes)
+
+    def wait(self):
+        """fill what's left of the current hold, then wait out the rest of it"""
+        if self.hold_end is None:
+            return
+        budget = self.hold_end - self.clock.monotonic()
+        run = []
+        for f in self.fillers:
+            if f.est_sec*FILLER_SAFETY <= budget - sum(r.est_sec*FILLER_SAFETY for r in run):
+                run.append(f)
+        if run:
+            lead = budget - sum(f.est_sec*FILLER_SAFETY for f in run)
+            if lead > 0:
+                self.protocol.delay(seconds=lead)
+            for f in run:
+                start = self.clock.monotonic()
+                if self.note is not None:
+                    self.note("hold filler", name=f.name)
+                f.fn()
+                f.done = True
+                self.fillers.remove(f)
+                if self.note is not None:
+                    self.note("hold filler done", name=f.name, seconds=round(self.clock.monotonic() - start), est=f.est_sec)
+        remaining = self.hold_end - self.clock.monotonic()
+        if remaining > 0:
+            self.protocol.delay(seconds=remaining)
+        elif remaining < 0 and self.warn is not None:
+            self.warn('hold overran', seconds=round(-remaining, 3))
+        self.hold_end = None
@@ -0,0 +1,262 @@
+"""stage table: the volumes, times & cycles of every cleanup, incubation & PCR step
+
+stages.json lists each stage's steps in run order:
+    size_selection      one sel_96_ring_mag(): SPRI, incubation, magnet, optional
+                        ethanol washes & elution, supernatant to its destination
+    dynabead_cleanup    the GEM cleanup in dyn_cleanup_amplification
+    thermocycle         a tc reaction, run with a profile named in tc_profiles.json
+Wells are named by role (see layout.py), e.g. "wells": "cDNA_cleanup".
+
+compile_plan() keeps the steps that apply to a run (multiplexing or not) and checks
+every one of them against what the pipettes, the wells & the protocol's
+helpers can do, so a site can tune a table (`--stages <file>`) without
+touching the script and a bad value fails before the robot moves. The plan
+also gives the lid & block temperatures the thermal lookahead needs, in order,
+and which hold each SPRI filler can run in.
+
+`python stages.py [stages.json]` checks a table and prints the plan with the
+fixed waits of each step (incubations, magnet, drying, thermocycling, the last
+from tc_profiles.duration()), without hardware. `--simulate` times the pipetting too.
+"""
+import json
+import sys
+from dataclasses import dataclass, field
+
+import tc_profiles
+import time_model
+
+P300_MAX = 250          # ul the protocol draws into a 300ul tip
+P20_MAX = 20
+ETH_SPLIT = 230         # ethanol washes over this go in as two halves
+MIX_AIR = 20            # incubation mixing draws mix_vol less this
+
+
+@dataclass
+class SizeSelection:
+    name: str
+    wells: str              # mag wells, one per column
+    cDNAs: str              # where the sample comes from, = wells when mag_source
+    dests: str              # where the supernatant goes
+    spri_vol: float
+    cDNA_vol: float
+    mix_vol: float
+    mix_rep: int
+    inc_sec: float
+    mag_sec: float
+    pel: bool               # wash & elute the pellet, otherwise keep the supernatant
+    dest_vol: float
+    dest_rep: int           # 8: one p300 transfer of dest_rep*dest_vol
+    mag_source: bool        # sample is already in `wells`
+    to_mag: bool            # dests are mag wells
+    stage_spri: bool = False    # SPRI may go into the empty wells during an earlier hold
+    ethanol: list = field(default_factory=list)     # ul per wash
+    eth_wash_sec: float = 20    # each wash mixed on the pellet this long,
+    eth_sep_sec: float = 10     # then left on the magnet this long before it comes off
+    dry_sec: float = 0
+    eb_vol: float = 0
+    inc_sec_2: float = 0
+    mag_sec_2: float = 0
+    share: dict = None      # multiplexing: {"vol", "dests"} of supernatant kept before it's trashed
+    multiplex: bool = False
+
+    def waits(self) -> float:
+        sec = self.inc_sec + self.mag_sec
+        if self.pel:
+            sec += self.dry_sec + self.inc_sec_2 + self.mag_sec_2
+        return sec
+
+
+@dataclass
+class DynabeadCleanup:
+    name: str
+    wells: str
+    inc_sec: float
+    mag_sec: float
+    ethanol: list
+    dry_sec: float
+    elu_vol: float
+    elu_inc_sec: float
+    eth_wash_sec: float = 20
+    eth_sep_sec: float = 10
+    multiplex: bool = False
+
+    def waits(self) -> float:
+        return self.inc_sec + self.mag_sec + self.dry_sec + self.elu_inc_sec
+
+
+@dataclass
+class Thermocycle:
+    name: str
+    profile: str                # name in tc_profiles.json
+    assemble_at: float = None   # block temperature while the reaction is pipetted
+    ready_at: float = None      # block temperature once it's pipetted, before the lid closes
+    multiplex: bool = False
+    tc: tc_profiles.Profile = None      # the profile, set by compile_plan()
+
+    def waits(self, cycles: int = None) -> float:
+        return tc_profiles.duration(self.tc, cycles, start=self.assemble_at or self.ready_at)
+
+
+KINDS = dict(size_selection=SizeSelection, dynabead_cleanup=DynabeadCleanup, thermocycle=Thermocycle)
+
+
+class Plan:
+    def __init__(self, stages: list):
+        self.stages = stages        # [(stage, [steps])]
+
+    def steps(self, stage: str, kind: type = None) -> list:
+        for name, steps in self.stages:
+            if name == stage:
+                return [s for s in steps if kind is None or isinstance(s, kind)]
+        return []
+
+    def names(self) -> list:
+        return [name for name, _ in self.stages]
+
+    def lid_plan(self) -> list:
+        """lid temperatures, in the order the thermocycle steps need them"""
+        return [s.tc.lid for _, steps in self.stages for s in steps if isinstance(s, Thermocycle)]
+
+    def block_plan(self) -> list:
+        return [s.assemble_at for _, steps in self.stages for s in steps if isinstance(s, Thermocycle) and s.assemble_at is not None]
+
+    def fills(self, stage: str) -> list:
+        """size selections whose SPRI is queued at the start of `stage`: its own, and those of
+        the stages after it up to the next with thermocycler holds to run them in"""
+        names = self.names()
+        fills = []
+        for i in range(names.index(stage), len(names)):
+            if i > names.index(stage) and self.steps(names[i], Thermocycle):
+                break
+            fills += [s for s in self.steps(names[i], SizeSelection) if s.stage_spri]
+        return fills
+
+    def describe(self, cycles: int = None) -> str:
+        lines = ["{:<40}{:<44}{:>10}".format("stage", "step", "waits")]
+        total = 0
+        for name, steps in self.stages:
+            for s in steps:
+                sec = s.waits(cycles) if isinstance(s, Thermocycle) else s.waits()
+                total += sec
+                lines.append("{:<40}{:<44}{:>10}".format(name, s.name, time_model.hms(sec)))
+        lines.append("{:<40}{:<44}{:>10}".format("total", "", time_model.hms(total)))
+        return "\n".join(lines)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compile_plan(table: dict, multiplex: bool, roles: dict = None, path: str = 'stages.json', profiles: dict = None) -> Plan:
+    """the steps this run does; raises with every problem found
+
+    roles: role -> wells, checks the table only names wells the run has
+    profiles: name -> tc_profiles.Profile, tc_profiles.json's when not given
+    """
+    if profiles is None:
+        profiles = tc_profiles.load()
+    errors = []
+    stages = []
+    for st in table['stages']:
+        if st.get('multiplex') and not multiplex:
+            continue
+        steps = []
+        for i, raw in enumerate(st['steps']):
+            where = st['stage'] + " step " + str(i + 1)
+            raw = dict(raw)
+            kind = KINDS.get(raw.pop('kind', None))
+            if kind is None:
+                errors.append(where + ": kind must be one of " + ", ".join(KINDS))
+                continue
+            try:
+                step = kind(**raw)
+            except TypeError as e:
+                errors.append(where + ": " + str(e))
+                continue
+            if step.multiplex and not multiplex:
+                continue
+            if isinstance(step, SizeSelection) and not multiplex:
+                step.share = None
+            if isinstance(step, Thermocycle):
+                if step.profile not in profiles:
+                    errors.append(where + " (" + step.name + "): no tc profile " + str(step.profile) + ", use one of " + ", ".join(profiles))
+                    continue
+                step.tc = profiles[step.profile]
+            errors += [where + " (" + step.name + "): " + e for e in check(step, roles)]
+            steps.append(step)
+        stages.append((st['stage'], steps))
+    filled = set()
+    for name, steps in stages:
+        for s in steps:
+            if isinstance(s, SizeSelection):
+                if s.mag_source and s.wells not in filled:
+                    errors.append(name + " (" + s.name + "): mag_source, but no earlier step puts a sample in " + s.wells)
+                if s.to_mag:
+                    filled.add(s.dests)
+                if s.share:
+                    filled.add(s.share['dests'])
+    if errors:
+        raise Exception(path + ":\n    " + "\n    ".join(errors))
+    return Plan(stages)
+
+
+def check(step, roles: dict = None) -> list:
+    """what's wrong with a step, [] if nothing"""
+    errors = []
+    def need(ok: bool, message: str):
+        if not ok:
+            errors.append(message)
+    used = [r for r in (getattr(step, 'wells', None), getattr(step, 'cDNAs', None), getattr(step, 'dests', None)) if r]
+    if isinstance(step, SizeSelection) and step.share:
+        used.append(step.share['dests'])
+    if roles is not None:
+        for r in used:
+            need(r in roles, "no wells for role " + r)
+
+    if isinstance(step, SizeSelection):
+        need(0 <= step.spri_vol <= P300_MAX, "spri_vol must be between 0 and " + str(P300_MAX) + "ul")
+        need(0 <= step.cDNA_vol <= P300_MAX, "cDNA_vol must be between 0 and " + str(P300_MAX) + "ul")
+        need(MIX_AIR < step.mix_vol <= min(P300_MAX, step.spri_vol + step.cDNA_vol), "mix_vol must be over " + str(MIX_AIR) + "ul and no more than the well holds")
+        need(step.mix_rep >= 1, "mix_rep must be at least 1")
+        need(step.inc_sec >= 0 and step.mag_sec >= 0, "inc_sec & mag_sec can't be negative")
+        need(step.mag_source == (step.wells == step.cDNAs), "cDNAs must be the mag wells themselves exactly when mag_source")
+        need(step.dest_rep >= 1, "dest_rep must be at least 1")
+        if step.dest_rep == 8:
+            need(8*step.dest_vol <= P300_MAX, "dest_rep 8 is one p300 transfer, 8*dest_vol must be " + str(P300_MAX) + "ul or less")
+        else:
+            need(0 < step.dest_vol <= P20_MAX, "dest_vol goes by p20, must be " + str(P20_MAX) + "ul or less")
+        if step.pel:
+            need(len(step.ethanol) > 0 and all(0 < w <= 2*ETH_SPLIT for w in step.ethanol), "ethanol washes must be between 0 and " + str(2*ETH_SPLIT) + "ul")
+            need(step.dry_sec >= 0, "dry_sec can't be negative")
+            need(step.eth_wash_sec >= 0 and step.eth_sep_sec >= 0, "eth_wash_sec & eth_sep_sec can't be negative")
+            need(10 < step.eb_vol <= P300_MAX, "eb_vol must be over 10ul, it's mixed with eb_vol - 10")
+            need(step.dest_vol*step.dest_rep <= step.eb_vol, "dest_vol*dest_rep is more than eb_vol")
+        else:
+            need(step.dest_vol*step.dest_rep <= step.spri_vol + step.cDNA_vol, "dest_vol*dest_rep is more than the supernatant")
+        if step.share:
+            need(0 < step.share.get('vol', 0) <= P300_MAX, "share vol must be between 0 and " + str(P300_MAX) + "ul")
+
+    if isinstance(step, DynabeadCleanup):
+        need(step.inc_sec > 0 and step.elu_inc_sec > 0, "incubations must be longer than 0s")
+        need(step.mag_sec >= 20, "mag_sec must be at least 20s, the beads are blown out after 20s")
+        need(len(step.ethanol) > 0 and all(0 < w <= 2*ETH_SPLIT for w in step.ethanol), "ethanol washes must be between 0 and " + str(2*ETH_SPLIT) + "ul")
+        need(step.dry_sec >= 0, "dry_sec can't be negative")
+        need(step.eth_wash_sec >= 0 and step.eth_sep_sec >= 0, "eth_wash_sec & eth_sep_sec can't be negative")
+        need(0 < step.elu_vol <= 2*P20_MAX, "elu_vol goes by p20 in two halves, must be " + str(2*P20_MAX) + "ul or less")
+
+    if isinstance(step, Thermocycle):
+        for temp in (step.assemble_at, step.ready_at):
+            need(temp is None or tc_profiles.BLOCK_RANGE[0] <= temp <= tc_profiles.BLOCK_RANGE[1], str(temp) + "C is outside the block's range")
+        need(step.assemble_at is None or step.ready_at is None, "assemble_at & ready_at can't both be used")
+    return errors
+
+
+if __name__ == '__main__':
+    _path = sys.argv[1] if len(sys.argv) > 1 else 'stages.json'
+    _table = load(_path)
+    with open('thermo-cycles-3.5.json') as cycle_file:
+        _cycles = int(json.load(cycle_file)["num-cycles"]) or None
+    for _multiplex in (True, False):
+        print("multiplexing" if _multiplex else "not multiplexing")
+        print(compile_plan(_table, _multiplex, path=_path).describe(_cycles))
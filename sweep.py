@@ -0,0 +1,203 @@
+"""parameter sweep: every combination of stage & PCR parameters, simulated across all cores
+
+    python sweep.py --vary size_selection.mag_sec=180,240 --vary size_selection.eth_sep_sec=5,10
+                    [--vary tc.cdna_amplification.cycles=11,12] [--runs 20 --jitter 0.1] [--processes 8]
+
+A parameter is one of
+    <kind>.<field>              that field of every step of a kind in stages.json: size_selection (each
+                                sel_96_ring_mag), dynabead_cleanup, thermocycle; eth_wash_sec &
+                                eth_sep_sec are the ethanol washes' (eth_wash_drain)
+    <stage>.<kind>.<field>      the same, in one stage only
+    tc.<profile>.<field>[.<i>]  a tc_profiles.json value, e.g. tc.frag_end_repair_a_tailing.holds.1.1
+                                (the 65C hold's seconds)
+    args                        extra multi_8sample.py flags, e.g. args=,--consolidated-wash
+and its values are JSON, comma separated. Without --vary, DEFAULT_VARY is swept.
+
+Every combination is checked like stages.py & tc_profiles.py would, then
+simulated with its own stage table & profiles: multi_8sample.main() in a pool
+worker process (configure() gives each run its own trace bus), as many at once
+as there are cores. Each run is measured from its event stream like
+bench.py's whole-run numbers. With `--runs K`, every combination also runs K
+times with `--jitter` (seeds 1..K) for the makespan's spread: mean, p50 & p90.
+
+The table is fastest first; `--json <file>` saves it. Run it with the python
+that has opentrons.
+"""
+import contextlib
+import copy
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import bench
+import deck
+import stages
+import tc_profiles
+import time_model
+
+DEFAULT_VARY = {
+    'size_selection.mix_rep':       [20, 30],
+    'size_selection.mag_sec':       [180, 240],
+    'size_selection.eth_wash_sec':  [10, 20],
+    'size_selection.eth_sep_sec':   [5, 10],
+}
+JITTER = 0.1            # relative sd of mechanical command times in the Monte Carlo runs
+
+
+## COMBINATIONS ##
+def parse(specs: list) -> dict:
+    """key -> [values] from `key=v1,v2` specs"""
+    vary = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        if key == 'args':
+            vary[key] = values.split(',')
+        else:
+            vary[key] = [json.loads(v) for v in values.split(',')]
+    return vary
+
+
+def combinations(vary: dict) -> list:
+    """[{key: value}], every combination"""
+    keys = list(vary)
+    return [dict(zip(keys, values)) for values in itertools.product(*(vary[k] for k in keys))]
+
+
+def apply(combo: dict, table: dict, profiles: dict) -> tuple:
+    """(stage table, profile table) with a combination's values in"""
+    table, profiles = copy.deepcopy(table), copy.deepcopy(profiles)
+    for key, value in combo.items():
+        if key == 'args':
+            continue
+        path = key.split('.')
+        if path[0] == 'tc':
+            _set(profiles['profiles'], path[1:], value, key)
+            continue
+        stage = path.pop(0) if path[0] not in stages.KINDS else None
+        if len(path) != 2 or path[0] not in stages.KINDS:
+            raise Exception(key + ": parameters are <kind>.<field>, <stage>.<kind>.<field> or tc.<profile>.<field>")
+        steps = [step for st in table['stages'] if stage in (None, st['stage']) for step in st['steps'] if step['kind'] == path[0]]
+        if not steps:
+            raise Exception(key + ": no " + path[0] + " steps" + (" in " + stage if stage else ""))
+        for step in steps:
+            step[path[1]] = value
+    return table, profiles
+
+
+def _set(node, path: list, value, key: str):
+    for i, p in enumerate(path):
+        if isinstance(node, list):
+            p = int(p) if p.isdigit() else len(node)
+        if p not in (range(len(node)) if isinstance(node, list) else node):
+            raise Exception(key + ": no " + ".".join(path[:i + 1]))
+        if i == len(path) - 1:
+            node[p] = value
+        else:
+            node = node[p]
+
+
+def args_of(combo: dict) -> list:
+    return combo.get('args', "").split()
+
+
+## RUNS ##
+def prepare(combos: list, tmp: str, table: dict, profiles: dict) -> list:
+    """[(stages path, profiles path, args)] per combination, each checked; raises with every problem found"""
+    out, errors = [], []
+    for i, combo in enumerate(combos):
+        t, p = apply(combo, table, profiles)
+        paths = (os.path.join(tmp, str(i) + '_stages.json'), os.path.join(tmp, str(i) + '_profiles.json'))
+        for path, data in zip(paths, (t, p)):
+            with open(path, 'w') as f:
+                json.dump(data, f)
+        try:
+            for multiplex in (True, False):
+                stages.compile_plan(t, multiplex, path=describe_combo(combo), profiles=tc_profiles.load(paths[1]))
+        except Exception as e:
+            errors.append(str(e))
+        out.append(paths + (args_of(combo),))
+    if errors:
+        raise Exception("\n".join(errors))
+    return out
+
+
+def simulate(job: tuple) -> tuple:
+    """one --simulate run, in a pool worker: (combination, seed) -> (combination, seed, run totals)"""
+    i, seed, (stages_path, profiles_path, args), jitter, tmp = job
+    base = os.path.join(tmp, str(i) + '_' + str(seed))
+    argv = ['multi_8sample.py', '--simulate', '--stages', stages_path, '--profiles', profiles_path,
+            '--events', base + '.jsonl', '--checkpoint', base + '.ckpt'] + args
+    if seed:
+        argv += ['--jitter', str(jitter), '--seed', str(seed)]
+    with open(os.devnull, 'w') as out, contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        import multi_8sample
+        multi_8sample.main(argv)
+    layout = deck.load(args[args.index('--deck') + 1] if '--deck' in args else 'deck.json')
+    return i, seed, bench.measure(base + '.jsonl', layout)[bench.TOTAL]
+
+
+def sweep(combos: list, runs: int = 0, jitter: float = JITTER, processes: int = None, table: dict = None, profiles: dict = None) -> list:
+    """[{combo, sec, tips, reagent_ul, commands, jittered: [sec]}] in combination order"""
+    tmp = tempfile.mkdtemp(prefix='sweep')
+    table = table or stages.load('stages.json')
+    if profiles is None:
+        with open('tc_profiles.json') as f:
+            profiles = json.load(f)
+    jobs = [(i, seed, files, jitter, tmp) for i, files in enumerate(prepare(combos, tmp, table, profiles))
+            for seed in range(runs + 1)]
+    results = [dict(combo=combo, jittered=[]) for combo in combos]
+    with multiprocessing.Pool(processes or os.cpu_count()) as pool:
+        for n, (i, seed, total) in enumerate(pool.imap_unordered(simulate, jobs), 1):
+            if seed:
+                results[i]['jittered'].append(total['sec'])
+            else:
+                results[i].update(total)
+            print("\r" + str(n) + "/" + str(len(jobs)) + " runs", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return results
+
+
+## REPORT ##
+def percentile(xs: list, q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(int(q*len(xs)), len(xs) - 1)]
+
+
+def describe_combo(combo: dict) -> str:
+    return ", ".join(k + "=" + json.dumps(v) for k, v in combo.items())
+
+
+def describe(results: list) -> str:
+    keys = list(results[0]['combo']) if results else []
+    widths = [max(len(k), 12) + 2 for k in keys]
+    jittered = any(r['jittered'] for r in results)
+    head = "".join("{:<{}}".format(k, w) for k, w in zip(keys, widths)) + "{:>10}".format("time")
+    if jittered:
+        head += "{:>10}{:>10}{:>10}".format("mean", "p50", "p90")
+    lines = [head + "{:>8}{:>12}{:>10}".format("tips", "reagent ul", "commands")]
+    for r in sorted(results, key=lambda r: r['sec']):
+        line = "".join("{:<{}}".format(json.dumps(r['combo'][k]), w) for k, w in zip(keys, widths)) + "{:>10}".format(time_model.hms(r['sec']))
+        if jittered:
+            js = r['jittered']
+            line += "{:>10}{:>10}{:>10}".format(time_model.hms(sum(js)/len(js)), time_model.hms(percentile(js, 0.5)), time_model.hms(percentile(js, 0.9)))
+        lines.append(line + "{:>8}{:>12}{:>10}".format(round(r['tips']), round(r['reagent_ul']), round(r['commands'])))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    _specs = [sys.argv[i + 1] for i, a in enumerate(sys.argv) if a == '--vary']
+    _vary = parse(_specs) if _specs else DEFAULT_VARY
+    _runs = int(sys.argv[sys.argv.index('--runs') + 1]) if '--runs' in sys.argv else 0
+    _jitter = float(sys.argv[sys.argv.index('--jitter') + 1]) if '--jitter' in sys.argv else JITTER
+    _processes = int(sys.argv[sys.argv.index('--processes') + 1]) if '--processes' in sys.argv else None
+    _combos = combinations(_vary)
+    print(str(len(_combos)) + " combinations" + (", " + str(_runs) + " jittered runs each" if _runs else ""), flush=True)
+    _results = sweep(_combos, _runs, _jitter, _processes)
+    print(describe(_results))
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump(_results, f, indent='\t')
+            f.write("\n")
@@ -0,0 +1,139 @@
+"""thermocycler profiles by name, each with the time it takes
+
+tc_profiles.json holds every profile the protocol runs on the thermocycler:
+
+    lid                 lid temperature, reached before the lid closes
+    block_max_volume    ul in the wells, the sample lags the block by more the more there is
+    holds               [[C, s]] before cycling
+    cycle, cycles       [[C, s]] run `cycles` times; cycles null: thermo-cycles-3.5.json,
+                        asked for when that's 0, within cycle_range
+    final               [[C, s]] after cycling
+    cool_to             block temperature the reaction waits at until it's taken out
+    note                why the numbers are what they are
+
+load() checks every profile, so a bad temperature or cycle count fails before
+the robot moves. A stage table step (stages.json) names the profile it runs.
+
+duration() is the time a profile keeps the block busy, from the temperature
+the block is at when it starts: ramps at the block's heating & cooling rates,
+the sample settling after each change (longer for a larger block_max_volume),
+and holds. It's the same model (time_model.profile_sec) the virtual clock
+advances by while simulating, so schedules and ETAs can treat a thermocycler
+step as a task of known length, and a profile edit's cost in run time shows
+without a run.
+
+`python tc_profiles.py [tc_profiles.json] [--cycles n]` checks the profiles
+and prints each one's ramp, settle & hold time.
+"""
+import json
+import sys
+from dataclasses import dataclass, field
+
+import time_model
+
+LID_RANGE = (37, 110)
+BLOCK_RANGE = (4, 99)
+MAX_BLOCK_VOLUME = 100
+TIMING_CYCLES = 13      # for timing a profile whose cycles come from thermo-cycles-3.5.json
+
+
+@dataclass
+class Profile:
+    name: str
+    lid: float
+    block_max_volume: float
+    holds: list                 # [[C, s]] before cycling
+    cool_to: float
+    cycle: list = field(default_factory=list)      # [[C, s]] per cycle
+    cycles: int = 0             # None: thermo-cycles-3.5.json, asked for when that's 0
+    cycle_range: list = None    # [min, max] cycles an operator may give
+    final: list = field(default_factory=list)      # [[C, s]] after cycling
+    note: str = ''
+
+    def steps(self, cycles: int = None) -> list:
+        """every [C, s] the block goes through"""
+        return self.holds + self.cycle*self.cycles_for(cycles) + self.final + [[self.cool_to, 0]]
+
+    def cycles_for(self, cycles: int = None) -> int:
+        """the profile's own cycles, else the run's"""
+        if self.cycles is not None:
+            return self.cycles
+        return cycles or TIMING_CYCLES
+
+    def cycle_steps(self) -> list:
+        """cycle in execute_profile's format"""
+        return [{'temperature': t, 'hold_time_seconds': s} for t, s in self.cycle]
+
+
+def load(path: str = 'tc_profiles.json') -> dict:
+    """name -> Profile; raises with every problem found"""
+    with open(path) as f:
+        table = json.load(f)
+    errors = []
+    profiles = {}
+    for name, raw in table['profiles'].items():
+        try:
+            p = Profile(name=name, **raw)
+        except TypeError as e:
+            errors.append(name + ": " + str(e))
+            continue
+        errors += [name + ": " + e for e in check(p)]
+        profiles[name] = p
+    if errors:
+        raise Exception(path + ":\n    " + "\n    ".join(errors))
+    return profiles
+
+
+def check(p: Profile) -> list:
+    """what's wrong with a profile, [] if nothing"""
+    errors = []
+    def need(ok: bool, message: str):
+        if not ok:
+            errors.append(message)
+    need(LID_RANGE[0] <= p.lid <= LID_RANGE[1], "lid must be between " + str(LID_RANGE[0]) + " and " + str(LID_RANGE[1]) + "C")
+    need(0 < p.block_max_volume <= MAX_BLOCK_VOLUME, "block_max_volume must be between 0 and " + str(MAX_BLOCK_VOLUME) + "ul")
+    for temp, sec in p.holds + p.cycle + p.final + [[p.cool_to, 0]]:
+        need(BLOCK_RANGE[0] <= temp <= BLOCK_RANGE[1], str(temp) + "C is outside the block's " + str(BLOCK_RANGE[0]) + "-" + str(BLOCK_RANGE[1]) + "C")
+        need(sec >= 0, "hold times can't be negative")
+    if p.cycle:
+        need(p.cycles is None or p.cycles >= 1, "cycles must be at least 1 with a cycle")
+    else:
+        need(not p.cycles, "cycles without a cycle to repeat")
+    if p.cycle_range is not None:
+        need(len(p.cycle_range) == 2 and 1 <= p.cycle_range[0] <= p.cycle_range[1], "cycle_range must be [min, max], min at least 1")
+        need(p.cycles is None, "cycle_range is for cycles set per run, cycles must be null")
+    return errors
+
+
+def breakdown(p: Profile, cycles: int = None, start: float = None) -> dict:
+    """s of ramping, settling & holding from `start` C (default: cool_to) through cool down"""
+    c = p.cool_to if start is None else start
+    ramp = settle = hold = 0
+    for temp, sec in p.steps(cycles):
+        ramp += time_model.ramp_sec(c, temp, time_model.BLOCK_HEAT, time_model.BLOCK_COOL)
+        settle += time_model.settle_sec(c, temp, p.block_max_volume)
+        hold += sec
+        c = temp
+    return dict(ramp=ramp, settle=settle, hold=hold)
+
+
+def duration(p: Profile, cycles: int = None, start: float = None) -> float:
+    """s the profile keeps the block busy, see breakdown()"""
+    c = p.cool_to if start is None else start
+    return time_model.profile_sec(c, p.steps(cycles), p.block_max_volume)
+
+
+if __name__ == '__main__':
+    _path = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'tc_profiles.json'
+    _cycles = int(sys.argv[sys.argv.index('--cycles') + 1]) if '--cycles' in sys.argv else None
+    if _cycles is None:
+        with open('thermo-cycles-3.5.json') as cycle_file:
+            _cycles = int(json.load(cycle_file)["num-cycles"]) or None
+    print("{:<32}{:>8}{:>10}{:>10}{:>10}{:>10}".format("profile", "cycles", "ramp", "settle", "hold", "total"))
+    for _p in load(_path).values():
+        _b = breakdown(_p, _cycles)
+        print("{:<32}{:>8}{:>10}{:>10}{:>10}{:>10}".format(
+            _p.name, _p.cycles_for(_cycles) if _p.cycle else "-", time_model.hms(_b['ramp']), time_model.hms(_b['settle']),
+            time_model.hms(_b['hold']), time_model.hms(duration(_p, _cycles))))
+        if _p.note:
+            print("    " + _p.note)
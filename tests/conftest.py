@@ -0,0 +1,42 @@
+"""the protocol's modules are flat files at the repo root, and read their tables from there"""
+import os
+import sys
+
+import pytest
+
+import clock
+import hwproxy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def in_repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def own_bus(monkeypatch):
+    """a bus & window for this test, e.g. for configure() to replace; the other tests get theirs back"""
+    monkeypatch.setattr(hwproxy, 'BUS', hwproxy.Bus())
+    monkeypatch.setattr(hwproxy, 'WINDOW', None)
+
+
+class Protocol:
+    """the protocol context, as far as waiting goes: delay() moves the virtual clock on"""
+    def __init__(self, clk):
+        self.clock = clk
+
+    def delay(self, seconds=0, minutes=0):
+        self.clock.advance(seconds + 60*minutes)
+
+
+@pytest.fixture
+def clk():
+    return clock.VirtualClock()
+
+
+@pytest.fixture
+def protocol(clk):
+    return Protocol(clk)
@@ -0,0 +1,81 @@
+import pytest
+
+import hwproxy
+import multi_8sample
+
+pytestmark = pytest.mark.usefixtures('own_bus')
+
+STAGE = 'dyn_cleanup_amplification'
+
+
+def built(tmp_path, *flags):
+    """the prep's namespace on a freshly set up simulated deck, checkpointing into tmp_path"""
+    multi_8sample.configure(['--simulate', '--no-peephole',
+                             '--checkpoint', str(tmp_path / 'checkpoint.json'),
+                             '--events', str(tmp_path / 'events.jsonl')] + list(flags))
+    return multi_8sample.build(multi_8sample.connect())
+
+
+def used(rack):
+    return [w.well_name for w in rack.wells() if not w.has_tip]
+
+
+@pytest.fixture
+def first(tmp_path):
+    """a run that finished one step of the first stage: EB drawn, its tip parked, a block temperature reached"""
+    run = built(tmp_path)
+    hwproxy.BUS.stage_start(STAGE)
+    assert run.ckpt.pending('EB drawn')
+    run.tips.need(run.p300, run.eb_stock)
+    run.p300.aspirate(100, run.eb_stock)
+    run.p300.dispense(100, run.mag_plate['A1'].top())
+    run.tips.park(run.p300)
+    run.tips.need(run.p300, run.spri_stock)     # a second column of tips, left on the pipette
+    run.thermal.block(run.thermal.block_plan[0])
+    run.ckpt.save()
+    multi_8sample.EVENTS.close()
+    return run
+
+
+@pytest.fixture
+def resumed(tmp_path, first):
+    run = built(tmp_path, '--resume')
+    run.ckpt.restore()
+    hwproxy.BUS.stage_start(STAGE)
+    yield run
+    multi_8sample.EVENTS.close()
+
+
+def test_done_steps_are_skipped(first, resumed):
+    assert not resumed.ckpt.fresh(STAGE)
+    assert not resumed.ckpt.pending('EB drawn')
+    assert resumed.ckpt.pending('SPRI drawn')
+    assert "EB drawn" in resumed.ckpt.describe()
+
+
+def test_volumes_are_kept(first, resumed):
+    assert resumed.liquid.volume(resumed.eb_stock) == first.liquid.volume(first.eb_stock) < multi_8sample.STATE['eb_stock_vol']
+    assert resumed.liquid.volume(resumed.mag_plate['A1']) == first.liquid.volume(first.mag_plate['A1']) > 0
+    before, after = first.liquid.state(), resumed.liquid.state()
+    assert after['volumes'] == before['volumes']
+    assert all(sorted(after[k]) == sorted(before[k]) for k in ('loaded', 'stocks', 'low'))
+
+
+def test_used_tip_columns_stay_used(first, resumed):
+    for rack, again in zip(first.t300_racks, resumed.t300_racks):
+        assert used(again) == used(rack)
+    assert len(used(resumed.t300_racks[0])) == 2*8
+
+
+def test_a_parked_tip_is_picked_up_again(first, resumed):
+    slot, = [str(slot) for slot, tags in first.tips.parked['p300']]
+    assert resumed.tips.carried['p300'] is None
+    resumed.tips.need(resumed.p300, resumed.eb_stock)
+    assert str(resumed.p300._last_tip_picked_up_from) == slot
+    assert resumed.tips.parked['p300'] == []
+    assert resumed.tips.state()['contents'] == first.tips.state()['contents']
+
+
+def test_the_thermal_plan_carries_on(first, resumed):
+    assert resumed.thermal.state() == first.thermal.state()
+    assert len(resumed.thermal.block_plan) == len(resumed.plan.block_plan()) - 1
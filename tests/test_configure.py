@@ -0,0 +1,39 @@
+import sys
+
+import pytest
+
+import hwproxy
+import multi_8sample
+
+pytestmark = pytest.mark.usefixtures('own_bus')
+
+
+def configure(tmp_path, *flags):
+    multi_8sample.configure(['--simulate', '--events', str(tmp_path / 'events.jsonl')] + list(flags))
+    multi_8sample.EVENTS.close()
+
+
+def test_importing_touches_no_robot():
+    assert 'opentrons.execute' not in sys.modules
+
+
+def test_each_configure_gets_its_own_bus(tmp_path):
+    configure(tmp_path)
+    first = hwproxy.BUS
+    configure(tmp_path)
+    assert hwproxy.BUS is not first
+    assert len(hwproxy.BUS.listeners) == len(first.listeners)
+    assert hwproxy.WINDOW is multi_8sample.PEEPHOLE
+
+
+def test_no_peephole_clears_the_window(tmp_path):
+    configure(tmp_path)
+    configure(tmp_path, '--no-peephole')
+    assert hwproxy.WINDOW is None
+    assert multi_8sample.EVENTS in hwproxy.BUS.listeners
+
+
+def test_the_robot_refuses_labware_where_no_offset_was_measured(tmp_path):
+    configure(tmp_path, '--deck', 'deck_fast.json')     # simulating is fine
+    with pytest.raises(Exception, match="no offset was measured: .*mag in slot 9"):
+        multi_8sample.configure(['--deck', 'deck_fast.json', '--events', str(tmp_path / 'events.jsonl')])
@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import control
+
+
+def answer_when_asked(plane, *answers):
+    """answers in turn, each once an action is pending; returns the errors given"""
+    errors = []
+    def run():
+        for id, value in answers:
+            while not plane.snapshot()['pending']:
+                time.sleep(0.005)
+            errors.append(plane.answer(id, value, 'test'))
+    t = threading.Thread(target=run)
+    t.start()
+    return t, errors
+
+
+def test_unattended_continue_times_out(capsys):
+    plane = control.ControlPlane(auto_continue=0.01, terminal=False)
+    assert plane.ask("press enter to proceed", details=["refill ethanol"]) == ""
+    assert capsys.readouterr().out == "refill ethanol\npress enter to proceed\n"
+    assert plane.waits["press enter to proceed"][0] == 1
+
+
+def test_values_are_checked_and_never_timed_out():
+    plane = control.ControlPlane(auto_continue=0.01, terminal=False)
+    check = lambda answer: None if answer.isdigit() else "cycles must be a number"
+    t, errors = answer_when_asked(plane, (1, "twelve"), (1, ""), (1, "12"))
+    assert plane.ask("index PCR cycles?", check=check) == "12"
+    t.join()
+    assert errors == ["cycles must be a number", "a value is needed: index PCR cycles?", None]
+
+
+def test_continue_answers_the_oldest_that_needs_no_value():
+    plane = control.ControlPlane(terminal=False)
+    assert plane.answer(None, "") == "no such pending action"
+    t, errors = answer_when_asked(plane, (None, ""))
+    assert plane.ask("replace tips") == ""
+    t.join()
+    assert errors == [None]
+    assert plane.report().splitlines()[1].startswith("replace tips")
+
+
+def test_http(capsys):
+    plane = control.ControlPlane(port=0, terminal=False)
+    url = "http://127.0.0.1:" + str(plane.server.server_address[1])
+    try:
+        plane.status("washing")
+        state = json.load(urllib.request.urlopen(url + "/state"))
+        assert (state['stage'], state['message'], state['pending']) == ('setup', 'washing', [])
+        asked = []
+        t = threading.Thread(target=lambda: asked.append(plane.ask("press enter to proceed")))
+        t.start()
+        while not plane.snapshot()['pending']:
+            time.sleep(0.005)
+        pending = json.load(urllib.request.urlopen(url + "/actions"))
+        assert [a['prompt'] for a in pending] == ["press enter to proceed"]
+        try:
+            urllib.request.urlopen(urllib.request.Request(url + "/actions/99", data=b'{}'))
+        except urllib.error.HTTPError as e:
+            assert e.code == 409
+        else:
+            raise AssertionError("answered an action that isn't pending")
+        reply = json.load(urllib.request.urlopen(urllib.request.Request(url + "/continue", data=b'{}')))
+        t.join()
+        assert reply == dict(ok=True) and asked == [""]
+    finally:
+        plane.close()
@@ -0,0 +1,48 @@
+import pytest
+
+import deadlines
+
+
+@pytest.fixture
+def warnings():
+    return []
+
+
+@pytest.fixture
+def planner(protocol, clk, warnings):
+    return deadlines.Deadlines(protocol, clk, warn=lambda message, **fields: warnings.append(dict(fields, message=message)))
+
+
+def test_waits_out_what_is_left_of_the_window(planner, clk):
+    planner.start('magnet engaged')
+    clk.advance(100)
+    assert planner.wait('magnet engaged', 240) == 140
+    assert clk.monotonic() == 240
+    assert planner.errors['magnet engaged'] == [0]
+
+
+def test_starting_again_moves_the_window(planner, clk):
+    planner.start('ethanol removed')
+    clk.advance(50)
+    planner.start('ethanol removed')
+    assert planner.wait('ethanol removed', 60) == 60
+
+
+def test_a_late_wait_is_a_warning(planner, clk, warnings):
+    planner.start('magnet engaged')
+    clk.advance(250)
+    assert planner.wait('magnet engaged', 240) == 0
+    assert clk.monotonic() == 250
+    assert warnings == [dict(message='deadline missed', name='magnet engaged', seconds=240, late=10)]
+    assert "magnet engaged" in planner.report()
+
+
+def test_on_time_waits_warn_nothing(planner, warnings):
+    planner.start('x')
+    planner.wait('x', 10)
+    assert warnings == []
+
+
+def test_never_started(planner):
+    with pytest.raises(Exception, match="deadline dry was never started"):
+        planner.wait('dry', 10)
@@ -0,0 +1,51 @@
+import json
+
+import events
+import scheduler
+
+
+def records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_warnings_are_recorded_and_printed(tmp_path, capsys, clk):
+    log = events.EventLog(clk, str(tmp_path / 'events.jsonl'))
+    log.warn('stock ran dry', well='A1', ul=20)
+    log.close()
+    rec, = records(tmp_path / 'events.jsonl')
+    assert (rec['event'], rec['message'], rec['well'], rec['ul']) == ('warn', 'stock ran dry', 'A1', 20)
+    assert capsys.readouterr().out.startswith("WARNING stock ran dry: ")
+
+
+def test_only_echoed_notes_are_printed(tmp_path, capsys, clk):
+    log = events.EventLog(clk, str(tmp_path / 'events.jsonl'))
+    log.note('stock', well='A1', ul=4000)
+    log.note('magnet engaged', echo=True)
+    log.close()
+    assert [r['message'] for r in records(tmp_path / 'events.jsonl')] == ['stock', 'magnet engaged']
+    assert capsys.readouterr().out.startswith("magnet engaged: ")
+
+
+def test_console_off(tmp_path, capsys, clk):
+    log = events.EventLog(clk, str(tmp_path / 'events.jsonl'), console=False)
+    log.warn('hold overran', seconds=3)
+    log.close()
+    assert capsys.readouterr().out == ""
+    assert records(tmp_path / 'events.jsonl')[0]['event'] == 'warn'
+
+
+class TC:
+    def set_block_temperature(self, celsius, block_max_volume=None):
+        pass
+
+
+def test_an_overrun_hold_is_a_warning(tmp_path, protocol, clk):
+    log = events.EventLog(clk, str(tmp_path / 'events.jsonl'), console=False)
+    sched = scheduler.HoldScheduler(protocol, TC(), clk, note=log.note, warn=log.warn)
+    sched.hold(4, seconds=10)
+    clk.advance(25)         # the commands before wait() took longer than the hold
+    sched.wait()
+    log.close()
+    rec, = records(tmp_path / 'events.jsonl')
+    assert (rec['event'], rec['message'], rec['seconds']) == ('warn', 'hold overran', 15)
@@ -0,0 +1,56 @@
+import pytest
+
+import heights
+
+MAG = 'custommagplate96s_96_wellplate_100ul'
+CYLINDER = dict(shape='circular', diameter=2.0, depth=10.0)
+
+
+@pytest.fixture(scope='module')
+def tables():
+    return heights.load()
+
+
+def test_empty_and_full(tables):
+    for t in tables.values():
+        assert t.height(0) == 0 and t.volume(0) == 0
+        assert t.height(t.capacity()) == pytest.approx(t.depth)
+        assert t.height(2*t.capacity()) == t.depth
+        assert t.volume(t.depth + 1) == t.capacity()
+
+
+def test_height_and_volume_are_inverse(tables):
+    for t in tables.values():
+        for frac in (0.01, 0.1, 0.5, 0.9):
+            ul = t.capacity()*frac
+            assert t.volume(t.height(ul)) == pytest.approx(ul, rel=1e-6)
+
+
+def test_straight_wall_is_linear():
+    t = heights.table('cylinder', CYLINDER, {})
+    assert t.capacity() == pytest.approx(3.14159*10, rel=1e-4)
+    assert t.height(t.capacity()/4) == pytest.approx(2.5)
+
+
+def test_mag_plate_keeps_the_old_fit(tables):
+    t = tables[MAG]
+    assert t.height(10) == pytest.approx(0.8)
+    assert t.height(100) == pytest.approx(8.0)
+    assert t.height(200) == pytest.approx(8.0 + 0.045*100, abs=0.05)
+
+
+def test_calibration_overrides_the_geometry_below_its_last_point():
+    t = heights.table('cylinder', CYLINDER, dict(calibration=[[10, 2.0]]))
+    geometry = heights.table('cylinder', CYLINDER, {})
+    assert t.height(5) == pytest.approx(1.0)
+    assert t.height(20) - t.height(15) == pytest.approx(geometry.height(20) - geometry.height(15))
+
+
+def test_check_reports_every_problem():
+    errors = heights.check(CYLINDER, dict(depth=-1, bottom=dict(height=3, x=1), calibration=[[5, 2], [10, 1]]))
+    assert errors == [
+        "depth must be over 0mm",
+        "the bottom's height must be between 0mm and the depth",
+        "a circular well's bottom has diameter",
+        "calibration points must be [ul, mm] over 0, within the depth",
+        "calibration heights must go up with volume"]
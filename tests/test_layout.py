@@ -0,0 +1,41 @@
+import pytest
+
+import layout
+
+
+class Plate(dict):
+    """A1..A12 well names standing in for wells"""
+    def __init__(self):
+        super().__init__(('A' + str(c), 'A' + str(c)) for c in range(1, 13))
+
+
+def test_one_column_keeps_the_original_positions():
+    wells = layout.allocate(Plate(), "tc plate", [('cDNA_amp_tc', 1), ('frag_mix_tc', 1)], 5)
+    assert wells == {'cDNA_amp_tc': ['A5'], 'frag_mix_tc': ['A6']}
+
+
+def test_mag_plate_counts_down():
+    wells = layout.allocate(Plate(), "mag plate", [('dyn_cleanup', 2), ('cDNA_cleanup', 2)], 12, -1)
+    assert wells == {'dyn_cleanup': ['A12', 'A11'], 'cDNA_cleanup': ['A10', 'A9']}
+
+
+def test_shared_stock_takes_one_column_and_empty_roles_none():
+    wells = layout.allocate(Plate(), "temp plate", [('amp_rxn_mix', 1), ('frag_mix', 0), ('ada_lig_mix', 2)], 1)
+    assert wells == {'amp_rxn_mix': ['A1'], 'frag_mix': [], 'ada_lig_mix': ['A2', 'A3']}
+
+
+def test_two_columns_without_multiplexing_fill_the_tc_plate():
+    roles = [('cDNA_amp_tc', 2), ('frag_mix_tc', 2), ('ada_lig_mix_tc', 2), ('samp_index_pcr', 2)]
+    wells = layout.allocate(Plate(), "tc plate", roles, 5)
+    assert wells['samp_index_pcr'] == ['A11', 'A12']
+
+
+def test_overflow_names_the_plate_role_and_hint():
+    roles = [('cDNA_amp_tc', 2), ('frag_mix_tc', 2), ('ada_lig_mix_tc', 2), ('samp_index_pcr', 2), ('mult_index_pcr', 2)]
+    with pytest.raises(Exception, match="tc plate needs 10 columns from A5, mult_index_pcr does not fit: .*--no-multiplex"):
+        layout.allocate(Plate(), "tc plate", roles, 5, hint="run fewer columns, or --no-multiplex")
+
+
+def test_overflow_below_column_1():
+    with pytest.raises(Exception, match="mag plate needs 13 columns from A12"):
+        layout.allocate(Plate(), "mag plate", [('a', 12), ('b', 1)], 12, -1)
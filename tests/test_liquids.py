@@ -0,0 +1,35 @@
+import pytest
+
+import liquids
+
+
+def test_shipped_classes_load_for_both_pipettes():
+    classes = liquids.load()
+    assert all(set(by_pip) == set(liquids.PIPETTES) for by_pip in classes.values())
+    assert classes['aqueous']['p300'] == liquids.LiquidClass(name='aqueous', note=classes['aqueous']['p300'].note)
+
+
+def test_pipette_overrides_only_that_pipette():
+    spri = liquids.load()['spri']
+    assert (spri['p20'].aspirate_rate, spri['p20'].dispense_rate) == (0.25, 1.0)
+    assert (spri['p300'].aspirate_rate, spri['p300'].dispense_rate) == (0.2, 0.2)
+    assert spri['p20'].withdraw_speed == spri['p300'].withdraw_speed == 10
+
+
+def test_check_reports_every_problem():
+    lc = liquids.LiquidClass(name='x', aspirate_rate=3, dispense_delay=-1, rise_speed=0, air_gap=-5)
+    assert liquids.check(lc) == [
+        "rates must be over 0 and at most 2.0",
+        "delays can't be negative",
+        "speeds must be over 0mm/s",
+        "air_gap can't be negative"]
+
+
+def test_load_reports_every_class_at_once(tmp_path):
+    path = tmp_path / 'liquids.json'
+    path.write_text('{"classes": {"a": {"p20": {"dispense_rate": 0}}, "b": {"viscosity": 3}, "c": {}}}')
+    with pytest.raises(Exception) as e:
+        liquids.load(str(path))
+    assert "a (p20): rates must be over 0" in str(e.value)
+    assert "a (p300)" not in str(e.value)
+    assert "b: " in str(e.value) and "viscosity" in str(e.value)
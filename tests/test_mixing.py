@@ -0,0 +1,80 @@
+import pytest
+
+import liquids
+import mixing
+
+MOVE = 3        # s into the well, on the first aspirate of a mix
+PLUNGER = 1     # s per aspirate or dispense
+
+
+class Pipette:
+    _name = 'p300'
+
+    def __init__(self, clk):
+        self.clock = clk
+        self.at = None
+        self.calls = []
+
+    def aspirate(self, vol, loc, rate=1.0):
+        self.calls.append(('aspirate', rate))
+        if loc != self.at:
+            self.clock.advance(MOVE)
+            self.at = loc
+        self.clock.advance(PLUNGER)
+
+    def dispense(self, vol, loc, rate=1.0):
+        self.calls.append(('dispense', rate))
+        self.clock.advance(PLUNGER)
+
+    def move_to(self, loc, speed=None):
+        self.calls.append(('move_to', speed))
+        self.at = loc
+
+
+@pytest.fixture
+def mixer(protocol, clk):
+    return mixing.Mixer(protocol, clk, liquids.load())
+
+
+@pytest.fixture
+def pip(clk):
+    return Pipette(clk)
+
+
+def test_no_budget_left_still_mixes_once(mixer, pip):
+    assert mixer.mix(pip, 100, 'A1', seconds=0) == 1
+    assert mixer.mix(pip, 100, 'A2', seconds=-5) == 1
+
+
+def test_latency_leaves_out_the_move_into_the_well(mixer, pip):
+    mixer.mix(pip, 100, 'A1', cycles=5)
+    assert mixer.cycle_sec(('p300', 100, 'aqueous')) == 2*PLUNGER
+
+
+def test_one_cycle_mix_measures_nothing(mixer, pip):
+    mixer.mix(pip, 100, 'A1', cycles=1)
+    assert mixer.cycle_sec(('p300', 100, 'aqueous')) is None
+
+
+def test_budget_is_filled_with_whole_cycles_and_ends_on_time(mixer, pip, clk):
+    run = mixer.mix(pip, 100, 'A1', seconds=20)
+    assert run == 1 + (20 - MOVE - 2*PLUNGER)//(2*PLUNGER)
+    assert clk.monotonic() == 20
+
+
+@pytest.mark.parametrize('kwargs', [dict(), dict(cycles=2, seconds=10)])
+def test_cycles_or_seconds(mixer, pip, kwargs):
+    with pytest.raises(Exception, match="give cycles or seconds"):
+        mixer.mix(pip, 100, 'A1', **kwargs)
+
+
+def test_cycles_are_pipetted_as_the_liquid_class(mixer, pip, clk):
+    mixer.mix(pip, 30, 'A1', cycles=2, liquid='elution_mix', dispense_at='A1 higher')
+    assert pip.calls[:3] == [('aspirate', 2.0), ('move_to', 1), ('dispense', 2.0)]
+    assert clk.monotonic() == MOVE + 2*(2*PLUNGER + 0.5) + MOVE
+
+
+def test_latency_is_kept_per_liquid_class(mixer, pip):
+    mixer.mix(pip, 100, 'A1', cycles=3, liquid='bead_mix')
+    assert mixer.cycle_sec(('p300', 100, 'bead_mix')) == 2*PLUNGER + 1
+    assert mixer.cycle_sec(('p300', 100, 'aqueous')) is None
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from hwproxy import Command
+import peephole
+
+
+def at(x, y, z):
+    return SimpleNamespace(point=SimpleNamespace(x=x, y=y, z=z))
+
+
+def run(window, *cmds):
+    """issue each command, return the names of those that ran, in order"""
+    ran = []
+    for cmd in cmds:
+        window.issue(cmd, lambda cmd=cmd: ran.append(cmd.name + (str(cmd.args[0].point.z) if cmd.args else '')))
+    window.flush()
+    return ran
+
+
+def move(x, y, z, **kwargs):
+    return Command('p300', 'move_to', (at(x, y, z),), kwargs)
+
+
+def test_moves_up_the_same_line_fuse():
+    w = peephole.Window()
+    ran = run(w, move(10, 10, 5), move(10, 10, 20), move(10, 10, 40))
+    assert ran == ['move_to5', 'move_to40']
+    assert w.rewrites == {'z fuse': 1}
+
+
+def test_move_down_then_up_is_kept():
+    w = peephole.Window()
+    ran = run(w, move(10, 10, 20), move(10, 10, 5), move(10, 10, 40))
+    assert ran == ['move_to20', 'move_to5', 'move_to40']
+    assert w.rewrites == {}
+
+
+def test_slow_moves_never_fuse_with_default_speed_ones():
+    w = peephole.Window()
+    ran = run(w, move(10, 10, 5), move(10, 10, 20, speed=2), move(10, 10, 40))
+    assert ran == ['move_to5', 'move_to20', 'move_to40']
+
+
+def test_move_before_a_tip_drop_is_dead():
+    w = peephole.Window()
+    ran = run(w, move(10, 10, 5), move(50, 10, 20), Command('p300', 'drop_tip'))
+    assert ran == ['move_to5', 'drop_tip']
+    assert w.rewrites == {'dead move': 1}
+    assert w.gantry['executed'] < w.gantry['issued']
+
+
+def test_another_pipette_flushes_the_held_move():
+    w = peephole.Window()
+    ran = run(w, move(10, 10, 5), Command('p20', 'drop_tip'))
+    assert ran == ['move_to5', 'drop_tip']
+
+
+def test_repeated_touch_tip_runs_once():
+    w = peephole.Window()
+    tt = Command('p300', 'touch_tip', (at(0, 0, 0),), dict(v_offset=-2))
+    ran = run(w, tt, Command('p300', 'touch_tip', tt.args, dict(tt.kwargs)))
+    assert ran == ['touch_tip0']
+    assert w.rewrites == {'touch_tip': 1}
@@ -0,0 +1,82 @@
+import copy
+
+import pytest
+
+import stages
+
+
+@pytest.fixture
+def table():
+    return stages.load('stages.json')
+
+
+def step(table, stage, name):
+    st, = [st for st in table['stages'] if st['stage'] == stage]
+    s, = [s for s in st['steps'] if s['name'] == name]
+    return s
+
+
+def test_shipped_table_compiles_both_ways(table):
+    for multiplex in (True, False):
+        plan = stages.compile_plan(table, multiplex)
+        assert plan.names()[0] == 'dyn_cleanup_amplification'
+
+
+def test_multiplex_steps_and_shares_drop_out(table):
+    plan = stages.compile_plan(table, False)
+    assert 'multiplex_index_pcr_size_sel' not in plan.names()
+    sels = plan.steps('cDNA_cleanup_pellet_cleanup', stages.SizeSelection)
+    assert [s.name for s in sels] == ['cDNA cleanup']
+    assert sels[0].share is None
+    assert stages.compile_plan(table, True).steps('cDNA_cleanup_pellet_cleanup', stages.SizeSelection)[0].share
+
+
+def test_lid_and_block_plans_follow_run_order(table):
+    plan = stages.compile_plan(table, True)
+    assert plan.block_plan() == [4, 20]
+    assert len(plan.lid_plan()) == len([s for n in plan.names() for s in plan.steps(n, stages.Thermocycle)])
+
+
+def test_every_problem_is_reported_at_once(table):
+    bad = copy.deepcopy(table)
+    step(bad, 'cDNA_cleanup_pellet_cleanup', 'cDNA cleanup')['spri_vol'] = 300
+    step(bad, 'frag_end_repair_a_tailing_size_sel', 'fragmentation, end repair & a-tailing')['profile'] = 'nope'
+    with pytest.raises(Exception) as e:
+        stages.compile_plan(bad, True)
+    assert "spri_vol must be between 0 and 250ul" in str(e.value)
+    assert "no tc profile nope" in str(e.value)
+
+
+def test_unknown_kind_and_field(table):
+    bad = copy.deepcopy(table)
+    bad['stages'][0]['steps'][0]['kind'] = 'centrifuge'
+    bad['stages'][0]['steps'][1]['colour'] = 'red'
+    with pytest.raises(Exception, match="kind must be one of(.|\n)*unexpected keyword argument 'colour'"):
+        stages.compile_plan(bad, True)
+
+
+def test_unknown_role(table):
+    with pytest.raises(Exception, match="no wells for role dyn_cleanup"):
+        stages.compile_plan(table, False, roles={})
+
+
+def test_mag_source_needs_an_earlier_fill(table):
+    bad = copy.deepcopy(table)
+    step(bad, 'frag_end_repair_a_tailing_size_sel', 'double sided size selection, 1st')['to_mag'] = False
+    with pytest.raises(Exception, match="mag_source, but no earlier step puts a sample in size_sel_0_cDNA"):
+        stages.compile_plan(bad, True)
+
+
+def test_dest_rep_8_is_one_p300_transfer(table):
+    s = step(copy.deepcopy(table), 'index_pcr_size_sel', 'double sided size selection, 1st')
+    s.pop('kind')
+    sel = stages.SizeSelection(**s)
+    assert stages.check(sel) == []
+    sel.dest_vol = 40
+    assert "dest_rep 8 is one p300 transfer, 8*dest_vol must be 250ul or less" in stages.check(sel)
+
+
+def test_fills_stop_at_the_next_stage_with_holds(table):
+    plan = stages.compile_plan(table, True)
+    fills = plan.fills('frag_end_repair_a_tailing_size_sel')
+    assert [s.name for s in fills] == ['double sided size selection, 1st', 'double sided size selection, 2nd']
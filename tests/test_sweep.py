@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import stages
+import sweep
+
+
+@pytest.fixture
+def tables():
+    with open('tc_profiles.json') as f:
+        return stages.load('stages.json'), json.load(f)
+
+
+def test_parse_and_combinations():
+    vary = sweep.parse(['size_selection.mag_sec=180,240', 'args=,--consolidated-wash'])
+    assert vary == {'size_selection.mag_sec': [180, 240], 'args': ['', '--consolidated-wash']}
+    combos = sweep.combinations(vary)
+    assert len(combos) == 4
+    assert [sweep.args_of(c) for c in combos[:2]] == [[], ['--consolidated-wash']]
+
+
+def test_apply_leaves_the_tables_given_alone(tables):
+    table, profiles = tables
+    t, p = sweep.apply({'size_selection.mag_sec': 1, 'tc.cdna_amplification.cycles': 11}, table, profiles)
+    sels = [s for st in t['stages'] for s in st['steps'] if s['kind'] == 'size_selection']
+    assert sels and all(s['mag_sec'] == 1 for s in sels)
+    assert p['profiles']['cdna_amplification']['cycles'] == 11
+    assert all(s.get('mag_sec') != 1 for st in table['stages'] for s in st['steps'])
+    assert profiles['profiles']['cdna_amplification']['cycles'] == 12
+
+
+def test_apply_by_stage(tables):
+    table, profiles = tables
+    t, _ = sweep.apply({'index_pcr_size_sel.size_selection.mag_sec': 1}, table, profiles)
+    changed = {st['stage'] for st in t['stages'] for s in st['steps'] if s.get('mag_sec') == 1}
+    assert changed == {'index_pcr_size_sel'}
+
+
+def test_apply_into_a_profile_step(tables):
+    table, profiles = tables
+    _, p = sweep.apply({'tc.cdna_amplification.holds.0.1': 120}, table, profiles)
+    assert p['profiles']['cdna_amplification']['holds'][0] == [98, 120]
+
+
+@pytest.mark.parametrize('key, error', [
+    ('centrifuge.spin_sec', "parameters are <kind>.<field>"),
+    ('size_selection', "parameters are <kind>.<field>"),
+    ('index_pcr_size_sel.dynabead_cleanup.mag_sec', "no dynabead_cleanup steps in index_pcr_size_sel"),
+    ('tc.nope.lid', "tc.nope.lid: no nope"),
+    ('tc.cdna_amplification.holds.5.1', "no cdna_amplification.holds.5"),
+])
+def test_apply_unknown_key(tables, key, error):
+    table, profiles = tables
+    with pytest.raises(Exception, match=error):
+        sweep.apply({key: 1}, table, profiles)
+
+
+def test_unknown_field_fails_the_check_before_any_run(tables, tmp_path):
+    table, profiles = tables
+    combos = [{'size_selection.mag_sec': 180}, {'size_selection.colour': 1}, {'tc.adaptor_ligation.lid': 200}]
+    with pytest.raises(Exception) as e:
+        sweep.prepare(combos, str(tmp_path), table, profiles)
+    assert "unexpected keyword argument 'colour'" in str(e.value)
+    assert "lid must be between" in str(e.value)
+    assert "mag_sec" not in str(e.value)
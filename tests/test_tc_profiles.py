@@ -0,0 +1,46 @@
+import pytest
+
+import tc_profiles
+import time_model
+
+
+def test_shipped_profiles_load():
+    profiles = tc_profiles.load()
+    assert profiles['sample_index_pcr'].cycles is None
+
+
+def test_bad_profile_reports_every_problem():
+    p = tc_profiles.Profile(name='x', lid=120, block_max_volume=0, holds=[[2, -1]], cool_to=4, cycles=3)
+    assert tc_profiles.check(p) == [
+        "lid must be between 37 and 110C",
+        "block_max_volume must be between 0 and 100ul",
+        "2C is outside the block's 4-99C",
+        "hold times can't be negative",
+        "cycles without a cycle to repeat"]
+
+
+def test_cycle_range_needs_cycles_set_per_run():
+    p = tc_profiles.Profile(name='x', lid=105, block_max_volume=50, holds=[], cool_to=4,
+                            cycle=[[98, 20]], cycles=5, cycle_range=[5, 20])
+    assert tc_profiles.check(p) == ["cycle_range is for cycles set per run, cycles must be null"]
+
+
+def test_unknown_field_fails_the_load(tmp_path):
+    path = tmp_path / 'tc_profiles.json'
+    path.write_text('{"profiles": {"x": {"lid": 37, "block_max_volume": 10, "holds": [], "cool_to": 4, "colour": 1}}}')
+    with pytest.raises(Exception, match="x: .*unexpected keyword argument 'colour'"):
+        tc_profiles.load(str(path))
+
+
+def test_duration_is_the_breakdown_summed():
+    for p in tc_profiles.load().values():
+        b = tc_profiles.breakdown(p, 10)
+        assert tc_profiles.duration(p, 10) == pytest.approx(b['ramp'] + b['settle'] + b['hold'])
+
+
+def test_cycles_per_run_change_the_duration():
+    p = tc_profiles.load()['sample_index_pcr']
+    assert p.cycles_for(None) == tc_profiles.TIMING_CYCLES
+    one_cycle = tc_profiles.duration(p, 6) - tc_profiles.duration(p, 5)
+    assert one_cycle > sum(s for _, s in p.cycle)
+    assert tc_profiles.duration(p, 5, start=time_model.AMBIENT_C) != tc_profiles.duration(p, 5)
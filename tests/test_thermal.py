@@ -0,0 +1,113 @@
+import clock
+import hwproxy
+import thermal
+
+
+class FakeCore:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def set_target_lid_temperature(self, celsius):
+        self.calls.append(('core lid', celsius))
+
+    def wait_for_lid_temperature(self):
+        self.calls.append(('core wait lid',))
+
+    def set_target_block_temperature(self, celsius, block_max_volume=None):
+        self.calls.append(('core block', celsius, block_max_volume))
+
+    def wait_for_block_temperature(self):
+        self.calls.append(('core wait block',))
+
+
+class FakeTC:
+    def __init__(self, core=True, lid_temperature=None):
+        self.calls = []
+        self.lid_temperature = lid_temperature
+        if core is True:
+            self._core = FakeCore(self.calls)
+        elif core is not None:
+            self._core = core
+
+    def set_lid_temperature(self, celsius):
+        self.calls.append(('lid', celsius))
+
+    def deactivate_lid(self):
+        self.calls.append(('deactivate lid',))
+
+    def set_block_temperature(self, celsius, block_max_volume=None):
+        self.calls.append(('block', celsius, block_max_volume))
+
+
+def planner(tc, lid_plan=(), block_plan=()):
+    return thermal.ThermalPlanner(tc, clock.VirtualClock(), lid_plan, block_plan)
+
+
+def test_core_path_waits_on_the_started_lid():
+    tc = FakeTC()
+    p = planner(tc, lid_plan=[37])
+    p.release_lid()
+    p.lid(37)
+    assert tc.calls == [('core lid', 37), ('core wait lid',)]
+
+
+def test_core_path_times_a_pre_started_block_for_its_volume():
+    tc = FakeTC()
+    p = planner(tc, block_plan=[4])
+    p.release_block()
+    p.block(4, block_max_volume=50)
+    assert tc.calls == [('core block', 4, None), ('core block', 4, 50), ('core wait block',)]
+
+
+def test_core_missing_a_method_falls_back():
+    class PartialCore:
+        def set_target_lid_temperature(self, celsius):
+            raise AssertionError("half a core API is never used")
+    tc = FakeTC(core=PartialCore())
+    p = planner(tc, lid_plan=[37], block_plan=[4])
+    assert p.core is None
+    p.release_block()
+    p.block(4, block_max_volume=50)
+    assert tc.calls == [('block', 4, 50)]
+
+
+def test_fallback_cools_the_lid_passively_then_sets_it():
+    tc = FakeTC(core=None, lid_temperature=105)
+    p = planner(tc, lid_plan=[37])
+    p.release_lid()
+    p.lid(37)
+    assert tc.calls == [('deactivate lid',), ('lid', 37)]
+
+
+def test_fallback_never_deactivates_a_lid_that_must_heat():
+    tc = FakeTC(core=None, lid_temperature=37)
+    p = planner(tc, lid_plan=[105])
+    p.release_lid()
+    p.lid(105)
+    assert tc.calls == [('lid', 105)]
+
+
+def test_lid_needed_at_another_temperature_is_set():
+    tc = FakeTC()
+    p = planner(tc, lid_plan=[37, 105])
+    p.release_lid()
+    p.lid(105)
+    assert tc.calls == [('core lid', 37), ('lid', 105)]
+    assert p.lid_plan == [37, 105]
+
+
+def test_core_calls_are_traced():
+    seen = []
+
+    class Listener:
+        def before(self, cmd):
+            seen.append(cmd.name)
+    listener = Listener()
+    hwproxy.BUS.subscribe(listener)
+    try:
+        p = planner(FakeTC(), lid_plan=[37])
+        p.release_lid()
+        p.lid(37)
+    finally:
+        hwproxy.BUS.unsubscribe(listener)
+    assert seen == ['start_lid_temperature', 'wait_lid_temperature']
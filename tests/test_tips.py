@@ -0,0 +1,78 @@
+import opentrons.simulate
+import pytest
+
+import hwproxy
+import tips as tip_policy
+
+
+@pytest.fixture
+def deck(own_bus):
+    """a stock column, a sample plate on the magnet & a p300 whose commands TipPolicy watches"""
+    protocol = opentrons.simulate.get_protocol_api('2.12')
+    rack = protocol.load_labware('opentrons_96_tiprack_300ul', 1)
+    r15 = protocol.load_labware('nest_12_reservoir_15ml', 2)
+    mag = protocol.load_module('magnetic module gen2', 3)
+    mag_plate = mag.load_labware('nest_96_wellplate_100ul_pcr_full_skirt')
+    p300 = hwproxy.Traced(protocol.load_instrument('p300_multi_gen2', mount='right', tip_racks=[rack]), 'p300')
+    warnings = []
+    tips = tip_policy.TipPolicy(mag_plate, protocol.fixed_trash, warn=lambda message, **fields: warnings.append(message))
+    tips.watch(p300)
+    hwproxy.BUS.subscribe(tips)
+    tips.stock(r15['A1'])
+    return tips, p300, hwproxy.Traced(mag, 'mag'), r15['A1'], mag_plate, warnings
+
+
+def test_a_clean_stock_tip_serves_every_top_dispense(deck):
+    tips, p300, mag, stock, plate, warnings = deck
+    for dest in plate.rows()[0][:3]:
+        tips.need(p300, stock)
+        p300.aspirate(50, stock)
+        p300.dispense(50, dest.top())
+    assert (tips.picked['setup'], tips.reused['setup']) == (1, 2)
+    assert tips.violations == 0
+
+
+def test_a_tip_that_dispensed_into_a_sample_is_not_reused_for_the_stock(deck):
+    tips, p300, mag, stock, plate, warnings = deck
+    tips.sample(plate['A1'])
+    tips.need(p300, stock)
+    p300.aspirate(50, stock)
+    p300.dispense(50, plate['A1'])
+    tips.need(p300, stock)
+    assert tips.picked['setup'] == 2
+    assert tips.violations == 0
+
+
+def test_a_sample_carried_into_the_stock_is_a_violation(deck):
+    tips, p300, mag, stock, plate, warnings = deck
+    tips.sample(plate['A1'])
+    tips.need(p300, stock)
+    p300.aspirate(50, stock)
+    p300.dispense(50, plate['A1'])
+    p300.aspirate(50, stock)        # without asking need() first
+    assert tips.violations == 1
+    assert warnings == ['tip carried into stock']
+
+
+@pytest.mark.parametrize('waste, picked', [(True, 1), (False, 2)])
+def test_after_the_magnet_a_bead_tip_only_takes_supernatant_to_waste(deck, waste, picked):
+    tips, p300, mag, stock, plate, warnings = deck
+    tips.sample(plate['A1'])
+    tips.need(p300, plate['A1'])
+    p300.mix(3, 50, plate['A1'])
+    mag.engage(height=10)
+    tips.need(p300, plate['A1'], waste=waste)
+    assert tips.picked['setup'] == picked
+
+
+def test_a_parked_tip_is_picked_up_again(deck):
+    tips, p300, mag, stock, plate, warnings = deck
+    tips.need(p300, stock)
+    slot = p300._last_tip_picked_up_from
+    p300.aspirate(50, stock)
+    p300.dispense(50, plate['A1'].top())
+    tips.park(p300)
+    assert tips.carried['p300'] is None
+    tips.need(p300, stock)
+    assert p300._last_tip_picked_up_from is slot
+    assert (tips.picked['setup'], tips.reused['setup']) == (1, 1)
@@ -0,0 +1,113 @@
+"""thermal lookahead: lid, block & temperature module transitions started early
+
+Lid & block setpoints used to be issued when needed and waited on there; the
+lid alone took ~30 min to cool from 65C to 37C. ThermalPlanner knows the
+temperatures the run will need, in order. When a stage is done with the lid
+(or block) it calls release_*(), which starts the transition to the next
+needed temperature without waiting. lid()/block() then only wait for whatever
+part of the ramp hasn't already happened.
+
+api 2.12 has no non-blocking thermocycler setpoint, so transitions are started
+through the thermocycler core's set_target_* & wait_for_* (robot software 6.x),
+used only when all of CORE_METHODS are there. Without them the planner falls
+back to deactivating the lid early (passive cooling) and the blocking calls.
+The temperature module uses the public start_set_temperature/await_temperature.
+
+Ramp times come from time_model, which also turns the waits into virtual time
+when simulating.
+"""
+import hwproxy
+import time_model
+
+CORE_METHODS = ('set_target_lid_temperature', 'wait_for_lid_temperature',
+                'set_target_block_temperature', 'wait_for_block_temperature')
+
+
+class ThermalPlanner:
+    def __init__(self, tc, clock, lid_plan, block_plan, temp_mod=None, note=None):
+        """lid_plan/block_plan: temperatures needed by lid()/block(), in run order
+        note(message, **fields) reports each lookahead, e.g. EventLog.note"""
+        self.tc = tc
+        self.clock = clock
+        self.note = note
+        self.lid_plan = list(lid_plan)
+        self.block_plan = list(block_plan)
+        self.temp_mod = temp_mod
+        core = getattr(tc, '_core', None)
+        self.core = core if core is not None and all(callable(getattr(core, m, None)) for m in CORE_METHODS) else None
+        self.lid_started = None                 # (target, monotonic start), only when started through the core
+        self.block_started = None
+
+    ## THERMOCYCLER LID ##
+    def release_lid(self):
+        """lid is free until the next lid(): start towards the next planned temperature"""
+        if not self.lid_plan:
+            self.tc.deactivate_lid()
+            return
+        target = self.lid_plan[0]
+        ramp = time_model.ramp_sec(self.tc.lid_temperature or time_model.AMBIENT_C, target,
+                                   time_model.LID_HEAT, time_model.LID_COOL)
+        if self.note is not None:
+            self.note("lid lookahead", celsius=target, ramp_min=round(ramp/60))
+        if self.core is not None:
+            hwproxy.call('tc', 'start_lid_temperature', self.core.set_target_lid_temperature, celsius=target)
+            self.lid_started = (target, self.clock.monotonic())
+        elif self.tc.lid_temperature is not None and self.tc.lid_temperature > target:
+            self.tc.deactivate_lid()        # cools passively, lid() sets the temperature & waits
+
+    def lid(self, celsius: float):
+        """lid needed at `celsius` now"""
+        if self.lid_plan and self.lid_plan[0] == celsius:
+            self.lid_plan.pop(0)
+        started = self.lid_started
+        self.lid_started = None
+        if started is None or started[0] != celsius:
+            self.tc.set_lid_temperature(celsius)
+            return
+        if self.note is not None:
+            self.note("lid wait", celsius=celsius, started_min=round((self.clock.monotonic() - started[1])/60))
+        hwproxy.call('tc', 'wait_lid_temperature', self.core.wait_for_lid_temperature)
+
+    ## THERMOCYCLER BLOCK ##
+    def release_block(self):
+        """block is free until the next block(): start towards the next planned temperature"""
+        if not self.block_plan:
+            return
+        target = self.block_plan[0]
+        if self.core is not None:
+            hwproxy.call('tc', 'start_block_temperature', self.core.set_target_block_temperature, celsius=target)
+            self.block_started = target
+
+    def block(self, celsius: float, block_max_volume: float = None):
+        """block needed at `celsius` now"""
+        if self.block_plan and self.block_plan[0] == celsius:
+            self.block_plan.pop(0)
+        started = self.block_started
+        self.block_started = None
+        if started != celsius:
+            self.tc.set_block_temperature(celsius, block_max_volume=block_max_volume)
+            return
+        if block_max_volume is not None:    # same target, the hold is timed for the sample's volume
+            hwproxy.call('tc', 'start_block_temperature', self.core.set_target_block_temperature,
+                         celsius=celsius, block_max_volume=block_max_volume)
+        hwproxy.call('tc', 'wait_block_temperature', self.core.wait_for_block_temperature)
+
+    ## CHECKPOINT ##
+    def state(self) -> dict:
+        return dict(lid_plan=self.lid_plan, block_plan=self.block_plan)
+
+    def restore(self, state: dict, wells: dict):
+        """temperatures still to come; a resumed run starts with no transition under way"""
+        self.lid_plan = list(state['lid_plan'])
+        self.block_plan = list(state['block_plan'])
+        self.lid_started = None
+        self.block_started = None
+
+    ## TEMPERATURE MODULE ##
+    def start_cold_block(self, celsius: float = 4):
+        if self.temp_mod is not None:
+            self.temp_mod.start_set_temperature(celsius)
+
+    def cold_block(self, celsius: float = 4):
+        if self.temp_mod is not None:
+            self.temp_mod.await_temperature(celsius)
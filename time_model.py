@@ -0,0 +1,325 @@
+"""how long each hardware command takes on the robot
+
+TimeModel predicts the duration of every traced command from its arguments:
+plunger time from volume, flow rate & `rate`, gantry time from the distance
+between successive locations & `speed`, fixed costs for tip handling, and
+thermocycler ramps from the current block/lid temperatures.
+
+Used two ways:
+    ClockDriver advances the VirtualClock while simulating, so timed mixing
+    loops issue the same number of commands they would on hardware
+    Estimator totals predicted (and, on the robot, measured) time per stage
+"""
+import math
+import random
+
+from hwproxy import Command
+
+## PIPETTES ##
+# ul/s at rate=1.0, api 2.12 defaults
+FLOW_RATE = dict(
+    p20  = dict(aspirate=7.6,  dispense=7.6,  blow_out=7.6),
+    p300 = dict(aspirate=94.0, dispense=94.0, blow_out=94.0),
+)
+BLOW_OUT_UL     = 10        # air pushed through the tip on blow_out, roughly
+DEFAULT_SPEED   = 400       # mm/s, gantry
+Z_SPEED         = 125       # mm/s, pipette mount max
+ARC_Z           = 110       # mm above deck cleared when moving between labware
+MOVE_OVERHEAD   = 0.2       # s, acceleration & controller latency per move
+
+## FIXED COSTS ##
+# seconds, observed on our OT-2s; tip handling includes travel to rack/trash
+COMMAND_SEC = dict(
+    pick_up_tip     = 7.0,
+    drop_tip        = 7.0,
+    return_tip      = 7.0,
+    touch_tip       = 2.5,
+    open_lid        = 20.0,   # "lid open takes between 28 and 4 seconds"
+    close_lid       = 20.0,
+    engage          = 3.0,
+    disengage       = 3.0,
+    home            = 15.0,
+)
+
+## THERMAL ##
+# degC/s; block from thermocycler gen1 spec, lid from our runs
+# (65C -> 37C lid took ~27 min: "30 minute lid temp change????!!?")
+AMBIENT_C       = 23
+BLOCK_HEAT      = 4.0
+BLOCK_COOL      = 2.0
+LID_HEAT        = 0.2
+LID_COOL        = 0.017
+BLOCK_SETTLE    = 0.05      # s per ul of block_max_volume after each block temperature change, sample catching up
+TEMP_MOD_HEAT   = 0.1       # temperature module gen2 with aluminum block
+TEMP_MOD_COOL   = 0.03
+
+# command name -> breakdown category
+CATEGORY = dict(
+    aspirate='aspirate', air_gap='aspirate', mix='aspirate',
+    dispense='dispense', blow_out='dispense',
+    move_to='move', touch_tip='move', home='move',
+    pick_up_tip='tips', drop_tip='tips', return_tip='tips',
+    delay='delay',
+    set_block_temperature='thermocycler', set_lid_temperature='thermocycler',
+    execute_profile='thermocycler', open_lid='thermocycler', close_lid='thermocycler',
+    deactivate_lid='thermocycler', deactivate_block='thermocycler',
+    start_lid_temperature='thermocycler', wait_lid_temperature='thermocycler',
+    start_block_temperature='thermocycler', wait_block_temperature='thermocycler',
+    set_temperature='temp module', start_set_temperature='temp module', await_temperature='temp module',
+    engage='magnet', disengage='magnet',
+)
+# categories whose times vary run to run: mechanics, not timed holds
+JITTERED = ('aspirate', 'dispense', 'move', 'tips', 'magnet')
+
+
+def hold_sec(seconds=None, minutes=None) -> float:
+    return (seconds or 0) + (minutes or 0)*60
+
+
+def ramp_sec(frm: float, to: float, heat: float, cool: float) -> float:
+    if frm is None or to is None:
+        return 0
+    return (to - frm)/heat if to >= frm else (frm - to)/cool
+
+
+def settle_sec(frm: float, to: float, block_max_volume: float = None) -> float:
+    """time after the block reaches a new temperature before the sample has"""
+    if frm is None or to is None or frm == to or not block_max_volume:
+        return 0
+    return BLOCK_SETTLE*block_max_volume
+
+
+def profile_sec(frm: float, steps: list, block_max_volume: float = None) -> float:
+    """ramps, settling & holds through [[C, s]] steps from frm"""
+    sec, c = 0, frm
+    for temp, hold in steps:
+        sec += ramp_sec(c, temp, BLOCK_HEAT, BLOCK_COOL) + settle_sec(c, temp, block_max_volume) + hold
+        c = temp
+    return sec
+
+
+class Ramp:
+    """a temperature moving linearly towards its target, started at t0 (model seconds)"""
+    def __init__(self, celsius: float, heat: float, cool: float):
+        self.frm = self.to = celsius
+        self.t0 = 0
+        self.lag = 0                # s after the target before the sample is there too
+        self.heat = heat
+        self.cool = cool
+
+    def temp(self, t: float) -> float:
+        if self.to >= self.frm:
+            return min(self.to, self.frm + (t - self.t0)*self.heat)
+        return max(self.to, self.frm - (t - self.t0)*self.cool)
+
+    def start(self, to: float, t: float):
+        self.frm = self.temp(t)
+        self.to = to
+        self.t0 = t
+        self.lag = 0
+
+    def settle(self, celsius: float, t: float):
+        self.frm = self.to = celsius
+        self.t0 = t
+        self.lag = 0
+
+    def ready(self) -> float:
+        """model time at which the target is reached"""
+        return self.t0 + ramp_sec(self.frm, self.to, self.heat, self.cool) + self.lag
+
+
+def location_point(loc, bottom: bool = False):
+    """(x, y, z) of a Location or Well; Wells resolve the way the API does"""
+    if loc is None:
+        return None
+    if hasattr(loc, 'point'):
+        p = loc.point
+    elif bottom and hasattr(loc, 'bottom'):
+        p = loc.bottom(1).point
+    elif hasattr(loc, 'top'):
+        p = loc.top().point
+    else:
+        return None
+    return (p.x, p.y, p.z)
+
+
+class TimeModel:
+    def __init__(self):
+        self.pos = {}               # pipette -> last (x, y, z), None after tip handling
+        self.speed = {}             # pipette -> default_speed
+        self.t = 0                  # predicted seconds since the model started
+        self.block = Ramp(AMBIENT_C, BLOCK_HEAT, BLOCK_COOL)
+        self.lid = Ramp(AMBIENT_C, LID_HEAT, LID_COOL)
+        self.temp_mod = Ramp(AMBIENT_C, TEMP_MOD_HEAT, TEMP_MOD_COOL)
+
+    def travel_sec(self, pip: str, to, speed: float = None) -> float:
+        """gantry time from the last known position; arcs when leaving a well"""
+        frm = self.pos.get(pip)
+        self.pos[pip] = to
+        if to is None:
+            return 0
+        if frm is None:
+            frm = (to[0], to[1], ARC_Z)
+        speed = speed or self.speed.get(pip, DEFAULT_SPEED)
+        xy = math.hypot(to[0] - frm[0], to[1] - frm[1])
+        if xy < 1:
+            return MOVE_OVERHEAD + abs(to[2] - frm[2])/min(speed, Z_SPEED)
+        z_up = max(ARC_Z - frm[2], 0)
+        z_down = max(ARC_Z - to[2], 0)
+        return 3*MOVE_OVERHEAD + (z_up + z_down)/min(speed, Z_SPEED) + xy/speed
+
+    def plunger_sec(self, pip: str, kind: str, vol: float, rate: float) -> float:
+        flow = FLOW_RATE.get(pip, FLOW_RATE['p300'])[kind]
+        return (vol or 0)/(flow*(rate or 1.0))
+
+    def command_sec(self, cmd: Command) -> float:
+        sec = self._command_sec(cmd)
+        self.t += sec
+        return sec
+
+    def ramp_to(self, ramp: Ramp, to: float) -> float:
+        """start a transition and wait for it"""
+        ramp.start(to, self.t)
+        return ramp.ready() - self.t
+
+    def _command_sec(self, cmd: Command) -> float:
+        pip, name = cmd.source, cmd.name
+
+        if name == 'setattr':
+            if cmd.arg('attr', 0) == 'default_speed':
+                self.speed[pip] = cmd.arg('value', 1)
+            return 0
+        if name == 'delay':
+            return hold_sec(cmd.arg('seconds', 0), cmd.arg('minutes', 1))
+
+        # pipettes
+        if name in ('aspirate', 'dispense'):
+            loc = location_point(cmd.arg('location', 1), bottom=True)
+            return self.travel_sec(pip, loc) + self.plunger_sec(pip, name, cmd.arg('volume', 0), cmd.arg('rate', 2))
+        if name == 'mix':
+            reps, vol = cmd.arg('repetitions', 0, 1), cmd.arg('volume', 1, 0)
+            loc = location_point(cmd.arg('location', 2), bottom=True)
+            rate = cmd.arg('rate', 3)
+            cycle = self.plunger_sec(pip, 'aspirate', vol, rate) + self.plunger_sec(pip, 'dispense', vol, rate)
+            return self.travel_sec(pip, loc) + reps*(cycle + 2*MOVE_OVERHEAD)
+        if name == 'air_gap':
+            return 2*MOVE_OVERHEAD + self.plunger_sec(pip, 'aspirate', cmd.arg('volume', 0), 1.0)
+        if name == 'blow_out':
+            loc = location_point(cmd.arg('location', 0))
+            move = self.travel_sec(pip, loc) if loc else MOVE_OVERHEAD
+            return move + self.plunger_sec(pip, 'blow_out', BLOW_OUT_UL, 1.0)
+        if name == 'move_to':
+            return self.travel_sec(pip, location_point(cmd.arg('location', 0)), cmd.arg('speed', 3))
+        if name in ('pick_up_tip', 'drop_tip', 'return_tip'):
+            self.pos[pip] = None
+            return COMMAND_SEC[name]
+
+        # thermocycler, blocking
+        if name == 'set_block_temperature':
+            frm, to = self.block.temp(self.t), cmd.arg('temperature', 0)
+            sec = self.ramp_to(self.block, to) + settle_sec(frm, to, cmd.arg('block_max_volume', 4))
+            return sec + hold_sec(cmd.arg('hold_time_seconds', 1), cmd.arg('hold_time_minutes', 2))
+        if name == 'execute_profile':
+            steps = [[step['temperature'], hold_sec(step.get('hold_time_seconds'), step.get('hold_time_minutes'))]
+                     for step in cmd.arg('steps', 0, [])]*cmd.arg('repetitions', 1, 1)
+            sec = profile_sec(self.block.temp(self.t), steps, cmd.arg('block_max_volume', 2))
+            if steps:
+                self.block.settle(steps[-1][0], self.t + sec)
+            return sec
+        if name == 'set_lid_temperature':
+            return self.ramp_to(self.lid, cmd.arg('temperature', 0))
+
+        # thermocycler & temperature module, started now and waited on later (thermal.py)
+        if name == 'deactivate_lid':
+            self.lid.start(AMBIENT_C, self.t)
+            return 0
+        if name == 'start_lid_temperature':
+            self.lid.start(cmd.arg('celsius', 0), self.t)
+            return 0
+        if name == 'wait_lid_temperature':
+            return max(self.lid.ready() - self.t, 0)
+        if name == 'start_block_temperature':
+            to = cmd.arg('celsius', 0)
+            if to != self.block.to:         # the same target again only sets the sample volume, the ramp carries on
+                self.block.start(to, self.t)
+            self.block.lag = settle_sec(self.block.frm, to, cmd.arg('block_max_volume', 2))
+            return 0
+        if name == 'wait_block_temperature':
+            return max(self.block.ready() - self.t, 0)
+        if name == 'set_temperature':
+            return self.ramp_to(self.temp_mod, cmd.arg('celsius', 0))
+        if name == 'start_set_temperature':
+            self.temp_mod.start(cmd.arg('celsius', 0), self.t)
+            return 0
+        if name == 'await_temperature':
+            return max(self.temp_mod.ready() - self.t, 0)
+
+        return COMMAND_SEC.get(name, 0)
+
+
+class ClockDriver:
+    """advances a VirtualClock by the modelled duration of every traced command
+
+    jitter: relative sd of the JITTERED categories' durations, for Monte Carlo runs;
+    delays & temperature changes are timed by the hardware and keep their modelled time"""
+    def __init__(self, clock, jitter: float = 0, seed: int = None):
+        self.clock = clock
+        self.model = TimeModel()
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def before(self, cmd: Command):
+        sec = self.model.command_sec(cmd)
+        if self.jitter and CATEGORY.get(cmd.name) in JITTERED:
+            sec *= max(self.random.gauss(1, self.jitter), 0.1)
+        self.clock.advance(sec)
+
+
+class Estimator:
+    """predicted time per stage & per command category, alongside measured time"""
+    def __init__(self, clock):
+        self.clock = clock
+        self.model = TimeModel()
+        self.stage = 'setup'
+        self.predicted = {}         # stage -> s
+        self.actual = {}            # stage -> s
+        self.categories = {}        # category -> s
+        self._stage_start = clock.monotonic()
+
+    def before(self, cmd: Command):
+        sec = self.model.command_sec(cmd)
+        self.predicted[self.stage] = self.predicted.get(self.stage, 0) + sec
+        cat = CATEGORY.get(cmd.name, 'other')
+        self.categories[cat] = self.categories.get(cat, 0) + sec
+
+    def stage_start(self, name: str):
+        self._close_stage()
+        self.stage = name
+
+    def stage_end(self, name: str):
+        self._close_stage()
+        self.stage = 'between stages'
+
+    def _close_stage(self):
+        now = self.clock.monotonic()
+        self.actual[self.stage] = self.actual.get(self.stage, 0) + now - self._stage_start
+        self._stage_start = now
+
+    def report(self) -> str:
+        self._close_stage()
+        lines = ["{:<40}{:>12}{:>12}".format("stage", "predicted", "actual")]
+        for stage in dict.fromkeys(list(self.predicted) + list(self.actual)):
+            sec = self.predicted.get(stage, 0)
+            if sec < 1 and self.actual.get(stage, 0) < 1:
+                continue
+            lines.append("{:<40}{:>12}{:>12}".format(stage, hms(sec), hms(self.actual.get(stage, 0))))
+        lines.append("{:<40}{:>12}{:>12}".format("total", hms(sum(self.predicted.values())), hms(sum(self.actual.values()))))
+        lines.append("")
+        for cat, sec in sorted(self.categories.items(), key=lambda kv: -kv[1]):
+            lines.append("{:<40}{:>12}".format(cat, hms(sec)))
+        return "\n".join(lines)
+
+
+def hms(sec: float) -> str:
+    sec = int(round(sec))
+    return "{}:{:02d}:{:02d}".format(sec//3600, sec % 3600//60, sec % 60)
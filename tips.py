@@ -0,0 +1,235 @@
+"""tip policy: when a tip may be kept for the next transfer
+
+TipPolicy watches every traced pipette command (it subscribes to
+hwproxy.BUS) and keeps two things:
+    what each well holds: stocks are tagged when registered, everything else
+        picks up the tags of whatever is dispensed into it
+    what the tip on each pipette carries: the tags of every liquid it has
+        been below the top of a well in
+
+need(pip, source) is called before a tip goes into `source` (to aspirate
+from it, or to mix it). The tip on the pipette is kept if it carries nothing
+`source` doesn't already hold, so it can't carry anything new into the
+source, nor into wherever the source's liquid is going. Otherwise a parked
+tip that qualifies is picked up again, or a fresh one.
+
+That is what lets a tip that has only touched a clean stock, and dispensed it
+into empty or top-dispensed wells, serve every column; and a tip that has
+mixed a well keep working in that well. Engaging the magnet separates every
+mag well it holds: the supernatant gets a new tag, so a tip that touched the
+bead suspension is only reused to send supernatant to the trash (waste=True).
+
+A per-column reagent aliquot that goes, all of it, into one destination
+(an index strip) may be entered with a tip carrying that destination's
+contents.
+
+park() returns a tip to its rack slot to be reused later, e.g. the SPRI
+mixing tip. discard() drops a tip that must not be reused (ethanol).
+"""
+import hwproxy
+from hwproxy import Command
+
+
+class TipPolicy:
+    def __init__(self, mag_plate=None, trash=None, warn=None):
+        """warn(message, **fields) reports a tip carried into a stock, e.g. EventLog.warn"""
+        self.mag_plate = mag_plate
+        self.trash = trash
+        self.warn = warn
+        self.contents = {}      # well -> set of tags
+        self.history = {}       # mag well -> tags from before its last separation
+        self.stocks = set()     # tags of registered stocks
+        self.stock_wells = set()
+        self.destined = {}      # aliquot well -> the well it all goes into
+        self.carried = {}       # pipette name -> set of tags, None without a tip
+        self.parked = {}        # pipette name -> [(rack well, carried tags)]
+        self.pipettes = {}      # name -> Traced pipette
+        self.separations = 0
+        self.stage = 'setup'
+        self.picked = {}        # stage -> fresh tips picked up
+        self.reused = {}        # stage -> need() calls served by a kept or parked tip, i.e. tips saved
+        self.violations = 0
+
+    def stock(self, *wells, tag: str = None):
+        """wells loaded with a reagent; entering them with anything else on the tip is a violation
+
+        tag names the reagent when a well is refilled with a different one
+        """
+        for w in wells:
+            t = tag or str(w)
+            self.contents[w] = {t}
+            self.stocks.add(t)
+            self.stock_wells.add(w)
+
+    def sample(self, *wells):
+        """wells the operator loads samples into"""
+        for w in wells:
+            self.contents[w] = {str(w)}
+
+    def aliquot(self, well, dest):
+        """a per-column reagent that all goes into dest"""
+        self.contents[well] = {str(well)}
+        self.destined[well] = dest
+
+    ## DECISIONS ##
+    def need(self, pip, source, waste: bool = False):
+        """make sure `pip` has a tip that may go into `source`"""
+        name = pip._name
+        allowed = set(self.contents.get(source, set()))
+        if waste:
+            allowed |= self.history.get(source, set())
+        if source in self.destined:
+            allowed |= self.contents.get(self.destined[source], set())
+        carried = self.carried.get(name)
+        if carried is not None and carried <= allowed:
+            self.reused[self.stage] = self.reused.get(self.stage, 0) + 1
+            return
+        if carried is not None:
+            self._put_away(pip)
+        for i, (slot, tags) in enumerate(self.parked.get(name, [])):
+            if tags <= allowed:
+                del self.parked[name][i]
+                pip.pick_up_tip(slot)
+                self.carried[name] = set(tags)
+                self.reused[self.stage] = self.reused.get(self.stage, 0) + 1
+                return
+        pip.pick_up_tip()
+        self.picked[self.stage] = self.picked.get(self.stage, 0) + 1
+
+    def fresh(self, pip):
+        """a new tip regardless of what's on the pipette, e.g. for an accurate volume"""
+        if self.carried.get(pip._name) is not None:
+            self._put_away(pip)
+        pip.pick_up_tip()
+        self.picked[self.stage] = self.picked.get(self.stage, 0) + 1
+
+    def park(self, pip):
+        """put the tip back in its rack slot to be picked up by a later need()"""
+        pip.return_tip()
+
+    def discard(self, pip):
+        if self.carried.get(pip._name) is not None:
+            pip.drop_tip()
+
+    def left(self, pip) -> int:
+        """fresh tips (columns of 8) left in pip's racks"""
+        return sum(all(w.has_tip for w in col) for rack in pip.tip_racks for col in rack.columns())
+
+    def release(self):
+        """end of the run: nothing stays on the pipettes"""
+        for pip in list(self.pipettes.values()):
+            self._put_away(pip)
+
+    def _put_away(self, pip):
+        # a tip that only carries stock can serve that stock again later
+        carried = self.carried.get(pip._name)
+        if carried and carried <= self.stocks:
+            self.park(pip)
+        elif carried is not None:
+            pip.drop_tip()
+
+    ## CHECKPOINT ##
+    def state(self) -> dict:
+        """everything but the tips on the pipettes: a resumed run starts without them"""
+        return dict(
+            contents = {str(w): sorted(tags) for w, tags in self.contents.items()},
+            history = {str(w): sorted(tags) for w, tags in self.history.items()},
+            stocks = sorted(self.stocks),
+            stock_wells = [str(w) for w in self.stock_wells],
+            destined = {str(w): str(dest) for w, dest in self.destined.items()},
+            parked = {pip: [[str(slot), sorted(tags)] for slot, tags in slots] for pip, slots in self.parked.items()},
+            separations = self.separations,
+            picked = self.picked,
+            reused = self.reused,
+            violations = self.violations)
+
+    def restore(self, state: dict, wells: dict):
+        """wells: str(well) -> well, tip rack wells included"""
+        self.contents = {wells[w]: set(tags) for w, tags in state['contents'].items()}
+        self.history = {wells[w]: set(tags) for w, tags in state['history'].items()}
+        self.stocks = set(state['stocks'])
+        self.stock_wells = {wells[w] for w in state['stock_wells']}
+        self.destined = {wells[w]: wells[dest] for w, dest in state['destined'].items()}
+        self.parked = {pip: [(wells[slot], set(tags)) for slot, tags in slots] for pip, slots in state['parked'].items()}
+        self.separations = state['separations']
+        self.picked = dict(state['picked'])
+        self.reused = dict(state['reused'])
+        self.violations = state['violations']
+
+    ## BUS LISTENER ##
+    def watch(self, *pipettes):
+        for pip in pipettes:
+            self.pipettes[pip._name] = pip
+            self.carried.setdefault(pip._name, None)
+
+    def before(self, cmd: Command):
+        name = cmd.name
+        if cmd.source == 'mag' and name == 'engage':
+            self._separate()
+            return
+        if cmd.source not in self.pipettes:
+            return
+        pip = cmd.source
+        if name == 'pick_up_tip':
+            self.carried[pip] = set()
+        elif name == 'drop_tip':
+            self.carried[pip] = None
+        elif name == 'return_tip':
+            slot = self.pipettes[pip]._last_tip_picked_up_from
+            self.parked.setdefault(pip, []).append((slot, self.carried[pip] or set()))
+            self.carried[pip] = None
+        elif name == 'reset_tipracks':
+            self.parked[pip] = []
+        elif name == 'aspirate':
+            self._enter(pip, cmd.arg('location', 1), dispensing=False)
+        elif name == 'dispense':
+            self._enter(pip, cmd.arg('location', 1), dispensing=True)
+        elif name == 'mix':
+            self._enter(pip, cmd.arg('location', 2), dispensing=False)
+
+    def stage_start(self, name: str):
+        self.stage = name
+
+    def stage_end(self, name: str):
+        self.stage = 'between stages'
+
+    def _enter(self, pip, loc, dispensing: bool):
+        well, inside = hwproxy.well_at(loc)
+        # labware compare ==, not `is`: well.parent wraps it afresh on every call
+        if well is None or (self.trash is not None and well.parent == self.trash):
+            return
+        carried = self.carried.get(pip)
+        if carried is None:
+            return
+        held = self.contents.setdefault(well, set())
+        if dispensing:
+            if inside and held:
+                self._touch(pip, well, carried, held)
+            held |= carried
+        elif inside:
+            self._touch(pip, well, carried, held)
+
+    def _touch(self, pip, well, carried, held):
+        if well in self.stock_wells and not carried <= held:
+            self.violations += 1
+            if self.warn is not None:
+                self.warn('tip carried into stock', pipette=pip, well=str(well), carried=sorted(carried - held))
+        carried |= held
+        held |= carried
+
+    def _separate(self):
+        self.separations += 1
+        for well, held in self.contents.items():
+            if self.mag_plate is not None and well.parent == self.mag_plate and held:
+                self.history[well] = self.history.get(well, set()) | held
+                self.contents[well] = {str(well) + " sep " + str(self.separations)}
+
+    def report(self) -> str:
+        lines = ["{:<40}{:>12}{:>12}".format("stage", "tips", "tips saved")]
+        for stage in dict.fromkeys(list(self.picked) + list(self.reused)):
+            lines.append("{:<40}{:>12}{:>12}".format(stage, self.picked.get(stage, 0), self.reused.get(stage, 0)))
+        lines.append("{:<40}{:>12}{:>12}".format("total", sum(self.picked.values()), sum(self.reused.values())))
+        if self.violations:
+            lines.append(str(self.violations) + " stock contaminations, see log")
+        return "\n".join(lines)
+
@@ -0,0 +1,187 @@
+"""operator visits: every refill a run forces, batched into as few visits as possible, with ETAs
+
+From a run's event stream (a `--simulate` run's will do):
+
+    fixed visits    the protocol's own prompts: reagents & GEMs at the start, the
+                    visits between stages; what the protocol loads there (stock
+                    notes, racks replaced with reset_tipracks) is done there
+    resources       fresh tips of each pipette, a column per pickup off its racks,
+                    and every stock, drawn down by each aspirate from it (and
+                    back up by what mixing dispenses into it)
+
+A resource runs out at the first pickup or aspirate it can't serve, and a
+visit has to come before then. The protocol's own prompts for that (out of
+tips, mid-stage) are left out and planned again.
+
+plan() puts refills as late as they can go: at every visit, each resource that
+would run out before it's next loaded is topped up (used racks replaced, a
+stock back to what was first loaded), and when one still runs out a visit goes
+in just before it, where everything short is topped up too. An extra visit as
+late as possible covers the most, so this makes the fewest, and a refill that
+fits into a visit the protocol makes anyway costs none.
+
+ETAs count the operator's time at every earlier visit (fleet.VISIT_SEC), which
+the robot waits out.
+
+`python visits.py events.jsonl [--start 08:00]` prints each visit, what to do
+there and when, next to the prompts the run itself made.
+"""
+import datetime
+import json
+import sys
+
+import deck
+import fleet
+import time_model
+
+RELOAD_PROMPT = "out of "       # the protocol's own mid-stage tip reloads, planned again
+SLACK_UL = 1                    # loads are rounded, e.g. 50ul drawn as 3 x 16.67 (as ledger.py)
+EXTRA_VISIT = "refill visit"
+
+
+def timeline(path: str) -> list:
+    """[(t, kind, key, amount)] in run order, t when it started"""
+    items = []
+    pipettes = tuple(deck.RACKS)
+    with open(path) as f:
+        for line in f:
+            rec = json.loads(line)
+            t = rec['t']
+            if rec['event'] == 'note' and rec['message'] == 'operator' and not rec['prompt'].startswith(RELOAD_PROMPT):
+                items.append((t, 'visit', rec['prompt'], 0))
+            elif rec['event'] == 'note' and rec['message'] == 'stock':
+                items.append((t, 'load', rec['well'], rec['ul']))
+            elif rec['event'] != 'command' or rec['source'] not in pipettes:
+                continue
+            elif rec['name'] == 'reset_tipracks':
+                items.append((t, 'racks', rec['source'], 0))
+            elif rec['name'] == 'pick_up_tip' and 'well' not in rec:
+                items.append((t - rec['latency'], 'draw', rec['source'], 1))
+            elif rec['name'] == 'aspirate' and 'well' in rec:
+                items.append((t - rec['latency'], 'draw', rec['well'], rec['volume']))
+            elif rec['name'] == 'dispense' and 'well' in rec:
+                items.append((t - rec['latency'], 'draw', rec['well'], -rec['volume']))       # mixing a stock puts it back
+    return items
+
+
+def plan(items: list, channels: dict) -> tuple:
+    """([(t, prompt, [refills])], [resources that run out at a visit too]) for the visits the run needs
+
+    channels: stock well -> channels drawing at once (8 for a trough, 1 for a plate well)
+    """
+    extra = set()               # item indices an extra visit goes right before
+    while True:
+        visits, short = _run(items, extra, channels)
+        if short is None:
+            return visits, []
+        i, key = short
+        if i in extra:
+            return visits, [key]            # a visit right before doesn't help: more has to be loaded
+        extra.add(i)
+
+
+def _run(items: list, extra: set, channels: dict) -> tuple:
+    """visits with their refills, and the first (item index, resource) still running out, None if none does"""
+    capacity = {pip: len(racks)*deck.RACK_COLS for pip, racks in deck.RACKS.items()}
+    used = {pip: 0 for pip in capacity}
+    level, full = {}, {}
+    visits = []
+    stream, index = [], []      # items with the extra visits in, & each one's item index
+    for j, item in enumerate(items):
+        if j in extra:
+            stream.append((item[0], 'visit', EXTRA_VISIT, 0))
+            index.append(j)
+        stream.append(item)
+        index.append(j)
+    for i, (t, kind, key, amount) in enumerate(stream):
+        if kind == 'load':
+            level[key] = amount
+            full.setdefault(key, amount)
+        elif kind == 'racks':
+            used[key] = 0
+        elif kind == 'visit':
+            refills = []
+            for pip in capacity:
+                need = _demand(stream, i, pip, 'racks')
+                racks = used[pip]//deck.RACK_COLS
+                if capacity[pip] - used[pip] < need and racks:
+                    used[pip] -= racks*deck.RACK_COLS
+                    refills.append("replace " + str(racks) + " empty " + pip + " rack" + ("s" if racks > 1 else ""))
+            for well in level:
+                need = _demand(stream, i, well, 'load')*channels.get(well, 1)
+                if level[well] + SLACK_UL < need and level[well] < full[well]:
+                    refills.append("top " + _name(well) + " up to " + _ul(full[well]) + " (" + _ul(full[well] - level[well]) + " in)")
+                    level[well] = full[well]
+            visits.append((t, key, refills))
+        elif key in capacity:
+            if used[key] >= capacity[key]:
+                return visits, (index[i], key)
+            used[key] += 1
+        elif key in level:
+            vol = amount*channels.get(key, 1)
+            if vol > level[key] + SLACK_UL:
+                return visits, (index[i], key)
+            level[key] = max(level[key] - vol, 0)
+    return visits, None
+
+
+def _demand(stream: list, i: int, key: str, reload: str) -> float:
+    """drawn from key after stream[i], until it's next loaded"""
+    total = 0
+    for _, kind, k, amount in stream[i + 1:]:
+        if k == key and kind == reload:
+            break
+        if k == key and kind == 'draw':
+            total += amount
+    return total
+
+
+def channels_of(path: str) -> dict:
+    with open(path) as f:
+        return {rec['well']: rec.get('channels', 1) for rec in map(json.loads, f)
+                if rec['event'] == 'note' and rec['message'] == 'stock'}
+
+
+def _name(well: str) -> str:
+    """reservoir columns by stock, from deck.json"""
+    layout = deck.load()
+    name, _, rest = well.partition(' of ')
+    if rest.endswith(' on ' + str(layout['slots']['r15'])):
+        for stock, col in deck.stock_columns(layout).items():
+            if 'A' + str(col) == name:
+                return deck.STOCK_NAMES[stock.partition('.')[0]] + " (trough " + name + ")"
+    return well
+
+
+def _ul(ul: float) -> str:
+    return str(round(ul)) + "ul"
+
+
+def describe(visits: list, short: list, asked: int, start: datetime.datetime = None) -> str:
+    lines = ["{:>10}{:>10}  {}".format("run clock", "ETA", "visit")]
+    waited = 0
+    for t, prompt, refills in visits:
+        eta = t + waited
+        at = (start + datetime.timedelta(seconds=eta)).strftime('%H:%M') if start else time_model.hms(eta)
+        lines.append("{:>10}{:>10}  {}".format(time_model.hms(t), at, prompt))
+        for r in refills:
+            lines.append("{:>22}- {}".format("", r))
+        waited += fleet.VISIT_SEC.get(prompt, fleet.DEFAULT_VISIT_SEC)
+    for key in short:
+        lines.append("runs out even when refilled at a visit just before: load more " + _name(key))
+    lines.append("")
+    lines.append(str(len(visits)) + " visits planned, the run made " + str(asked) + " operator prompts")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    _events = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'events.jsonl'
+    _start = None
+    if '--start' in sys.argv:
+        _h, _m = sys.argv[sys.argv.index('--start') + 1].split(':')
+        _start = datetime.datetime.combine(datetime.date.today(), datetime.time(int(_h), int(_m)))
+    _items = timeline(_events)
+    with open(_events) as f:
+        _asked = sum(1 for rec in map(json.loads, f) if rec['event'] == 'note' and rec['message'] == 'operator')
+    _visits, _short = plan(_items, channels_of(_events))
+    print(describe(_visits, _short, _asked, _start))